@@ -0,0 +1,335 @@
+"""
+Admission control for outbound Claude requests
+Caps in-flight requests and tokens-per-minute, and learns the real limits
+from Anthropic's rate-limit headers so a cohort clicking "Start" queues
+briefly instead of triggering a 429 storm
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from config import get_config
+from api.resilience import UpstreamBusyError, parse_retry_after
+
+TOKEN_WINDOW_SECONDS = 60.0
+
+
+class AdmissionTimeoutError(UpstreamBusyError):
+    """A queued request waited too long (or the queue was full)"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message, retry_after)
+
+
+class AdmissionTicket:
+    """One admitted request - release it when the upstream call is finished"""
+
+    def __init__(self, controller: 'AdmissionController', entry: list):
+        self.controller = controller
+        self.entry = entry  # [admitted_at, tokens, in_window] from the controller's token window
+        self.released = False
+
+    def release(self, actual_tokens: Optional[int] = None):
+        """Free the in-flight slot (and correct the token estimate if we know the real usage)"""
+        if not self.released:
+            self.released = True
+            self.controller._release(self, actual_tokens)
+
+
+class AdmissionController:
+    """
+    Gatekeeper in front of the Claude transport
+    Think of this as the front desk: only so many people through at once,
+    everyone else takes a number and waits - but never forever
+
+    Concurrency adapts AIMD-style: a 429 halves the in-flight cap, every
+    success grows it back towards the configured ceiling. The token budget
+    shrinks to whatever `anthropic-ratelimit-*` headers say we really have.
+
+    The token budget is the account's, so with several worker processes each
+    one takes an equal share (`workers`) rather than all of it.
+    """
+
+    def __init__(self, max_in_flight: int = 16, tokens_per_minute: int = 80000,
+                 queue_timeout: float = 10.0, max_queue: int = 200, workers: int = 1):
+        self.max_in_flight = max_in_flight
+        self.concurrency_limit = float(max_in_flight)
+        self.workers = max(1, workers)
+        self.configured_tokens_per_minute = max(1, tokens_per_minute // self.workers)
+        self.tokens_per_minute = self.configured_tokens_per_minute
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+
+        self.in_flight = 0
+        self.waiting = 0
+        self._window = deque()  # [admitted_at, tokens, in_window] entries from the last minute
+        self._window_tokens = 0
+
+        # Latest view from the rate-limit headers (monotonic reset times)
+        self.requests_remaining = None
+        self.requests_reset_at = None
+        self.tokens_remaining = None
+        self.tokens_reset_at = None
+        self.paused_until = 0.0
+
+        # Stats
+        self.admitted = 0
+        self.rejected = 0
+        self.throttled_429 = 0
+        self.total_wait_seconds = 0.0
+
+        self._cond = threading.Condition()
+
+    # ---------- admission ----------
+
+    def acquire(self, tokens: int, timeout: Optional[float] = None) -> AdmissionTicket:
+        """Wait (bounded) for a slot; raises AdmissionTimeoutError if none frees up"""
+        timeout = self.queue_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        with self._cond:
+            ticket, wait_hint = self._try_admit(tokens)
+            if ticket:
+                return ticket
+            self._check_queue_space(wait_hint)
+
+            self.waiting += 1
+            try:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        raise AdmissionTimeoutError(
+                            f"Claude request queue wait exceeded {timeout:g}s", wait_hint or 1.0
+                        )
+                    self._cond.wait(min(remaining, wait_hint or remaining, 1.0))
+                    ticket, wait_hint = self._try_admit(tokens)
+                    if ticket:
+                        self.total_wait_seconds += time.monotonic() - started
+                        return ticket
+            finally:
+                self.waiting -= 1
+
+    async def acquire_async(self, tokens: int, timeout: Optional[float] = None) -> AdmissionTicket:
+        """Async twin of acquire() - polls so the event loop is never blocked"""
+        import asyncio  # Only the ASGI path gets here - keeps it out of the Flask app's import time
+        timeout = self.queue_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        with self._cond:
+            ticket, wait_hint = self._try_admit(tokens)
+            if ticket:
+                return ticket
+            self._check_queue_space(wait_hint)
+            self.waiting += 1
+
+        try:
+            delay = 0.01
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    with self._cond:
+                        self.rejected += 1
+                    raise AdmissionTimeoutError(
+                        f"Claude request queue wait exceeded {timeout:g}s", wait_hint or 1.0
+                    )
+                await asyncio.sleep(min(delay, remaining))
+                delay = min(delay * 2, 0.2)
+                with self._cond:
+                    ticket, wait_hint = self._try_admit(tokens)
+                    if ticket:
+                        self.total_wait_seconds += time.monotonic() - started
+                        return ticket
+        finally:
+            with self._cond:
+                self.waiting -= 1
+
+    def _check_queue_space(self, wait_hint: Optional[float]):
+        """Refuse to queue at all once the queue is full (caller holds the lock)"""
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionTimeoutError("Claude request queue is full", wait_hint or 1.0)
+
+    def _try_admit(self, tokens: int):
+        """Admit now if every limit allows it (caller holds the lock). Returns (ticket, wait_hint)"""
+        now = time.monotonic()
+        self._expire(now)
+
+        if now < self.paused_until:
+            return None, self.paused_until - now
+        if self.in_flight >= max(1, int(self.concurrency_limit)):
+            return None, None  # Woken by the next release
+        if self.requests_remaining is not None and self.requests_remaining <= 0 \
+                and self.requests_reset_at and self.requests_reset_at > now:
+            return None, self.requests_reset_at - now
+        if self.tokens_remaining is not None and tokens > self.tokens_remaining \
+                and self.tokens_reset_at and self.tokens_reset_at > now:
+            return None, self.tokens_reset_at - now
+        if self._window and self._window_tokens + tokens > self.tokens_per_minute:
+            return None, self._window[0][0] + TOKEN_WINDOW_SECONDS - now
+
+        entry = [now, tokens, True]
+        self._window.append(entry)
+        self._window_tokens += tokens
+        if self.tokens_remaining is not None:
+            self.tokens_remaining -= tokens
+        if self.requests_remaining is not None:
+            self.requests_remaining -= 1
+        self.in_flight += 1
+        self.admitted += 1
+        return AdmissionTicket(self, entry), 0.0
+
+    def _expire(self, now: float):
+        """Drop token-window entries older than a minute"""
+        while self._window and now - self._window[0][0] >= TOKEN_WINDOW_SECONDS:
+            entry = self._window.popleft()
+            entry[2] = False
+            self._window_tokens -= entry[1]
+
+    def _release(self, ticket: AdmissionTicket, actual_tokens: Optional[int]):
+        with self._cond:
+            self.in_flight -= 1
+            if actual_tokens is not None and ticket.entry[2]:
+                self._window_tokens += actual_tokens - ticket.entry[1]
+                ticket.entry[1] = actual_tokens
+            self._cond.notify_all()
+
+    # ---------- adaptation ----------
+
+    def observe(self, status_code: int, headers):
+        """Learn from one upstream response (status + anthropic-ratelimit-* headers)"""
+        now = time.monotonic()
+        with self._cond:
+            if status_code == 429:
+                self.throttled_429 += 1
+                self.concurrency_limit = max(1.0, self.concurrency_limit / 2)
+                retry_after = parse_retry_after(headers.get('retry-after'))
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+            elif status_code < 400:
+                self.concurrency_limit = min(float(self.max_in_flight),
+                                             self.concurrency_limit + 1.0 / self.concurrency_limit)
+
+            requests_remaining = _header_int(headers, 'anthropic-ratelimit-requests-remaining')
+            if requests_remaining is not None:
+                self.requests_remaining = requests_remaining
+                self.requests_reset_at = _reset_to_monotonic(headers.get('anthropic-ratelimit-requests-reset'), now)
+
+            # Prefer the combined token limit, fall back to the input-token one
+            for prefix in ('anthropic-ratelimit-tokens', 'anthropic-ratelimit-input-tokens'):
+                tokens_limit = _header_int(headers, f'{prefix}-limit')
+                tokens_remaining = _header_int(headers, f'{prefix}-remaining')
+                if tokens_limit is None and tokens_remaining is None:
+                    continue
+                if tokens_limit:
+                    self.tokens_per_minute = min(self.configured_tokens_per_minute, max(1, tokens_limit // self.workers))
+                if tokens_remaining is not None:
+                    self.tokens_remaining = tokens_remaining
+                    self.tokens_reset_at = _reset_to_monotonic(headers.get(f'{prefix}-reset'), now)
+                break
+
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict:
+        """Current limits and queue depth (for /health and metrics)"""
+        with self._cond:
+            self._expire(time.monotonic())
+            return {
+                'in_flight': self.in_flight,
+                'queue_depth': self.waiting,
+                'concurrency_limit': round(self.concurrency_limit, 2),
+                'max_in_flight': self.max_in_flight,
+                'tokens_per_minute': self.tokens_per_minute,
+                'tokens_last_minute': self._window_tokens,
+                'server_tokens_remaining': self.tokens_remaining,
+                'server_requests_remaining': self.requests_remaining,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'throttled_429': self.throttled_429,
+                'total_wait_seconds': round(self.total_wait_seconds, 3)
+            }
+
+
+# ============================================
+# HELPERS
+# ============================================
+
+def estimate_request_tokens(payload: Dict) -> int:
+    """
+    Rough token cost of a messages payload (about 4 characters per token)
+    Prompt size plus the full max_tokens allowance, so the budget errs on the safe side
+    """
+    chars = 0
+    system = payload.get('system')
+    if isinstance(system, str):
+        chars += len(system)
+    elif isinstance(system, list):
+        chars += sum(len(block.get('text', '')) for block in system)
+
+    for message in payload.get('messages', []):
+        content = message.get('content', '')
+        if isinstance(content, str):
+            chars += len(content)
+        else:
+            chars += sum(len(block.get('text', '')) for block in content)
+
+    return chars // 4 + payload.get('max_tokens', 0)
+
+
+def usage_tokens(usage: Optional[Dict]) -> Optional[int]:
+    """Total tokens from a Claude `usage` block (None if unknown)"""
+    if not usage:
+        return None
+    return (usage.get('input_tokens') or 0) + (usage.get('output_tokens') or 0) \
+        + (usage.get('cache_creation_input_tokens') or 0) + (usage.get('cache_read_input_tokens') or 0)
+
+
+def _header_int(headers, name: str) -> Optional[int]:
+    value = headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _reset_to_monotonic(value: Optional[str], now: float) -> Optional[float]:
+    """Convert an RFC 3339 reset timestamp into our monotonic clock"""
+    if not value:
+        return None
+    try:
+        reset = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if reset.tzinfo is None:
+        reset = reset.replace(tzinfo=timezone.utc)
+    return now + max(0.0, (reset - datetime.now(timezone.utc)).total_seconds())
+
+
+# ============================================
+# SHARED INSTANCE
+# ============================================
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Process-wide admission controller shared by every Claude call"""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                config = get_config()
+                _controller = AdmissionController(
+                    max_in_flight=config.CLAUDE_MAX_IN_FLIGHT,
+                    tokens_per_minute=config.CLAUDE_TOKENS_PER_MINUTE,
+                    queue_timeout=config.CLAUDE_QUEUE_TIMEOUT,
+                    max_queue=config.CLAUDE_QUEUE_MAX,
+                    workers=config.WEB_CONCURRENCY
+                )
+    return _controller
@@ -0,0 +1,249 @@
+"""
+Result cache for email analysis
+Workshops analyze the same email templates over and over - identical
+emails are answered from memory, and identical requests already in
+flight share one Claude call instead of each paying for their own
+"""
+
+import copy
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+from config import get_config
+from api.metrics import record_cache_eviction, record_cache_lookup
+
+
+def email_cache_key(email_content: str, email_subject: str, colleague_info: Dict = None, model: str = '') -> str:
+    """
+    Content hash of everything that shapes the analysis
+    Whitespace runs are collapsed and ends trimmed; case is kept, because
+    SHOUTING changes the verdict
+    """
+    def normalise(text):
+        return re.sub(r'\s+', ' ', str(text or '')).strip()
+
+    colleague = {k: normalise(v) for k, v in sorted((colleague_info or {}).items()) if v}
+    material = json.dumps([model, normalise(email_subject), normalise(email_content), colleague],
+                          ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def is_cacheable_analysis(analysis: Dict) -> bool:
+    """Only keep real answers - not error fallbacks, partial results or replies we couldn't parse"""
+    status = analysis.get('code_compliance', {}).get('status')
+    return status not in ('ERROR', 'UNKNOWN') and 'analysis_text' not in analysis and not analysis.get('partial')
+
+
+class _Flight:
+    """One upstream call that other identical requests are waiting on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class AnalysisCache:
+    """
+    LRU + TTL cache of email analyses with in-flight request coalescing
+    Think of this as the marker's answer sheet: if we've already graded
+    this exact email, hand back the same feedback instead of re-marking it
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 21600.0, wait_timeout: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()  # key -> (stored_at, analysis, size_bytes)
+        self._bytes = 0
+        self._in_flight: Dict[str, _Flight] = {}
+        self._in_flight_async: Dict[str, 'asyncio.Future'] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expired = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    # ---------- lookups ----------
+
+    def get_or_compute(self, key: str, compute: Callable[[], Dict]) -> Dict:
+        """Cached analysis for `key`, or run `compute` once no matter how many threads ask"""
+        if not self.enabled:
+            return compute()
+
+        with self._lock:
+            cached = self._lookup(key)
+            if cached is not None:
+                return cached
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+            else:
+                self.coalesced += 1
+                record_cache_lookup('email_analysis', 'coalesced')
+
+        if not leader:
+            if not flight.done.wait(self.wait_timeout):
+                return compute()  # The leader stalled - don't wait on it forever
+            if flight.error is not None:
+                raise flight.error  # Same upstream, same answer - don't pile more calls onto it
+            if flight.result is not None and is_cacheable_analysis(flight.result):
+                return copy.deepcopy(flight.result)
+            return compute()  # The leader only got an error fallback - try for a real answer
+
+        try:
+            flight.result = compute()
+            self.put(key, flight.result)
+            return copy.deepcopy(flight.result)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            flight.done.set()
+
+    async def get_or_compute_async(self, key: str, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        """Async twin of get_or_compute (waiters await the leader's future)"""
+        import asyncio  # Only the ASGI path gets here - keeps it out of the Flask app's import time
+        if not self.enabled:
+            return await compute()
+
+        with self._lock:
+            cached = self._lookup(key)
+            if cached is not None:
+                return cached
+            future = self._in_flight_async.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight_async[key] = asyncio.get_running_loop().create_future()
+            else:
+                self.coalesced += 1
+                record_cache_lookup('email_analysis', 'coalesced')
+
+        if not leader:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(future), self.wait_timeout)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # We were cancelled ourselves
+                return await compute()  # The leader's client went away
+            except asyncio.TimeoutError:
+                return await compute()  # The leader stalled
+            # A leader that raised has raised here too (as get_or_compute does)
+            if is_cacheable_analysis(result):
+                return copy.deepcopy(result)
+            return await compute()  # The leader only got an error fallback - try for a real answer
+
+        try:
+            result = await compute()
+            self.put(key, result)
+            future.set_result(result)
+            return copy.deepcopy(result)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved so an unwatched future doesn't log a warning
+            raise
+        finally:
+            with self._lock:
+                self._in_flight_async.pop(key, None)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached analysis (a copy marked 'cached'), or None - for callers that stream instead"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            return self._lookup(key)
+
+    def put(self, key: str, analysis: Dict):
+        """Remember an analysis (ignored unless it's a real, fully parsed answer)"""
+        if not self.enabled or not is_cacheable_analysis(analysis):
+            return
+        size = len(key) + len(json.dumps(analysis, ensure_ascii=False, default=str))
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic(), copy.deepcopy(analysis), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+                record_cache_eviction('email_analysis')
+
+    def snapshot(self) -> Dict:
+        """Cache stats for /health and metrics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'memory_bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._in_flight) + len(self._in_flight_async),
+                'evictions': self.evictions,
+                'expired': self.expired
+            }
+
+    # ---------- internals ----------
+
+    def _lookup(self, key: str) -> Optional[Dict]:
+        """Fresh copy of a live entry, or None (caller holds the lock)"""
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] >= self.ttl:
+            self._drop(key)
+            self.expired += 1
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            record_cache_lookup('email_analysis', 'miss')
+            return None
+
+        self.hits += 1
+        record_cache_lookup('email_analysis', 'hit')
+        self._entries.move_to_end(key)
+        result = copy.deepcopy(entry[1])
+        result['cached'] = True
+        return result
+
+    def _drop(self, key: str):
+        """Caller holds the lock"""
+        self._bytes -= self._entries.pop(key)[2]
+
+
+# ============================================
+# SHARED INSTANCE
+# ============================================
+
+_cache: Optional[AnalysisCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> AnalysisCache:
+    """Process-wide email analysis cache shared by the sync and async clients"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = get_config()
+                _cache = AnalysisCache(max_entries=config.EMAIL_CACHE_SIZE, ttl=config.EMAIL_CACHE_TTL)
+    return _cache
@@ -0,0 +1,262 @@
+"""
+Async Claude API client for the ASGI serving path
+Same requests as ClaudeAPIClient, but awaiting Claude never pins a worker thread
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from config import get_config
+from api.claude_integration import (
+    EMAIL_ANALYSIS_MAX_TOKENS, build_email_analysis_prompt, parse_email_analysis, email_analysis_error
+)
+from api.analysis_cache import email_cache_key, get_analysis_cache
+from api.codec import dumps, loads
+from api.prompt_caching import merge_stream_usage
+from api.admission import estimate_request_tokens, get_admission_controller, usage_tokens
+from api.upstream_health import get_upstream_monitor
+from api.metrics import observe_upstream, record_token_usage
+from api.resilience import (
+    BREAKER_FAILURE_STATUS, RETRYABLE_STATUS, CircuitOpenError, UpstreamBusyError, get_circuit_breaker, get_retry_policy,
+    parse_retry_after
+)
+
+
+class AsyncClaudeClient:
+    """
+    Asyncio client for the Claude messages endpoint
+    One event loop can hold hundreds of these calls open at once,
+    because each waiting request is just a suspended coroutine
+    """
+
+    def __init__(self, api_key: str = None, base_url: str = None, max_connections: int = None, timeout: float = None):
+        """Create the pooled httpx client"""
+        config = get_config()
+        self.api_key = api_key if api_key is not None else config.CLAUDE_API_KEY
+        self.base_url = base_url or config.CLAUDE_API_URL
+        self.model = config.CLAUDE_MODEL
+        self.timeout = timeout or config.CLAUDE_TIMEOUT
+        self.retry_policy = get_retry_policy()
+        self.breaker = get_circuit_breaker()  # Shared with the sync transport
+        self.admission = get_admission_controller()
+        self.monitor = get_upstream_monitor()
+
+        max_connections = max_connections or config.CLAUDE_ASYNC_MAX_CONNECTIONS
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    def headers(self) -> Dict:
+        """Standard headers for every Claude request"""
+        return {
+            'Content-Type': 'application/json',
+            'x-api-key': self.api_key or '',
+            'anthropic-version': '2023-06-01'
+        }
+
+    async def post_messages(self, payload: Dict, timeout: Optional[float] = None) -> httpx.Response:
+        """POST a messages payload and return the raw response (after admission and retries)"""
+        ticket = await self.admission.acquire_async(estimate_request_tokens(payload))
+        actual_tokens = None
+        body = dumps(payload)
+        try:
+            response = await self._send_with_retry(lambda request_timeout: self.client.post(
+                self.base_url,
+                headers=self.headers(),
+                content=body,
+                timeout=request_timeout
+            ), timeout)
+            if response.status_code == 200:
+                try:
+                    usage = loads(response.content).get('usage')
+                except ValueError:
+                    usage = None
+                actual_tokens = usage_tokens(usage)
+                record_token_usage(usage)
+            return response
+        finally:
+            ticket.release(actual_tokens)
+
+    async def _send_with_retry(self, send: Callable[[float], Awaitable[httpx.Response]],
+                               timeout: Optional[float] = None) -> httpx.Response:
+        """Async twin of ClaudeTransport._send_with_retry (same policy and breaker)"""
+        policy = self.retry_policy
+        deadline = time.monotonic() + policy.deadline
+        attempt = 0
+
+        while True:
+            if not self.breaker.allow_request():
+                raise CircuitOpenError(self.breaker.retry_after())
+
+            remaining = deadline - time.monotonic()
+            response = None
+            started = time.monotonic()
+            try:
+                response = await send(max(1.0, min(timeout or self.timeout, remaining)))
+            except (httpx.HTTPError, httpx.InvalidURL) as e:
+                self.breaker.record_failure()
+                self.monitor.record(time.monotonic() - started, error=e)
+                observe_upstream(time.monotonic() - started, error=e)
+                error = e
+            except BaseException:
+                self.breaker.release_probe()  # Cancelled or a bug - not an upstream verdict, but free the probe slot
+                raise
+            else:
+                self.monitor.record(time.monotonic() - started, status_code=response.status_code)
+                observe_upstream(time.monotonic() - started, status_code=response.status_code)
+                self.admission.observe(response.status_code, response.headers)
+                if response.status_code in BREAKER_FAILURE_STATUS:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                if response.status_code not in RETRYABLE_STATUS:
+                    return response
+
+            attempt += 1
+            retry_after = parse_retry_after(response.headers.get('retry-after')) if response is not None else None
+            delay = policy.backoff(attempt, retry_after)
+
+            if attempt >= policy.max_attempts or time.monotonic() + delay >= deadline:
+                if response is not None:
+                    return response
+                raise error
+
+            if response is not None:
+                await response.aclose()
+            await asyncio.sleep(delay)
+
+    async def stream_events(self, payload: Dict) -> AsyncIterator[Dict]:
+        """
+        Stream a messages request, yielding Claude's decoded SSE events
+        A non-200 status is raised before anything is yielded (UpstreamBusyError for 429 / 5xx / 529)
+        """
+        body = dumps(dict(payload, stream=True))
+
+        def send(request_timeout):
+            request = self.client.build_request(
+                'POST',
+                self.base_url,
+                headers=self.headers(),
+                content=body,
+                timeout=request_timeout
+            )
+            return self.client.send(request, stream=True)
+
+        ticket = await self.admission.acquire_async(estimate_request_tokens(payload))
+        try:
+            response = await self._send_with_retry(send)
+        except Exception:
+            ticket.release()
+            raise
+
+        usage = {}
+        try:
+            if response.status_code != 200:
+                body = await response.aread()
+                message = f"Claude API error: {response.status_code} - {body.decode(errors='replace')}"
+                if response.status_code in RETRYABLE_STATUS:
+                    # Same busy / retry_after answer the Flask stream gives for an overloaded upstream
+                    raise UpstreamBusyError(message, parse_retry_after(response.headers.get('retry-after')),
+                                            response.status_code)
+                raise Exception(message)
+
+            async for line in response.aiter_lines():
+                if not line.startswith('data:'):
+                    continue
+                try:
+                    event = loads(line[5:].strip())
+                except ValueError:
+                    continue
+                merge_stream_usage(usage, event)
+                yield event
+                if event.get('type') in ('message_stop', 'error'):
+                    break
+        finally:
+            await response.aclose()
+            record_token_usage(usage)
+            ticket.release(usage_tokens(usage))
+
+    async def stream_text(self, payload: Dict, usage: Dict = None) -> AsyncIterator[str]:
+        """Stream just the text chunks of a reply (token counts go into `usage` if given)"""
+        async for event in self.stream_events(payload):
+            if usage is not None:
+                merge_stream_usage(usage, event)
+            if event.get('type') == 'content_block_delta':
+                text = event.get('delta', {}).get('text')
+                if text:
+                    yield text
+            elif event.get('type') == 'error':
+                error = event.get('error', {})
+                raise Exception(f"Claude stream error: {error.get('type', 'error')} - {error.get('message', '')}")
+
+    async def make_claude_request(self, prompt: str, max_tokens: int = 300) -> str:
+        """Async twin of ClaudeAPIClient._make_claude_request"""
+        data = {
+            'model': self.model,
+            'max_tokens': max_tokens,
+            'messages': [
+                {
+                    'role': 'user',
+                    'content': prompt
+                }
+            ]
+        }
+
+        response = await self.post_messages(data)
+
+        if response.status_code in RETRYABLE_STATUS:
+            raise UpstreamBusyError(f"Claude API error: {response.status_code} - {response.text}",
+                                    parse_retry_after(response.headers.get('retry-after')), response.status_code)
+        if response.status_code != 200:
+            raise Exception(f"Claude API error: {response.status_code} - {response.text}")
+
+        return response.json()['content'][0]['text']
+
+    async def analyze_email_professional(self, email_content: str, email_subject: str, colleague_info: Dict = None) -> Dict:
+        """Async twin of ClaudeAPIClient.analyze_email_professional"""
+        async def analyze():
+            analysis_prompt = build_email_analysis_prompt(email_content, email_subject, colleague_info)
+
+            try:
+                claude_response = await self.make_claude_request(analysis_prompt, max_tokens=EMAIL_ANALYSIS_MAX_TOKENS)
+                return parse_email_analysis(claude_response)
+
+            except UpstreamBusyError:
+                raise
+
+            except Exception as e:
+                return email_analysis_error(e)
+
+        cache_key = email_cache_key(email_content, email_subject, colleague_info, self.model)
+        return await get_analysis_cache().get_or_compute_async(cache_key, analyze)
+
+    async def aclose(self):
+        """Close every pooled connection"""
+        await self.client.aclose()
+
+
+# ============================================
+# SHARED INSTANCE
+# ============================================
+
+_async_client: Optional[AsyncClaudeClient] = None
+
+
+def get_async_client() -> AsyncClaudeClient:
+    """Get the process-wide async client (created inside the running event loop)"""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncClaudeClient()
+    return _async_client
+
+
+async def close_async_client():
+    """Close the shared async client on shutdown"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
@@ -9,17 +9,31 @@ import os
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from config import get_config
+from api.claude_transport import ClaudeTransport, get_transport
+from api.resilience import RETRYABLE_STATUS, UpstreamBusyError, parse_retry_after
+from api.analysis_cache import email_cache_key, get_analysis_cache
+from api.incremental_json import IncrementalJSONObject
+
 class ClaudeAPIClient:
     """
     Handles all communication with Claude API
     Think of this as the phone system that calls Claude
     """
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, transport: ClaudeTransport = None):
         """Initialize Claude API client"""
+        config = get_config()
         self.api_key = api_key or os.getenv('CLAUDE_API_KEY')
-        self.base_url = "https://api.anthropic.com/v1/messages"
-        self.model = "claude-3-sonnet-20240229"  # Using Claude 3 Sonnet
+        self.base_url = config.CLAUDE_API_URL
+        self.model = config.CLAUDE_MODEL  # Claude 3 Sonnet unless overridden
+
+        # Share the pooled transport unless we were handed a custom key or transport
+        if transport is None:
+            transport = get_transport()
+            if self.api_key and self.api_key != transport.api_key:
+                transport = ClaudeTransport(api_key=self.api_key)
+        self.transport = transport
         
         if not self.api_key:
             print("⚠️  WARNING: No Claude API key found!")
@@ -91,12 +105,6 @@ Respond in character. Keep your response natural and conversational (2-4 sentenc
         Make the actual HTTP request to Claude API
         This is the technical plumbing
         """
-        headers = {
-            'Content-Type': 'application/json',
-            'x-api-key': self.api_key,
-            'anthropic-version': '2023-06-01'
-        }
-        
         data = {
             'model': self.model,
             'max_tokens': max_tokens,
@@ -108,13 +116,12 @@ Respond in character. Keep your response natural and conversational (2-4 sentenc
             ]
         }
         
-        response = requests.post(
-            self.base_url,
-            headers=headers,
-            json=data,
-            timeout=30  # 30 second timeout
-        )
+        response = self.transport.post_messages(data)
         
+        if response.status_code in RETRYABLE_STATUS:
+            # Still overloaded after the transport's retries - let the route answer 503 + Retry-After
+            raise UpstreamBusyError(f"Claude API error: {response.status_code} - {response.text}",
+                                    parse_retry_after(response.headers.get('retry-after')), response.status_code)
         if response.status_code != 200:
             raise Exception(f"Claude API error: {response.status_code} - {response.text}")
         
@@ -135,113 +142,24 @@ Respond in character. Keep your response natural and conversational (2-4 sentenc
             Dictionary with analysis results
         """
 
-        # Build colleague context
-        colleague_context = ""
-        if colleague_info:
-            colleague_name = colleague_info.get('name', 'colleague')
-            colleague_role = colleague_info.get('role', 'team member')
-            colleague_personality = colleague_info.get('personality', 'professional colleague')
-            colleague_context = f"""
-    RECIPIENT CONTEXT:
-    - Name: {colleague_name}
-    - Role: {colleague_role}  
-    - Communication Style: {colleague_personality}
-    """
+        def analyze():
+            analysis_prompt = build_email_analysis_prompt(email_content, email_subject, colleague_info)
 
-        # System prompt for Lake Macquarie Code of Conduct
-        analysis_prompt = f"""You are a professional communication advisor for Lake Macquarie City Council staff.
-    
-    CRITICAL: Assess this email against Lake Macquarie Council's Code of Conduct standards:
-    - Must not bring Council into disrepute
-    - Must not involve intimidation or verbal abuse
-    - Must not constitute harassment or bullying behaviour  
-    - Must be lawful and honest
-    - Must consider issues consistently, promptly and fairly
-    
-    Core Values: Leading at all levels, Working together, Shaping our future
-    
-    {colleague_context}
-    
-    EMAIL TO ANALYZE:
-    Subject: {email_subject}
-    
-    Content: {email_content}
-    
-    Please analyze and respond with a JSON object containing:
-    {{
-        "overall_score": (number 1-10),
-        "overall_feedback": "brief assessment",
-        "code_compliance": {{
-            "status": "PASS" or "FAIL",
-            "issues": ["list of any compliance issues"],
-            "risk_level": "low" or "medium" or "high"
-        }},
-        "channel_recommendation": {{
-            "current": "email",
-            "recommended": "email" or "phone" or "in_person",
-            "reasoning": "explanation for recommendation"
-        }},
-        "disc_scores": {{
-            "D": (number 1-10),
-            "I": (number 1-10), 
-            "S": (number 1-10),
-            "C": (number 1-10)
-        }},
-        "disc_feedback": {{
-            "D": "feedback on directness/assertiveness",
-            "I": "feedback on interpersonal/collaborative tone",
-            "S": "feedback on supportiveness/patience", 
-            "C": "feedback on detail/accuracy"
-        }},
-        "suggestions": ["specific improvement recommendations"],
-        "quick_tips": ["practical communication tips"]
-    }}
-    
-    If email contains inappropriate language, harassment, or unprofessional content, score 1-3 and mark code_compliance as "FAIL"."""
+            try:
+                # Call Claude API for analysis
+                claude_response = self._make_claude_request(analysis_prompt, max_tokens=EMAIL_ANALYSIS_MAX_TOKENS)
+                return parse_email_analysis(claude_response)
 
-        try:
-            # Call Claude API for analysis
-            claude_response = self._make_claude_request(analysis_prompt, max_tokens=1000)
+            except UpstreamBusyError:
+                raise  # Not the email's fault - the caller decides (503, or an ERROR entry in a batch)
 
-            # Try to parse JSON response
-            try:
-                import json
-                analysis_result = json.loads(claude_response)
-                analysis_result['claude_powered'] = True
-                analysis_result['analysis_timestamp'] = datetime.now().isoformat()
-                return analysis_result
-            except json.JSONDecodeError:
-                # Fallback if Claude doesn't return valid JSON
-                return {
-                    "overall_score": 5,
-                    "overall_feedback": "Analysis completed - see detailed feedback",
-                    "code_compliance": {"status": "UNKNOWN", "issues": [], "risk_level": "medium"},
-                    "channel_recommendation": {"current": "email", "recommended": "email",
-                                               "reasoning": "Standard email communication"},
-                    "disc_scores": {"D": 5, "I": 5, "S": 5, "C": 5},
-                    "disc_feedback": {"D": "Analysis completed", "I": "Analysis completed", "S": "Analysis completed",
-                                      "C": "Analysis completed"},
-                    "suggestions": ["Review for professional tone", "Ensure clear action items"],
-                    "quick_tips": ["Keep communication respectful", "Be clear and concise"],
-                    "analysis_text": claude_response,
-                    "claude_powered": True,
-                    "analysis_timestamp": datetime.now().isoformat()
-                }
+            except Exception as e:
+                # Error fallback
+                return email_analysis_error(e)
 
-        except Exception as e:
-            # Error fallback
-            return {
-                "overall_score": 1,
-                "overall_feedback": f"Analysis failed: {str(e)}",
-                "code_compliance": {"status": "ERROR", "issues": [f"Analysis error: {str(e)}"], "risk_level": "high"},
-                "channel_recommendation": {"current": "email", "recommended": "in_person",
-                                           "reasoning": "Analysis unavailable - consider direct discussion"},
-                "disc_scores": {"D": 1, "I": 1, "S": 1, "C": 1},
-                "disc_feedback": {"D": "Analysis failed", "I": "Analysis failed", "S": "Analysis failed",
-                                  "C": "Analysis failed"},
-                "suggestions": ["Analysis service unavailable", "Please try again later"],
-                "quick_tips": ["practical communication tips"]
-}
+        # Identical emails are answered from the cache (or share an in-flight call)
+        cache_key = email_cache_key(email_content, email_subject, colleague_info, self.model)
+        return get_analysis_cache().get_or_compute(cache_key, analyze)
 
     # ============================================
     # CONVERSATION ORCHESTRATOR
@@ -323,6 +241,155 @@ You are starting a conversation. Introduce yourself briefly and set the scene ba
             user_message
         )
 
+# ============================================
+# EMAIL ANALYSIS HELPERS
+# ============================================
+
+EMAIL_ANALYSIS_MAX_TOKENS = 1000
+
+def build_email_analysis_prompt(email_content: str, email_subject: str, colleague_info: Dict = None) -> str:
+    """Build the Code of Conduct analysis prompt for one email"""
+    # Build colleague context
+    colleague_context = ""
+    if colleague_info:
+        colleague_name = colleague_info.get('name', 'colleague')
+        colleague_role = colleague_info.get('role', 'team member')
+        colleague_personality = colleague_info.get('personality', 'professional colleague')
+        colleague_context = f"""
+    RECIPIENT CONTEXT:
+    - Name: {colleague_name}
+    - Role: {colleague_role}  
+    - Communication Style: {colleague_personality}
+    """
+
+    # System prompt for Lake Macquarie Code of Conduct
+    analysis_prompt = f"""You are a professional communication advisor for Lake Macquarie City Council staff.
+    
+    CRITICAL: Assess this email against Lake Macquarie Council's Code of Conduct standards:
+    - Must not bring Council into disrepute
+    - Must not involve intimidation or verbal abuse
+    - Must not constitute harassment or bullying behaviour  
+    - Must be lawful and honest
+    - Must consider issues consistently, promptly and fairly
+    
+    Core Values: Leading at all levels, Working together, Shaping our future
+    
+    {colleague_context}
+    
+    EMAIL TO ANALYZE:
+    Subject: {email_subject}
+    
+    Content: {email_content}
+    
+    Please analyze and respond with a JSON object containing:
+    {{
+        "overall_score": (number 1-10),
+        "overall_feedback": "brief assessment",
+        "code_compliance": {{
+            "status": "PASS" or "FAIL",
+            "issues": ["list of any compliance issues"],
+            "risk_level": "low" or "medium" or "high"
+        }},
+        "channel_recommendation": {{
+            "current": "email",
+            "recommended": "email" or "phone" or "in_person",
+            "reasoning": "explanation for recommendation"
+        }},
+        "disc_scores": {{
+            "D": (number 1-10),
+            "I": (number 1-10), 
+            "S": (number 1-10),
+            "C": (number 1-10)
+        }},
+        "disc_feedback": {{
+            "D": "feedback on directness/assertiveness",
+            "I": "feedback on interpersonal/collaborative tone",
+            "S": "feedback on supportiveness/patience", 
+            "C": "feedback on detail/accuracy"
+        }},
+        "suggestions": ["specific improvement recommendations"],
+        "quick_tips": ["practical communication tips"]
+    }}
+    
+    If email contains inappropriate language, harassment, or unprofessional content, score 1-3 and mark code_compliance as "FAIL"."""
+
+    return analysis_prompt
+
+
+def build_email_analysis_request(model: str, email_content: str, email_subject: str,
+                                 colleague_info: Dict = None) -> Dict:
+    """Claude messages payload for one email analysis (live, streamed or batched)"""
+    return {
+        'model': model,
+        'max_tokens': EMAIL_ANALYSIS_MAX_TOKENS,
+        'messages': [
+            {
+                'role': 'user',
+                'content': build_email_analysis_prompt(email_content, email_subject, colleague_info)
+            }
+        ]
+    }
+
+
+def parse_email_analysis(claude_response: str) -> Dict:
+    """
+    Turn Claude's analysis reply into a result dict
+    A reply wrapped in a ```json fence still parses; a broken or truncated one
+    keeps every section that did parse (marked `partial`) on top of the fallback
+    """
+    # Try to parse JSON response
+    try:
+        analysis_result = json.loads(claude_response)
+        analysis_result['claude_powered'] = True
+        analysis_result['analysis_timestamp'] = datetime.now().isoformat()
+        return analysis_result
+    except json.JSONDecodeError:
+        parser = IncrementalJSONObject()
+        recovered = dict(parser.feed(claude_response))
+        if parser.complete:
+            # Valid object with some wrapping around it
+            recovered['claude_powered'] = True
+            recovered['analysis_timestamp'] = datetime.now().isoformat()
+            return recovered
+
+        # Fallback if Claude doesn't return valid JSON
+        fallback = {
+            "overall_score": 5,
+            "overall_feedback": "Analysis completed - see detailed feedback",
+            "code_compliance": {"status": "UNKNOWN", "issues": [], "risk_level": "medium"},
+            "channel_recommendation": {"current": "email", "recommended": "email",
+                                       "reasoning": "Standard email communication"},
+            "disc_scores": {"D": 5, "I": 5, "S": 5, "C": 5},
+            "disc_feedback": {"D": "Analysis completed", "I": "Analysis completed", "S": "Analysis completed",
+                              "C": "Analysis completed"},
+            "suggestions": ["Review for professional tone", "Ensure clear action items"],
+            "quick_tips": ["Keep communication respectful", "Be clear and concise"],
+            "analysis_text": claude_response,
+            "claude_powered": True,
+            "analysis_timestamp": datetime.now().isoformat()
+        }
+        if recovered:
+            fallback.update(recovered)
+            fallback['partial'] = True
+        return fallback
+
+
+def email_analysis_error(error: Exception) -> Dict:
+    """Fallback analysis result when the Claude call itself failed"""
+    return {
+        "overall_score": 1,
+        "overall_feedback": f"Analysis failed: {str(error)}",
+        "code_compliance": {"status": "ERROR", "issues": [f"Analysis error: {str(error)}"], "risk_level": "high"},
+        "channel_recommendation": {"current": "email", "recommended": "in_person",
+                                   "reasoning": "Analysis unavailable - consider direct discussion"},
+        "disc_scores": {"D": 1, "I": 1, "S": 1, "C": 1},
+        "disc_feedback": {"D": "Analysis failed", "I": "Analysis failed", "S": "Analysis failed",
+                          "C": "Analysis failed"},
+        "suggestions": ["Analysis service unavailable", "Please try again later"],
+        "quick_tips": ["practical communication tips"]
+    }
+
+
 # ============================================
 # HELPER FUNCTIONS
 # ============================================
@@ -0,0 +1,319 @@
+"""
+Shared HTTP transport for the Claude API
+One pooled, kept-alive connection set used by every Claude call site
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import get_config
+from api.codec import dumps, loads
+from api.prompt_caching import merge_stream_usage
+from api.admission import AdmissionController, estimate_request_tokens, get_admission_controller, usage_tokens
+from api.upstream_health import UpstreamMonitor, get_upstream_monitor
+from api.metrics import observe_upstream, record_token_usage
+from api.request_log import get_logger
+from api.resilience import (
+    BREAKER_FAILURE_STATUS, RETRYABLE_STATUS, CircuitBreaker, CircuitOpenError, RetryPolicy,
+    get_circuit_breaker, get_retry_policy, parse_retry_after
+)
+
+log = get_logger('claude_transport')
+
+
+class ClaudeTransport:
+    """
+    Pooled HTTP transport for the Claude messages endpoint
+    Think of this as a phone line that stays open between calls,
+    so each conversation turn skips the TCP and TLS handshake
+    """
+
+    def __init__(self, api_key: str = None, base_url: str = None, pool_size: int = None, timeout: float = None,
+                 retry_policy: RetryPolicy = None, breaker: CircuitBreaker = None,
+                 admission: AdmissionController = None, monitor: UpstreamMonitor = None):
+        """Create the shared session and mount a sized connection pool"""
+        config = get_config()
+        self.api_key = api_key if api_key is not None else config.CLAUDE_API_KEY
+        self.base_url = base_url or config.CLAUDE_API_URL
+        self.pool_size = pool_size or config.CLAUDE_POOL_SIZE
+        self.timeout = timeout or config.CLAUDE_TIMEOUT
+        self.retry_policy = retry_policy or get_retry_policy()
+        self.breaker = breaker or get_circuit_breaker()
+        self.admission = admission or get_admission_controller()
+        self.monitor = monitor or get_upstream_monitor()
+
+        # urllib3 pools are thread-safe, so one session serves every gunicorn thread
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=False)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def headers(self) -> Dict:
+        """Standard headers for every Claude request"""
+        return {
+            'Content-Type': 'application/json',
+            'x-api-key': self.api_key or '',
+            'anthropic-version': '2023-06-01'
+        }
+
+    def post_messages(self, payload: Dict, timeout: Optional[float] = None) -> requests.Response:
+        """
+        POST a messages payload to Claude over the pooled session
+        Returns the raw response so callers keep their own status handling
+        (retryable failures are retried first - see _send_with_retry)
+
+        The call waits for an admission slot first; raises AdmissionTimeoutError
+        if none frees up within the queue timeout.
+        """
+        ticket = self.admission.acquire(estimate_request_tokens(payload))
+        actual_tokens = None
+        body = dumps(payload)  # Serialised once, with the fast encoder, however many attempts it takes
+        try:
+            response = self._send_with_retry(lambda request_timeout: self.session.post(
+                self.base_url,
+                headers=self.headers(),
+                data=body,
+                timeout=request_timeout
+            ), timeout)
+            if response.status_code == 200:
+                try:
+                    usage = loads(response.content).get('usage')
+                except ValueError:
+                    usage = None
+                actual_tokens = usage_tokens(usage)
+                record_token_usage(usage)
+            return response
+        finally:
+            ticket.release(actual_tokens)
+
+    def open_stream(self, payload: Dict, timeout: Optional[float] = None) -> requests.Response:
+        """
+        POST a streaming messages request and return the open response
+        Check status_code first, then read events with iter_stream_events()
+        (a successful stream keeps its admission slot until it is fully read)
+        """
+        ticket = self.admission.acquire(estimate_request_tokens(payload))
+        body = dumps(dict(payload, stream=True))
+        try:
+            response = self._send_with_retry(lambda request_timeout: self.session.post(
+                self.base_url,
+                headers=self.headers(),
+                data=body,
+                timeout=request_timeout,
+                stream=True
+            ), timeout)
+        except Exception:
+            ticket.release()
+            raise
+
+        if response.status_code == 200:
+            response.admission_ticket = ticket
+        else:
+            ticket.release()
+        return response
+
+    def batches_request(self, method: str, path: str = '', payload: Dict = None,
+                        timeout: Optional[float] = None) -> requests.Response:
+        """
+        Call the Message Batches API (POST to create, GET to poll)
+        Batches run on Anthropic's side under their own limits, so no admission
+        slot is taken and the live rate-limit picture is left alone
+        """
+        url = f"{self.base_url.rstrip('/')}/batches{path}"
+        return self._send_with_retry(lambda request_timeout: self.session.request(
+            method,
+            url,
+            headers=self.headers(),
+            json=payload,
+            timeout=request_timeout
+        ), timeout, observe=False)
+
+    def fetch_batch_results(self, results_url: str, timeout: Optional[float] = None) -> requests.Response:
+        """Download a finished batch's JSONL results"""
+        return self._send_with_retry(lambda request_timeout: self.session.get(
+            results_url,
+            headers=self.headers(),
+            timeout=request_timeout
+        ), timeout, observe=False)
+
+    def _send_with_retry(self, send: Callable[[float], requests.Response], timeout: Optional[float] = None,
+                         observe: bool = True) -> requests.Response:
+        """
+        Run `send` with jittered backoff on 429/5xx/529 and request errors
+        Every attempt fits inside the request deadline. Raises CircuitOpenError
+        while the breaker is open; after the last attempt the final response
+        is returned as-is (or the last connection error is raised).
+        `observe=False` keeps the response out of admission control's rate-limit view.
+        """
+        policy = self.retry_policy
+        deadline = time.monotonic() + policy.deadline
+        attempt = 0
+
+        while True:
+            if not self.breaker.allow_request():
+                raise CircuitOpenError(self.breaker.retry_after())
+
+            remaining = deadline - time.monotonic()
+            response = None
+            started = time.monotonic()
+            try:
+                response = send(max(1.0, min(timeout or self.timeout, remaining)))
+            except requests.RequestException as e:
+                self.breaker.record_failure()
+                self.monitor.record(time.monotonic() - started, error=e)
+                observe_upstream(time.monotonic() - started, error=e)
+                error = e
+            except BaseException:
+                self.breaker.release_probe()  # Says nothing about the upstream, but mustn't hold the probe slot
+                raise
+            else:
+                self.monitor.record(time.monotonic() - started, status_code=response.status_code)
+                observe_upstream(time.monotonic() - started, status_code=response.status_code)
+                if observe:
+                    self.admission.observe(response.status_code, response.headers)
+                # Any answer other than a 5xx/529 proves the upstream is up (429 is just our quota)
+                if response.status_code in BREAKER_FAILURE_STATUS:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                if response.status_code not in RETRYABLE_STATUS:
+                    return response
+
+            attempt += 1
+            retry_after = parse_retry_after(response.headers.get('retry-after')) if response is not None else None
+            delay = policy.backoff(attempt, retry_after)
+
+            if attempt >= policy.max_attempts or time.monotonic() + delay >= deadline:
+                if response is not None:
+                    return response
+                raise error
+
+            status = response.status_code if response is not None else type(error).__name__
+            log.warning('claude_retry', status=status, attempt=attempt, max_retries=policy.max_attempts - 1,
+                        delay_seconds=round(delay, 2))
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+
+    def probe(self, timeout: float = 5.0) -> requests.Response:
+        """
+        Cheap upstream check for the health prober
+        Token counting is free and still exercises DNS, TLS, auth and the API itself.
+        Bypasses retries, the breaker and admission - the monitor records the result
+        """
+        return self.session.post(
+            f"{self.base_url.rstrip('/')}/count_tokens",
+            headers=self.headers(),
+            json={'model': get_config().CLAUDE_MODEL, 'messages': [{'role': 'user', 'content': 'ping'}]},
+            timeout=timeout
+        )
+
+    def warm_up(self, connections: int = None) -> int:
+        """
+        Open connections ahead of the first real request
+        A cheap HEAD per connection completes the TLS handshake and leaves
+        the socket in the pool. Returns how many connections were warmed.
+        """
+        count = min(connections or get_config().CLAUDE_POOL_WARM, self.pool_size)
+        warmed = []
+
+        def _open():
+            try:
+                self.session.head(self.base_url, timeout=5)
+                warmed.append(1)
+            except requests.RequestException:
+                pass  # Warming is best effort - real requests will connect on demand
+
+        threads = [threading.Thread(target=_open, daemon=True) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(warmed)
+
+    def warm_up_async(self, connections: int = None) -> threading.Thread:
+        """Warm the pool on a background thread so boot is never blocked"""
+        thread = threading.Thread(target=self.warm_up, args=(connections,), daemon=True, name='claude-warmup')
+        thread.start()
+        return thread
+
+    def close(self):
+        """Close every pooled connection"""
+        self.session.close()
+
+
+# ============================================
+# STREAMING HELPERS
+# ============================================
+
+def iter_stream_events(response: requests.Response) -> Iterator[Dict]:
+    """
+    Parse Claude's server-sent event stream into event dictionaries
+    Each yielded dict is the decoded `data:` payload (it carries its own 'type')
+    """
+    usage = {}
+    try:
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue  # Skip blank separators and `event:` lines
+            data = line[5:].strip()
+            if not data:
+                continue
+            try:
+                event = loads(data)
+            except ValueError:
+                continue
+            merge_stream_usage(usage, event)
+            yield event
+            if event.get('type') in ('message_stop', 'error'):
+                break
+    finally:
+        response.close()  # Hand the connection back to the pool
+        record_token_usage(usage)
+        ticket = getattr(response, 'admission_ticket', None)
+        if ticket:
+            ticket.release(usage_tokens(usage))
+
+
+def stream_text_deltas(events: Iterator[Dict], usage: Dict = None) -> Iterator[str]:
+    """
+    Reduce a Claude event stream to just the text chunks
+    Pass a dict as `usage` to have token counts (incl. cache reads/writes) filled in
+    """
+    for event in events:
+        if usage is not None:
+            merge_stream_usage(usage, event)
+        if event.get('type') == 'content_block_delta':
+            text = event.get('delta', {}).get('text')
+            if text:
+                yield text
+        elif event.get('type') == 'error':
+            error = event.get('error', {})
+            raise Exception(f"Claude stream error: {error.get('type', 'error')} - {error.get('message', '')}")
+
+
+def format_sse(event: str, data: Dict) -> str:
+    """Format one server-sent event for the browser"""
+    return f"event: {event}\ndata: {dumps(data).decode('utf-8')}\n\n"
+
+
+# ============================================
+# SHARED INSTANCE
+# ============================================
+
+_transport: Optional[ClaudeTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> ClaudeTransport:
+    """Get the process-wide Claude transport, creating it on first use"""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = ClaudeTransport()
+    return _transport
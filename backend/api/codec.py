@@ -0,0 +1,202 @@
+"""
+Request/response codec for the Conversation Trainer API
+Fast JSON (orjson when installed, the standard library otherwise), typed
+request structs checked in one pass, and gzip / brotli for request and
+response bodies
+
+Conversation histories and Claude payloads grow with every turn, so the
+JSON work here runs on every request and every upstream call
+"""
+
+import gzip
+import json
+import zlib
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli  # Optional - br is only offered when it's installed
+except ImportError:
+    brotli = None
+
+FAST_JSON = orjson is not None
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+
+# ============================================
+# ERRORS
+# ============================================
+
+class RequestBodyError(ValueError):
+    """A request body we can't use - carries the HTTP status to answer with"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class RequestValidationError(RequestBodyError):
+    """The body parsed but a field has the wrong type or is missing"""
+
+    def __init__(self, field: str, message: str):
+        super().__init__(f"Invalid '{field}': {message}", 400)
+        self.field = field
+
+
+# ============================================
+# JSON
+# ============================================
+
+def _default(value):
+    """Types neither encoder knows natively"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON"""
+    if FAST_JSON:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data) -> Any:
+    """Parse JSON from bytes or str (raises ValueError on bad input)"""
+    if FAST_JSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# ============================================
+# COMPRESSION
+# ============================================
+
+def decompress_body(body: bytes, content_encoding: Optional[str], max_bytes: int) -> bytes:
+    """
+    Undo a request's Content-Encoding (gzip, or br with brotli installed)
+    Stops at `max_bytes` of output, so a tiny compressed body can't unpack
+    into gigabytes
+    """
+    encoding = (content_encoding or 'identity').strip().lower()
+    if encoding in ('', 'identity'):
+        data = body
+    elif encoding in ('gzip', 'x-gzip'):
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            data = inflater.decompress(body, max_bytes + 1)
+        except zlib.error as e:
+            raise RequestBodyError(f"Corrupt gzip body: {e}")
+    elif encoding == 'br' and brotli:
+        try:
+            data = brotli.decompress(body)  # No streaming limit in the brotli bindings - checked below
+        except brotli.error as e:
+            raise RequestBodyError(f"Corrupt brotli body: {e}")
+    else:
+        raise RequestBodyError(f"Unsupported Content-Encoding '{content_encoding}'", 415)
+
+    if len(data) > max_bytes:
+        raise RequestBodyError(f"Request body larger than {max_bytes} bytes", 413)
+    return data
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best encoding we support from an Accept-Encoding header (br over gzip), or None"""
+    if not accept_encoding:
+        return None
+    offered = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip().lower()] = quality
+    for encoding in SUPPORTED_ENCODINGS:
+        if offered.get(encoding, offered.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str, level: int = 6) -> bytes:
+    """Compress a response body for `encoding` (one of SUPPORTED_ENCODINGS)"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=min(level, 11))
+    return gzip.compress(body, compresslevel=min(level, 9), mtime=0)  # mtime=0 keeps the bytes (and ETags) stable
+
+
+# ============================================
+# TYPED REQUEST STRUCTS
+# ============================================
+
+REQUIRED = object()
+
+
+class RequestStruct:
+    """
+    Base for typed request bodies
+    Think of this as the intake form at the front desk: every field is
+    checked once on the way in, and from then on handlers read attributes
+    instead of chains of .get() with defaults scattered through the code
+
+    Subclasses list FIELDS as (name, accepted type or types, default) and a
+    matching __slots__. A default of REQUIRED makes the field mandatory; a
+    callable default (dict, list) is called for a fresh value. A missing or
+    null field takes its default; unknown fields are ignored.
+    """
+
+    __slots__ = ()
+    FIELDS: Tuple[Tuple[str, Any, Any], ...] = ()
+
+    @classmethod
+    def decode(cls, data: Any) -> 'RequestStruct':
+        if not isinstance(data, dict):
+            raise RequestBodyError('Request body must be a JSON object')
+        struct = cls.__new__(cls)
+        for name, types, default in cls.FIELDS:
+            value = data.get(name)
+            if value is None:
+                if default is REQUIRED:
+                    raise RequestValidationError(name, 'this field is required')
+                value = default() if callable(default) else default
+            elif not isinstance(value, types) or (isinstance(value, bool) and bool not in _as_tuple(types)):
+                raise RequestValidationError(name, f"expected {_type_names(types)}, got {_json_type(value)}")
+            setattr(struct, name, value)
+        return struct
+
+    @classmethod
+    def from_json(cls, body: bytes) -> 'RequestStruct':
+        """Parse and check a raw JSON body"""
+        try:
+            data = loads(body) if body else {}
+        except ValueError as e:
+            raise RequestBodyError(f"Malformed JSON: {e}")
+        return cls.decode(data)
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name, _, _ in self.FIELDS}
+
+
+def _as_tuple(types) -> tuple:
+    return types if isinstance(types, tuple) else (types,)
+
+
+def _type_names(types) -> str:
+    names = {str: 'string', bool: 'boolean', int: 'integer', float: 'number', dict: 'object', list: 'array'}
+    return ' or '.join(names.get(t, t.__name__) for t in _as_tuple(types))
+
+
+def _json_type(value) -> str:
+    return _type_names(type(value)) if type(value) in (str, bool, int, float, dict, list) else type(value).__name__
@@ -0,0 +1,267 @@
+"""
+Token-budgeted conversation context
+The newest turns go to Claude word for word until a token budget is full;
+older turns are folded into a running summary written in the background,
+so long role-plays keep their memory while the prompt stays bounded
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from api.request_log import get_logger
+
+log = get_logger('context_window')
+
+CHARS_PER_TOKEN = 4      # Same rough rate as admission.estimate_request_tokens
+TURN_OVERHEAD_TOKENS = 4  # Role markers and separators per message
+CLAUDE_ROLES = {'user': 'user', 'ai_personality': 'assistant'}
+SUMMARY_BACKOFF_SECONDS = 5.0
+SUMMARY_BACKOFF_MAX = 120.0
+
+SUMMARY_INSTRUCTIONS = (
+    "You keep the running notes for a workplace role-play between a trainee (USER) and {name}. "
+    "Update the notes with the new turns below. Keep facts, names, numbers, commitments, open "
+    "questions and how {name}'s mood and position have shifted. Write plain prose in the third "
+    "person, under {words} words. Reply with the notes only."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a piece of text (about 4 characters per token)"""
+    return len(text or '') // CHARS_PER_TOKEN + TURN_OVERHEAD_TOKENS
+
+
+def turn_content(turn) -> str:
+    """Text of a history turn - a frontend dict or a ConversationMessage"""
+    if isinstance(turn, dict):
+        return str(turn.get('content') or '')
+    return str(getattr(turn, 'content', '') or '')
+
+
+def turn_sender_type(turn) -> str:
+    if isinstance(turn, dict):
+        return turn.get('sender_type', 'user')
+    return getattr(turn, 'sender_type', 'user')
+
+
+def claude_message(turn) -> Optional[Dict]:
+    """A history turn as a Claude `messages` entry (None for senders Claude shouldn't see)"""
+    role = CLAUDE_ROLES.get(turn_sender_type(turn))
+    return {"role": role, "content": turn_content(turn)} if role else None
+
+
+def split_history(turns: List, token_budget: int) -> int:
+    """
+    Index where the word-for-word window starts
+    Newest turns are added until the next one would overflow `token_budget`;
+    the newest turn always makes it in, however long it is
+    """
+    used = 0
+    start = len(turns)
+    for index in range(len(turns) - 1, -1, -1):
+        cost = estimate_tokens(turn_content(turns[index]))
+        if used + cost > token_budget and start < len(turns):
+            break
+        used += cost
+        start = index
+    return start
+
+
+def format_transcript(turns: List, character_name: str) -> str:
+    """Turns as 'USER: ...' / 'Name: ...' lines for the summary prompt"""
+    lines = []
+    for turn in turns:
+        speaker = 'USER' if turn_sender_type(turn) == 'user' else character_name
+        lines.append(f"{speaker}: {turn_content(turn)}")
+    return '\n'.join(lines)
+
+
+def build_summary_request(model: str, character_name: str, previous_summary: Optional[str],
+                          new_turns: List, max_tokens: int) -> Dict:
+    """Claude messages payload that folds `new_turns` into the running summary"""
+    notes = previous_summary or '(none yet - this is the start of the conversation)'
+    return {
+        "model": model,
+        "max_tokens": max_tokens,
+        "system": SUMMARY_INSTRUCTIONS.format(name=character_name, words=max(50, int(max_tokens * 0.6))),
+        "messages": [{
+            "role": "user",
+            "content": f"NOTES SO FAR:\n{notes}\n\nNEW TURNS:\n{format_transcript(new_turns, character_name)}"
+        }]
+    }
+
+
+def conversation_key(conversation_id: Optional[str], character_prompt: str, turns: List) -> str:
+    """
+    Who a history belongs to: the client's conversation_id, or failing that
+    the persona plus the first turn (stable for the life of a conversation)
+    """
+    if conversation_id:
+        return f"id:{conversation_id}"
+    first = turn_content(turns[0]) if turns else ''
+    return 'h:' + hashlib.sha256(f"{character_prompt}\x00{first}".encode('utf-8')).hexdigest()
+
+
+def _fingerprint(turns: List, covered: int) -> str:
+    """Identifies the last summarised turn, so an edited or different history isn't mistaken for this one"""
+    if covered <= 0 or covered > len(turns):
+        return ''
+    turn = turns[covered - 1]
+    return hashlib.sha1(f"{turn_sender_type(turn)}\x00{turn_content(turn)}".encode('utf-8')).hexdigest()
+
+
+class ConversationSummarizer:
+    """
+    Rolling summaries of the turns that scrolled out of the context window
+    Think of this as the minute-taker: the persona can't re-read the whole
+    meeting, but it can glance at the minutes before answering
+
+    Summaries are per conversation (LRU, `max_entries`) and are only ever
+    extended: each fold feeds the previous summary plus the newly evicted
+    turns to `summarize`, on a background thread, so no request waits on it.
+    Until a fold lands, the previous summary (if any) is sent with every turn
+    it doesn't cover - the prompt runs over budget for a few turns rather
+    than dropping context.
+
+    Summaries live in this process's memory: with several gunicorn workers
+    each one folds its own copy, and a worker that hasn't seen a long
+    conversation yet starts from the full history.
+    """
+
+    def __init__(self, summarize: Callable[[Optional[str], List, str], str], max_entries: int = 1024,
+                 workers: int = 2, can_summarize: Optional[Callable[[], bool]] = None):
+        """
+        Args:
+            summarize: (previous summary or None, turns to fold in, character name) -> new summary
+                (raises on failure)
+            max_entries: Conversations remembered at once (least recently used are dropped)
+            workers: Concurrent background summaries
+            can_summarize: Returns False while live traffic should have Claude to itself
+        """
+        self.summarize = summarize
+        self.max_entries = max_entries
+        self.workers = workers
+        self.can_summarize = can_summarize or (lambda: True)
+
+        self._summaries: 'OrderedDict[str, tuple]' = OrderedDict()  # key -> (covered, fingerprint, summary)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._failure_streak = 0
+        self._quiet_until = 0.0
+
+        self.folds = 0
+        self.failed = 0
+        self.deferred = 0
+        self.turns_summarised = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def build(self, key: str, turns: List, token_budget: int,
+              character_name: str = 'the character') -> Tuple[Optional[str], List]:
+        """
+        (summary or None, turns to send word for word) for one request
+        Schedules a background fold when turns have left the window unsummarised;
+        those turns are still sent word for word until the fold covers them
+        """
+        summary, first = self.window(key, turns, split_history(turns, token_budget), character_name)
+        return summary, turns[first:]
+
+    def window(self, key: str, turns: List, start: int,
+               character_name: str = 'the character') -> Tuple[Optional[str], int]:
+        """
+        build() for a caller that already knows where the budget window starts:
+        (summary or None, index of the first turn to send word for word)
+        """
+        if not self.enabled or start == 0:
+            return None, start
+
+        covered, summary = self.current(key, turns)
+        if covered < start:
+            self._schedule(key, turns[:start], covered, summary, character_name)
+        return summary, covered
+
+    def current(self, key: str, turns: List) -> Tuple[int, Optional[str]]:
+        """(turns covered, summary) that still matches this history, else (0, None)"""
+        with self._lock:
+            entry = self._summaries.get(key)
+            if entry is None:
+                return 0, None
+            covered, fingerprint, summary = entry
+            if fingerprint != _fingerprint(turns, covered):
+                del self._summaries[key]  # History was edited or restarted under the same key
+                return 0, None
+            self._summaries.move_to_end(key)
+            return covered, summary
+
+    def snapshot(self) -> Dict:
+        """Summarizer stats for /health"""
+        with self._lock:
+            return {
+                'conversations': len(self._summaries),
+                'pending': len(self._pending),
+                'folds': self.folds,
+                'failed': self.failed,
+                'deferred': self.deferred,
+                'turns_summarised': self.turns_summarised
+            }
+
+    # ---------- internals ----------
+
+    def _schedule(self, key: str, older_turns: List, covered: int, summary: Optional[str], character_name: str):
+        if time.monotonic() < self._quiet_until or not self.can_summarize():
+            self.deferred += 1  # Try again on the conversation's next turn
+            return
+        executor = self._get_executor()
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        executor.submit(self._fold, key, list(older_turns), covered, summary, character_name)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Worker threads don't survive a gunicorn fork - make a new pool in each process"""
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self._pending = set()
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='conversation-summary')
+        return self._executor
+
+    def _fold(self, key: str, older_turns: List, covered: int, summary: Optional[str], character_name: str):
+        try:
+            new_summary = (self.summarize(summary, older_turns[covered:], character_name) or '').strip()
+        except Exception as e:
+            new_summary = None
+            log.warning('summary_failed', error=e)
+
+        with self._lock:
+            self._pending.discard(key)
+            if not new_summary:
+                self.failed += 1
+                self._failure_streak += 1
+                backoff = min(SUMMARY_BACKOFF_MAX, SUMMARY_BACKOFF_SECONDS * 2 ** self._failure_streak)
+                self._quiet_until = time.monotonic() + backoff
+                return
+
+            self._failure_streak = 0
+            existing = self._summaries.get(key)
+            if existing is not None and existing[0] >= len(older_turns):
+                return  # A newer fold already landed
+            self._summaries[key] = (len(older_turns), _fingerprint(older_turns, len(older_turns)), new_summary)
+            self._summaries.move_to_end(key)
+            while len(self._summaries) > self.max_entries:
+                self._summaries.popitem(last=False)
+            self.folds += 1
+            self.turns_summarised += len(older_turns) - covered
+        log.info('summary_folded', turns=len(older_turns) - covered)
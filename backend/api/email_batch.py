@@ -0,0 +1,216 @@
+"""
+Batch email analysis
+Scores a whole class's practice emails in one request: live mode fans the
+analyses out in parallel and streams each result as it finishes, deferred
+mode hands them to Claude's Message Batches API for cheaper offline scoring
+"""
+
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from api.claude_integration import build_email_analysis_request, parse_email_analysis, email_analysis_error
+
+# Message Batches custom_id rules (also used to sanity-check batch ids before they go in a URL)
+CUSTOM_ID_PATTERN = re.compile(r'^[a-zA-Z0-9_-]{1,64}$')
+
+
+# ============================================
+# REQUEST PARSING
+# ============================================
+
+def parse_batch_emails(data: Dict, max_emails: int) -> Tuple[Optional[List[Dict]], Optional[str]]:
+    """
+    Validate a batch request body
+    Returns (items, None) or (None, error message). Each item gets an `index`
+    and an `id` (the caller's id when it is a valid, unique batch custom_id)
+    """
+    emails = (data or {}).get('emails')
+    if not isinstance(emails, list) or not emails:
+        return None, 'emails must be a non-empty list'
+    if len(emails) > max_emails:
+        return None, f'A batch can hold at most {max_emails} emails'
+    default_colleague = data.get('colleague') or {}
+    if not isinstance(default_colleague, dict):
+        return None, 'colleague must be an object'
+
+    items = []
+    seen_ids = set()
+    for index, email in enumerate(emails):
+        if not isinstance(email, dict) or not email.get('content'):
+            return None, f'Email {index} has no content'
+        if not isinstance(email['content'], str) or not isinstance(email.get('subject') or '', str):
+            return None, f'Email {index}: content and subject must be strings'
+        if not isinstance(email.get('colleague') or {}, dict):
+            return None, f'Email {index}: colleague must be an object'
+
+        email_id = str(email.get('id', ''))
+        if not CUSTOM_ID_PATTERN.match(email_id) or email_id in seen_ids:
+            email_id = f'email-{index}'
+        seen_ids.add(email_id)
+
+        items.append({
+            'index': index,
+            'id': email_id,
+            'subject': email.get('subject') or '',
+            'content': email['content'],
+            'colleague': email.get('colleague') or default_colleague
+        })
+    return items, None
+
+
+def batch_item_result(item: Dict, analysis: Dict) -> Dict:
+    """One streamed result - analyze_email_professional reports failures as an ERROR analysis"""
+    return {
+        'index': item['index'],
+        'id': item['id'],
+        'success': analysis.get('code_compliance', {}).get('status') != 'ERROR',
+        'analysis': analysis
+    }
+
+
+# ============================================
+# LIVE MODE (PARALLEL FAN-OUT)
+# ============================================
+
+def run_email_batch(claude_client, items: List[Dict], concurrency: int) -> Iterator[Dict]:
+    """
+    Analyze every email on a small thread pool, yielding results as they complete
+    The shared transport's admission control still caps what reaches Claude,
+    so a big batch queues politely behind live conversations
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(items))),
+                                  thread_name_prefix='email-batch')
+    try:
+        futures = {
+            executor.submit(claude_client.analyze_email_professional,
+                            email_content=item['content'],
+                            email_subject=item['subject'],
+                            colleague_info=item['colleague']): item
+            for item in items
+        }
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                analysis = future.result()
+            except Exception as e:
+                analysis = email_analysis_error(e)
+            yield batch_item_result(item, analysis)
+    finally:
+        # Client went away (or we're done) - don't start emails nobody will read
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_email_batch_async(async_client, items: List[Dict], concurrency: int) -> AsyncIterator[Dict]:
+    """Async twin of run_email_batch (a semaphore instead of a thread pool)"""
+    import asyncio  # Only the ASGI path gets here - keeps it out of the Flask app's import time
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def analyze(item):
+        async with semaphore:
+            try:
+                analysis = await async_client.analyze_email_professional(
+                    email_content=item['content'],
+                    email_subject=item['subject'],
+                    colleague_info=item['colleague']
+                )
+            except Exception as e:
+                analysis = email_analysis_error(e)
+        return batch_item_result(item, analysis)
+
+    tasks = [asyncio.ensure_future(analyze(item)) for item in items]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def summarise_batch(results: List[Dict], elapsed: float) -> Dict:
+    """Totals sent after the last result"""
+    succeeded = sum(1 for r in results if r['success'])
+    return {
+        'count': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'elapsed_seconds': round(elapsed, 3)
+    }
+
+
+# ============================================
+# DEFERRED MODE (MESSAGE BATCHES API)
+# ============================================
+
+def build_batch_requests(items: List[Dict], model: str) -> List[Dict]:
+    """One Message Batches request per email, keyed by the item id"""
+    return [{
+        'custom_id': item['id'],
+        'params': build_email_analysis_request(model, item['content'], item['subject'], item['colleague'])
+    } for item in items]
+
+
+def describe_batch(batch: Dict) -> Dict:
+    """The parts of a Message Batch object worth showing a facilitator"""
+    return {
+        'batch_id': batch.get('id'),
+        'processing_status': batch.get('processing_status'),
+        'request_counts': batch.get('request_counts', {}),
+        'created_at': batch.get('created_at'),
+        'ended_at': batch.get('ended_at'),
+        'expires_at': batch.get('expires_at')
+    }
+
+
+def submit_deferred_batch(transport, items: List[Dict], model: str) -> Dict:
+    """Create a Message Batch; raises on an API error"""
+    response = transport.batches_request('POST', payload={'requests': build_batch_requests(items, model)})
+    if response.status_code != 200:
+        raise Exception(f"Claude batch API error: {response.status_code} - {response.text}")
+    return describe_batch(response.json())
+
+
+def get_deferred_batch(transport, batch_id: str) -> Dict:
+    """Poll a Message Batch, and include the parsed analyses once it has ended (LookupError if unknown)"""
+    if not CUSTOM_ID_PATTERN.match(batch_id or ''):
+        raise LookupError(f"Batch {batch_id} not found")
+
+    response = transport.batches_request('GET', f'/{batch_id}')
+    if response.status_code == 404:
+        raise LookupError(f"Batch {batch_id} not found")
+    if response.status_code != 200:
+        raise Exception(f"Claude batch API error: {response.status_code} - {response.text}")
+
+    batch = response.json()
+    result = describe_batch(batch)
+    if batch.get('processing_status') == 'ended' and batch.get('results_url'):
+        results_response = transport.fetch_batch_results(batch['results_url'])
+        if results_response.status_code != 200:
+            raise Exception(f"Claude batch results error: {results_response.status_code}")
+        result['results'] = parse_batch_results(results_response.text)
+    return result
+
+
+def parse_batch_results(jsonl: str) -> List[Dict]:
+    """Turn the batch results file into the same result shape live mode streams"""
+    results = []
+    for line in jsonl.splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        outcome = entry.get('result', {})
+
+        if outcome.get('type') == 'succeeded':
+            analysis = parse_email_analysis(outcome['message']['content'][0]['text'])
+        else:
+            error = outcome.get('error', {}).get('error', outcome.get('error', {}))
+            analysis = email_analysis_error(Exception(f"batch request {outcome.get('type', 'failed')}: "
+                                                      f"{error.get('message', '') if isinstance(error, dict) else error}"))
+
+        results.append({
+            'id': entry.get('custom_id'),
+            'success': outcome.get('type') == 'succeeded',
+            'analysis': analysis
+        })
+    return results
@@ -0,0 +1,90 @@
+"""
+Progressive email analysis streaming
+Parses Claude's analysis JSON as the tokens arrive and sends each section
+(overall score, code compliance, DISC scores, suggestions...) to the
+browser as soon as it is complete
+"""
+
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from api.claude_integration import parse_email_analysis
+from api.claude_transport import format_sse
+from api.incremental_json import IncrementalJSONObject
+
+# Bookkeeping fields that aren't sections of the analysis itself
+NON_SECTION_FIELDS = ('claude_powered', 'analysis_timestamp', 'cached', 'partial', 'analysis_text')
+
+
+class ProgressiveAnalysis:
+    """
+    State for one streamed analysis: feed it text, get SSE events back
+    Think of this as a typesetter sending each finished section of the
+    report to print while the rest is still being written
+
+    Shared by the Flask (sync) and ASGI (async) streaming routes.
+    Events: `section` ({name, value}) per completed section, then `done`
+    with the assembled analysis - partial if the reply broke part way.
+    """
+
+    def __init__(self):
+        self.parser = IncrementalJSONObject()
+        self.parts: List[str] = []
+        self.sections: Dict = {}
+        self.started = time.perf_counter()
+        self.first_section_ms: Optional[float] = None
+        self.analysis: Optional[Dict] = None  # Set by finish()
+
+    def feed(self, text: str) -> Iterator[str]:
+        """Take one text delta; yields a `section` event for each section it completed"""
+        self.parts.append(text)
+        for name, value in self.parser.feed(text):
+            if self.first_section_ms is None:
+                self.first_section_ms = self._elapsed_ms()
+            self.sections[name] = value
+            yield format_sse('section', {'name': name, 'value': value})
+
+    def finish(self, error: Exception = None) -> str:
+        """
+        The `done` event: the full analysis if the reply parsed, otherwise the
+        sections we did get on top of the standard fallback (marked partial)
+        """
+        analysis = parse_email_analysis(''.join(self.parts))
+        if self.sections and (error is not None or 'analysis_text' in analysis):
+            analysis.update(self.sections)
+            analysis['partial'] = True
+        self.analysis = analysis
+
+        done = {
+            'success': True,
+            'analysis': analysis,
+            'partial': bool(analysis.get('partial')),
+            'sections_streamed': list(self.sections),
+            'first_section_ms': self.first_section_ms,
+            'total_ms': self._elapsed_ms(),
+            'timestamp': datetime.now().isoformat()
+        }
+        if error is not None:
+            done['error'] = f'Analysis stream interrupted: {error}'
+        return format_sse('done', done)
+
+    def _elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 1)
+
+
+def replay_cached_analysis(analysis: Dict) -> Iterator[str]:
+    """A cached analysis goes out as the same section/done events, all at once"""
+    sections = [name for name in analysis if name not in NON_SECTION_FIELDS]
+    for name in sections:
+        yield format_sse('section', {'name': name, 'value': analysis[name]})
+    yield format_sse('done', {
+        'success': True,
+        'analysis': analysis,
+        'partial': False,
+        'cached': True,
+        'sections_streamed': sections,
+        'first_section_ms': 0.0,
+        'total_ms': 0.0,
+        'timestamp': datetime.now().isoformat()
+    })
@@ -0,0 +1,95 @@
+"""
+HTTP caching for catalog responses
+The persona and scenario lists are the same for every page load - they are
+serialised (and compressed) once per catalog version and answered with a
+strong ETag, so a browser that already has them gets a bodiless 304
+"""
+
+import hashlib
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from api.codec import compress
+
+
+def strong_etag(body: bytes) -> str:
+    """Quoted content hash - equal ETags mean byte-identical bodies"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Does an If-None-Match header cover `etag`?
+    Uses the weak comparison RFC 9110 asks for here (a W/ prefix is ignored)
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class CatalogResponse:
+    """
+    One precomputed JSON response and its ETag
+    Think of this as the printed brochure at reception: it's reprinted only
+    when the catalog behind it changes, not for every visitor
+
+    `version()` must be cheap (it runs on every request) and change whenever
+    `build()` would return something different; `serialize` turns the payload
+    into the exact bytes sent. Compressed copies are made on first request per
+    encoding, each with its own ETag (the bytes differ, so strong ETags must).
+    """
+
+    def __init__(self, build: Callable[[], Dict], version: Callable[[], str],
+                 serialize: Callable[[Dict], bytes], max_age: int = 60,
+                 compress_level: int = 6, compress_min_bytes: int = 1024):
+        self.build = build
+        self.version = version
+        self.serialize = serialize
+        self.max_age = max_age
+        self.compress_level = compress_level
+        self.compress_min_bytes = compress_min_bytes
+
+        # (version, {requested encoding: (body, etag, encoding used)}) - replaced as one on rebuild
+        self._state: Tuple[Optional[str], Dict] = (None, {})
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    @property
+    def cache_control(self) -> str:
+        # Browsers may reuse it briefly, then must check back (a cheap 304 if nothing changed)
+        return f"public, max-age={self.max_age}, must-revalidate"
+
+    def current(self, encoding: Optional[str] = None) -> Tuple[bytes, str, Optional[str]]:
+        """
+        (body, ETag, encoding actually used) for the catalog as it is now
+        Rebuilt only after a version change; bodies too small to be worth
+        compressing are sent as they are
+        """
+        version = self.version()
+        cached_version, variants = self._state
+        if cached_version == version and encoding in variants:
+            return variants[encoding]
+
+        with self._lock:
+            if self._state[0] != version:
+                body = self.serialize(self.build())
+                self._state = (version, {None: (body, strong_etag(body), None)})
+                self.builds += 1
+            variants = self._state[1]
+            if encoding not in variants:
+                identity = variants[None][0]
+                if len(identity) < self.compress_min_bytes:
+                    variants[encoding] = variants[None]
+                else:
+                    body = compress(identity, encoding, self.compress_level)
+                    variants[encoding] = (body, strong_etag(body), encoding)
+            return variants[encoding]
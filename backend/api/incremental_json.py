@@ -0,0 +1,87 @@
+"""
+Incremental JSON object parsing
+Pulls each completed top-level "key": value pair out of a JSON object while
+it is still streaming in, so callers can use sections before the whole
+document (or a broken one) has arrived
+"""
+
+import json
+from typing import Any, List, Tuple
+
+
+class IncrementalJSONObject:
+    """
+    Streaming reader for one JSON object
+    Think of this as reading a report page by page: each finished section
+    can be handed on while the rest is still being written
+
+    Text before the first '{' (a ```json fence, a preamble) is skipped.
+    A member that turns out to be malformed is counted and skipped, and
+    later members still parse.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.started = False
+        self.finished = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.member_start = 0
+        self.members = 0
+        self.malformed = 0
+
+    @property
+    def complete(self) -> bool:
+        """The closing brace arrived and every member parsed"""
+        return self.finished and self.malformed == 0
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """Add more text; returns the (key, value) pairs completed by it, in order"""
+        self.buffer += text
+        completed = []
+
+        while self.pos < len(self.buffer) and not self.finished:
+            ch = self.buffer[self.pos]
+
+            if not self.started:
+                if ch == '{':
+                    self.started = True
+                    self.depth = 1
+                    self.member_start = self.pos + 1
+            elif self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                self.depth += 1
+            elif ch in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    self._complete_member(self.pos, completed)
+                    self.finished = True
+            elif ch == ',' and self.depth == 1:
+                self._complete_member(self.pos, completed)
+                self.member_start = self.pos + 1
+
+            self.pos += 1
+
+        return completed
+
+    def _complete_member(self, end: int, completed: List[Tuple[str, Any]]):
+        member = self.buffer[self.member_start:end].strip()
+        if not member:
+            return
+        try:
+            pair = json.loads('{' + member + '}')
+        except json.JSONDecodeError:
+            self.malformed += 1
+            return
+        self.members += len(pair)
+        completed.extend(pair.items())
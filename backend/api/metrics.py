@@ -0,0 +1,186 @@
+"""
+Prometheus metrics for the Conversation Trainer backend
+Request and Claude upstream latency histograms, token and error counters,
+queue depth and cache hit counters - scraped from GET /metrics
+
+Works across gunicorn workers: when PROMETHEUS_MULTIPROC_DIR is set (see
+gunicorn.conf.py) every worker writes its numbers to that directory and a
+scrape of any worker reports the sum. Without prometheus_client installed,
+every helper here is a no-op.
+"""
+
+import os
+from typing import Dict, Optional
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+    )
+    METRICS_AVAILABLE = True
+except ImportError:
+    METRICS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = 'text/plain; version=0.0.4; charset=utf-8'
+
+ROUTE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+TTFT_BUCKETS = (0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10)
+
+TOKEN_TYPES = {
+    'input_tokens': 'input',
+    'output_tokens': 'output',
+    'cache_read_input_tokens': 'cache_read',
+    'cache_creation_input_tokens': 'cache_write'
+}
+
+
+if METRICS_AVAILABLE:
+    HTTP_REQUESTS = Counter(
+        'conversation_trainer_http_requests_total', 'HTTP requests handled',
+        ['route', 'method', 'status']
+    )
+    HTTP_LATENCY = Histogram(
+        'conversation_trainer_http_request_duration_seconds',
+        'Time to produce a response (streams: time until the stream starts)',
+        ['route', 'method'], buckets=ROUTE_BUCKETS
+    )
+    UPSTREAM_LATENCY = Histogram(
+        'conversation_trainer_claude_request_duration_seconds',
+        'Claude API round trip per attempt (streams: time to response headers)',
+        buckets=UPSTREAM_BUCKETS
+    )
+    UPSTREAM_RESPONSES = Counter(
+        'conversation_trainer_claude_responses_total',
+        'Claude API attempts by status code (or connection error class)',
+        ['status']
+    )
+    UPSTREAM_TTFT = Histogram(
+        'conversation_trainer_claude_time_to_first_token_seconds',
+        'Time from request to first streamed token',
+        ['route'], buckets=TTFT_BUCKETS
+    )
+    TOKENS = Counter(
+        'conversation_trainer_claude_tokens_total', 'Claude tokens used',
+        ['type']
+    )
+    QUEUE_DEPTH = Gauge(
+        'conversation_trainer_claude_queue_depth', 'Requests waiting for a Claude admission slot',
+        multiprocess_mode='livesum'
+    )
+    IN_FLIGHT = Gauge(
+        'conversation_trainer_claude_in_flight', 'Claude requests currently in flight',
+        multiprocess_mode='livesum'
+    )
+    CACHE_LOOKUPS = Counter(
+        'conversation_trainer_cache_lookups_total', 'Cache lookups by cache and result (hit / miss / coalesced)',
+        ['cache', 'result']
+    )
+    CACHE_EVICTIONS = Counter(
+        'conversation_trainer_cache_evictions_total', 'Entries evicted to stay under the size limit',
+        ['cache']
+    )
+    CACHE_ENTRIES = Gauge(
+        'conversation_trainer_cache_entries', 'Entries currently held',
+        ['cache'], multiprocess_mode='livesum'
+    )
+    CACHE_BYTES = Gauge(
+        'conversation_trainer_cache_memory_bytes', 'Approximate memory held by a cache',
+        ['cache'], multiprocess_mode='livesum'
+    )
+    LOG_DROPS = Counter(
+        'conversation_trainer_log_records_dropped_total', 'Log records dropped because the log queue was full'
+    )
+    RATE_LIMITED = Counter(
+        'conversation_trainer_rate_limited_total', 'Requests turned away with a 429 by route and limit scope',
+        ['route', 'scope']
+    )
+
+
+# ============================================
+# RECORDING HELPERS
+# ============================================
+
+def observe_http_request(route: str, method: str, status: int, seconds: float):
+    if METRICS_AVAILABLE:
+        HTTP_REQUESTS.labels(route, method, str(status)).inc()
+        HTTP_LATENCY.labels(route, method).observe(seconds)
+
+
+def observe_upstream(seconds: float, status_code: Optional[int] = None, error: Optional[Exception] = None):
+    """One Claude API attempt"""
+    if METRICS_AVAILABLE:
+        UPSTREAM_LATENCY.observe(seconds)
+        UPSTREAM_RESPONSES.labels(str(status_code) if error is None else type(error).__name__).inc()
+
+
+def observe_ttft(route: str, seconds: float):
+    if METRICS_AVAILABLE:
+        UPSTREAM_TTFT.labels(route).observe(seconds)
+
+
+def record_token_usage(usage: Optional[Dict]):
+    """Add a Claude `usage` block to the token counters"""
+    if METRICS_AVAILABLE and usage:
+        for field, token_type in TOKEN_TYPES.items():
+            count = usage.get(field) or 0
+            if count:
+                TOKENS.labels(token_type).inc(count)
+
+
+def record_cache_lookup(cache: str, result: str):
+    if METRICS_AVAILABLE:
+        CACHE_LOOKUPS.labels(cache, result).inc()
+
+
+def record_cache_eviction(cache: str):
+    if METRICS_AVAILABLE:
+        CACHE_EVICTIONS.labels(cache).inc()
+
+
+def record_log_drop():
+    if METRICS_AVAILABLE:
+        LOG_DROPS.inc()
+
+
+def record_rate_limited(route: str, scope: str):
+    if METRICS_AVAILABLE:
+        RATE_LIMITED.labels(route=route, scope=scope).inc()
+
+
+def update_gauges(admission: Dict = None, caches: Dict[str, Dict] = None):
+    """
+    Refresh point-in-time gauges from component snapshots
+    Called per request and per scrape, so each worker's values stay current
+    """
+    if not METRICS_AVAILABLE:
+        return
+    if admission:
+        QUEUE_DEPTH.set(admission['queue_depth'])
+        IN_FLIGHT.set(admission['in_flight'])
+    for name, snapshot in (caches or {}).items():
+        CACHE_ENTRIES.labels(name).set(snapshot.get('entries', 0))
+        if 'memory_bytes' in snapshot:
+            CACHE_BYTES.labels(name).set(snapshot['memory_bytes'])
+
+
+# ============================================
+# EXPOSITION
+# ============================================
+
+def render_metrics():
+    """(body, content type) for GET /metrics - summed across workers in multiprocess mode"""
+    if not METRICS_AVAILABLE:
+        return b'# prometheus_client is not installed\n', CONTENT_TYPE_LATEST
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead(pid: int):
+    """gunicorn child_exit hook: drop a dead worker's live gauges"""
+    if METRICS_AVAILABLE and os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
+
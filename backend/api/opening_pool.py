@@ -0,0 +1,210 @@
+"""
+Pre-generated opening messages for preset personas
+Starting a session takes a ready-made opening from the pool instead of
+waiting on Claude; a background thread keeps the pool topped up
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from api.metrics import record_cache_lookup
+from api.request_log import get_logger
+
+log = get_logger('opening_pool')
+
+REFILL_BACKOFF_SECONDS = 2.0
+REFILL_FAILURE_BACKOFF_MAX = 60.0
+
+
+class OpeningMessagePool:
+    """
+    A few varied, ready-to-serve openings per preset persona + scenario
+    Think of this as the persona rehearsing their first line before the trainee arrives
+
+    Pools are keyed by the full character prompt, so a key matches exactly
+    what a live call would have sent. Only register()ed prompts are kept
+    topped up - take() never starts a pool, so callers can't make the
+    refill thread spend tokens on prompts nobody chose. Entries expire
+    after `ttl` seconds.
+    """
+
+    def __init__(self, generate: Callable[[str], str], target_size: int = 2, ttl: float = 1800.0,
+                 max_keys: int = 64, workers: int = 2, can_refill: Optional[Callable[[], bool]] = None):
+        """
+        Args:
+            generate: Function that returns a fresh opening for a prompt (raises on failure)
+            can_refill: Returns False while live traffic should have Claude to itself
+            target_size: Openings to keep ready per prompt
+            ttl: Seconds an opening stays servable
+            max_keys: Most prompts tracked at once (least recently used are dropped)
+            workers: Concurrent background generations
+        """
+        self.generate = generate
+        self.target_size = target_size
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.workers = workers
+        self.can_refill = can_refill or (lambda: True)
+
+        self._pools: 'OrderedDict[str, deque]' = OrderedDict()  # prompt -> deque of (created_at, text)
+        self._pending: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._failure_streak = 0
+        self._quiet_until = 0.0  # Back off after failed generations
+
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.failed = 0
+        self.expired = 0
+        self.deferred = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.target_size > 0
+
+    def register(self, character_prompts: List[str]):
+        """Start keeping openings ready for these prompts"""
+        if not self.enabled:
+            return
+        with self._lock:
+            for prompt in character_prompts:
+                self._track(prompt)
+        self._ensure_started()
+        self._wake.set()
+
+    def take(self, character_prompt: str) -> Optional[str]:
+        """Pop a fresh opening for this prompt, or None if the pool is empty or the prompt isn't registered"""
+        if not self.enabled:
+            return None
+        self._ensure_started()
+
+        with self._lock:
+            pool = self._pools.get(character_prompt)
+            if pool is not None:
+                self._pools.move_to_end(character_prompt)
+                self._drop_expired(pool)
+            text = pool.popleft()[1] if pool else None
+            if text:
+                self.hits += 1
+            else:
+                self.misses += 1
+        record_cache_lookup('opening_pool', 'hit' if text else 'miss')
+
+        if pool is not None:
+            self._wake.set()  # Refill what we just used
+        return text
+
+    def snapshot(self) -> Dict:
+        """Pool stats for /health and metrics"""
+        with self._lock:
+            ready = sum(len(pool) for pool in self._pools.values())
+            lookups = self.hits + self.misses
+            return {
+                'prompts_tracked': len(self._pools),
+                'openings_ready': ready,
+                'target_per_prompt': self.target_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'generated': self.generated,
+                'failed': self.failed,
+                'expired': self.expired,
+                'deferred_refills': self.deferred
+            }
+
+    # ---------- internals (caller holds the lock where noted) ----------
+
+    def _track(self, prompt: str) -> deque:
+        """Get (or create) a prompt's pool and mark it recently used - lock held"""
+        pool = self._pools.get(prompt)
+        if pool is None:
+            pool = self._pools[prompt] = deque()
+            while len(self._pools) > self.max_keys:
+                self._pools.popitem(last=False)
+        else:
+            self._pools.move_to_end(prompt)
+        return pool
+
+    def _drop_expired(self, pool: deque):
+        """Lock held"""
+        cutoff = time.monotonic() - self.ttl
+        while pool and pool[0][0] < cutoff:
+            pool.popleft()
+            self.expired += 1
+
+    def _ensure_started(self):
+        """Start the refill thread (again after a gunicorn fork - threads don't survive it)"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._pending = {}
+            self._thread = threading.Thread(target=self._run, daemon=True, name='opening-pool-refill')
+            self._thread.start()
+
+    def _run(self):
+        """Background loop: top every pool back up to target_size"""
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='opening-pool')
+        while True:
+            self._wake.wait(timeout=max(5.0, self.ttl / 4))
+            self._wake.clear()
+
+            quiet_for = self._quiet_until - time.monotonic()
+            if quiet_for > 0 or not self.can_refill():
+                # Recent failures, queueing live requests or an open breaker - try again shortly
+                self.deferred += 1
+                time.sleep(max(quiet_for, REFILL_BACKOFF_SECONDS))
+                self._wake.set()
+                continue
+
+            with self._lock:
+                # Most recently requested prompts first, never more than `workers` at once
+                jobs = []
+                capacity = self.workers - sum(self._pending.values())
+                for prompt, pool in reversed(self._pools.items()):
+                    if capacity <= 0:
+                        break
+                    self._drop_expired(pool)
+                    missing = min(capacity, self.target_size - len(pool) - self._pending.get(prompt, 0))
+                    if missing > 0:
+                        self._pending[prompt] = self._pending.get(prompt, 0) + missing
+                        capacity -= missing
+                        jobs.extend([prompt] * missing)
+
+            for prompt in jobs:
+                executor.submit(self._refill_one, prompt)
+
+    def _refill_one(self, prompt: str):
+        try:
+            text = self.generate(prompt)
+        except Exception as e:
+            text = None
+            log.warning('opening_refill_failed', error=e)
+
+        with self._lock:
+            self._pending[prompt] = self._pending.get(prompt, 1) - 1
+            if self._pending[prompt] <= 0:
+                del self._pending[prompt]
+
+            if text:
+                self.generated += 1
+                self._failure_streak = 0
+                pool = self._pools.get(prompt)
+                if pool is not None:
+                    pool.append((time.monotonic(), text))
+            else:
+                self.failed += 1
+                self._failure_streak += 1
+                backoff = min(REFILL_FAILURE_BACKOFF_MAX, REFILL_BACKOFF_SECONDS * 2 ** self._failure_streak)
+                self._quiet_until = time.monotonic() + backoff
+        self._wake.set()  # A worker is free - pick the next prompt to fill
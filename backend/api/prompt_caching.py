@@ -0,0 +1,63 @@
+"""
+Anthropic prompt caching helpers
+Marks the stable persona/scenario part of a request as cacheable, so Claude
+reuses it across turns instead of reprocessing it from scratch every time
+"""
+
+from typing import Dict, List, Optional, Union
+
+from config import get_config
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+USAGE_FIELDS = ('input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens')
+
+
+def prompt_caching_enabled() -> bool:
+    """Prompt caching can be switched off with CLAUDE_PROMPT_CACHE=false"""
+    return get_config().CLAUDE_PROMPT_CACHE
+
+
+def cacheable_system(stable_prefix: str, suffix: str = None) -> Union[str, List[Dict]]:
+    """
+    Build a `system` value whose stable prefix is a cache breakpoint
+
+    The prefix must be byte-identical on every turn for the cache to hit,
+    so nothing per-turn (timestamps, history) may go in it. With caching
+    disabled this returns the same text as a plain string.
+    """
+    if not prompt_caching_enabled():
+        return stable_prefix if suffix is None else f"{stable_prefix}\n\n{suffix}"
+
+    blocks = [{"type": "text", "text": stable_prefix, "cache_control": CACHE_CONTROL}]
+    if suffix is not None:
+        blocks.append({"type": "text", "text": suffix})
+    return blocks
+
+
+def cacheable_content(text: str) -> Union[str, List[Dict]]:
+    """Message content marked as a cache breakpoint (used for identical opening prompts)"""
+    if not prompt_caching_enabled():
+        return text
+    return [{"type": "text", "text": text, "cache_control": CACHE_CONTROL}]
+
+
+def extract_usage(usage: Optional[Dict]) -> Dict:
+    """Token counts (including cache reads/writes) from a Claude `usage` block"""
+    usage = usage or {}
+    return {field: usage.get(field) or 0 for field in USAGE_FIELDS}
+
+
+def merge_stream_usage(usage: Dict, event: Dict):
+    """Fold usage from streamed message_start / message_delta events into `usage`"""
+    if event.get('type') == 'message_start':
+        usage.update(extract_usage(event.get('message', {}).get('usage')))
+    elif event.get('type') == 'message_delta' and event.get('usage'):
+        usage['output_tokens'] = event['usage'].get('output_tokens', usage.get('output_tokens', 0))
+
+
+def describe_usage(usage: Dict) -> str:
+    """One-line usage summary for the logs"""
+    return (f"in={usage.get('input_tokens', 0)} out={usage.get('output_tokens', 0)} "
+            f"cache_read={usage.get('cache_read_input_tokens', 0)} "
+            f"cache_write={usage.get('cache_creation_input_tokens', 0)}")
@@ -0,0 +1,438 @@
+"""
+Per-user, per-IP and per-route rate limits for the expensive endpoints
+Every limited request takes a token from a bucket for its route and user
+(X-User-ID), its route and client IP, and/or the route as a whole; an
+empty bucket means a 429 with Retry-After instead of another Claude call.
+Buckets refill continuously, so a burst is allowed and a steady trickle
+is too - a stuck retry loop is not.
+
+Limits (RATE_LIMITS) are "route scope=count/period ..." entries separated
+by semicolons, e.g.
+    /api/conversations/message user=30/min ip=120/min; /api/email/analyze all=300/min
+Scopes: user, ip, all. Periods: s, min, hour (or a number of seconds).
+
+A request is charged only if every one of its buckets has a token - one
+turned away by its IP limit doesn't also use up its user's allowance.
+
+Backends (RATE_LIMIT_BACKEND):
+    memory - buckets in this process (default with one worker)
+    sqlite - a WAL-mode SQLite file shared by every worker on the machine
+             (default with several workers)
+    redis  - any Redis-protocol server, shared across replicas (needs `redis`)
+Asking for memory with several workers stops startup - every limit would
+quietly be multiplied by the worker count. A shared backend that errors
+lets requests through (and counts it) - losing the limiter must never take
+the app down with it.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from config import get_config
+from api.metrics import record_rate_limited
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+SCOPES = ('user', 'ip', 'all')
+PERIODS = {'s': 1.0, 'sec': 1.0, 'second': 1.0, 'min': 60.0, 'minute': 60.0, 'h': 3600.0, 'hour': 3600.0}
+CLIENT_ID_PATTERN = re.compile(r'^[A-Za-z0-9._:-]{8,64}$')  # Accepted from X-User-ID
+
+
+class RateLimit:
+    """One bucket shape: `capacity` requests at once, refilled at `capacity` per `period` seconds"""
+
+    __slots__ = ('scope', 'capacity', 'period', 'refill_rate')
+
+    def __init__(self, scope: str, capacity: int, period: float):
+        self.scope = scope
+        self.capacity = capacity
+        self.period = period
+        self.refill_rate = capacity / period  # Tokens per second
+
+    def describe(self) -> str:
+        return f"{self.scope}={self.capacity}/{self.period:g}s"
+
+
+def parse_rate_limits(spec: str) -> Dict[str, List[RateLimit]]:
+    """
+    '/api/x user=30/min ip=120/min; /api/y all=5/10' -> {route: [RateLimit, ...]}
+    Raises ValueError on anything it can't read, so a typo fails loudly at startup
+    """
+    rules = {}
+    for entry in (spec or '').split(';'):
+        parts = entry.split()
+        if not parts:
+            continue
+        route, limits = parts[0], []
+        for part in parts[1:]:
+            scope, _, rate = part.partition('=')
+            count, _, period = rate.partition('/')
+            if scope not in SCOPES or not count.isdigit() or int(count) < 1:
+                raise ValueError(f"Bad rate limit '{part}' for {route} (expected e.g. user=30/min)")
+            seconds = PERIODS.get(period.lower()) if not period.replace('.', '', 1).isdigit() else float(period)
+            if not seconds:
+                raise ValueError(f"Bad rate limit period '{period}' for {route} (s, min, hour or seconds)")
+            limits.append(RateLimit(scope, int(count), seconds))
+        if limits:
+            rules[route] = limits
+    return rules
+
+
+class RateLimited(Exception):
+    """A request that ran out of tokens - retry_after is seconds until one is back"""
+
+    def __init__(self, route: str, limit: RateLimit, retry_after: float):
+        super().__init__(f"Rate limit {limit.describe()} reached for {route}")
+        self.route = route
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+# ============================================
+# BUCKET BACKENDS
+# ============================================
+
+class BucketStore(ABC):
+    """
+    Where token buckets live
+    Think of this as the ticket roll at the deli counter: everyone gets to
+    take a number, but only as fast as the roll feeds out
+
+    take() spends `cost` tokens from every bucket in `buckets` (a list of
+    (key, limit) pairs) only if all of them have that many, as one atomic
+    step. It returns (allowed, seconds until the buckets that were short
+    have enough, index of the one that was shortest - None when allowed).
+    """
+
+    backend = 'base'
+    blocking = True  # Does a call do I/O? (async callers run it in a thread)
+
+    @abstractmethod
+    def take(self, buckets: List[Tuple[str, RateLimit]], cost: float = 1.0) -> Tuple[bool, float, Optional[int]]:
+        """(allowed, retry after, shortest bucket) - see the class docstring"""
+
+    def snapshot(self) -> Dict:
+        return {'backend': self.backend}
+
+
+def _refill(tokens: float, updated: float, now: float, limit: RateLimit) -> float:
+    """Token bucket arithmetic shared by the backends: tokens in the bucket at `now`"""
+    return min(float(limit.capacity), tokens + max(0.0, now - updated) * limit.refill_rate)
+
+
+def _settle(levels: List[float], limits: List[RateLimit], cost: float) -> Tuple[bool, float, Optional[int]]:
+    """(allowed, retry after, shortest bucket) for buckets holding `levels` tokens"""
+    waits = [(cost - tokens) / limit.refill_rate if tokens < cost else 0.0
+             for tokens, limit in zip(levels, limits)]
+    if not waits or max(waits) <= 0.0:
+        return True, 0.0, None
+    shortest = waits.index(max(waits))
+    return False, waits[shortest], shortest
+
+
+class MemoryBucketStore(BucketStore):
+    """Buckets in this process - with several gunicorn workers each one counts separately"""
+
+    backend = 'memory'
+    blocking = False
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets: 'OrderedDict[str, list]' = OrderedDict()  # key -> [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    def take(self, buckets: List[Tuple[str, RateLimit]], cost: float = 1.0) -> Tuple[bool, float, Optional[int]]:
+        now = time.monotonic()
+        with self._lock:
+            entries = []
+            for key, limit in buckets:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = [float(limit.capacity), now]
+                    while len(self._buckets) > self.max_keys:
+                        self._buckets.popitem(last=False)  # Quietest client starts over with a full bucket
+                else:
+                    self._buckets.move_to_end(key)
+                bucket[0], bucket[1] = _refill(bucket[0], bucket[1], now, limit), now
+                entries.append(bucket)
+            allowed, retry_after, shortest = _settle([bucket[0] for bucket in entries],
+                                                     [limit for _, limit in buckets], cost)
+            if allowed:
+                for bucket in entries:
+                    bucket[0] -= cost
+        return allowed, retry_after, shortest
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return dict(super().snapshot(), buckets=len(self._buckets), max_keys=self.max_keys)
+
+
+class SQLiteBucketStore(BucketStore):
+    """
+    Buckets in a SQLite file in WAL mode, so gunicorn workers on the same
+    machine share one count. Each take() is a short write transaction.
+    """
+
+    backend = 'sqlite'
+    PRUNE_INTERVAL_SECONDS = 300.0
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._last_prune = 0.0
+        with self._connect() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS rate_buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread (and per process - connections don't survive a fork)"""
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=2.0, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def take(self, buckets: List[Tuple[str, RateLimit]], cost: float = 1.0) -> Tuple[bool, float, Optional[int]]:
+        db = self._connect()
+        now = time.time()
+        db.execute('BEGIN IMMEDIATE')  # Take the write lock before reading, so two workers can't both spend a token
+        try:
+            levels = []
+            for key, limit in buckets:
+                row = db.execute('SELECT tokens, updated_at FROM rate_buckets WHERE key = ?', (key,)).fetchone()
+                tokens, updated = row if row else (float(limit.capacity), now)
+                levels.append(_refill(tokens, updated, now, limit))
+            allowed, retry_after, shortest = _settle(levels, [limit for _, limit in buckets], cost)
+            db.executemany('INSERT OR REPLACE INTO rate_buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                           [(key, tokens - cost if allowed else tokens, now)
+                            for (key, _), tokens in zip(buckets, levels)])
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        self._prune(now)
+        return allowed, retry_after, shortest
+
+    def snapshot(self) -> Dict:
+        try:
+            count = self._connect().execute('SELECT COUNT(*) FROM rate_buckets').fetchone()[0]
+        except sqlite3.Error as e:
+            return dict(super().snapshot(), path=self.path, error=str(e))
+        return dict(super().snapshot(), path=self.path, buckets=count)
+
+    def _prune(self, now: float):
+        """Drop buckets idle for a day (they'd be full again anyway)"""
+        if now - self._last_prune < self.PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_prune = now
+        self._connect().execute('DELETE FROM rate_buckets WHERE updated_at < ?', (now - 86400,))
+
+
+class RedisBucketStore(BucketStore):
+    """
+    Buckets in Redis, shared across replicas. The refill-and-take runs as
+    one Lua script on Redis' own clock, so app servers' clocks don't matter
+    and concurrent requests can't both spend the last token.
+    """
+
+    backend = 'redis'
+    SCRIPT = """
+        local now = redis.call('TIME')
+        now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+        local cost = tonumber(ARGV[1])
+        local levels, wait, shortest = {}, 0, 0
+        for i, key in ipairs(KEYS) do
+            local capacity, rate = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+            local bucket = redis.call('HMGET', key, 'tokens', 'updated_at')
+            local tokens, updated = tonumber(bucket[1]) or capacity, tonumber(bucket[2]) or now
+            tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+            levels[i] = tokens
+            if tokens < cost and (cost - tokens) / rate > wait then
+                wait, shortest = (cost - tokens) / rate, i
+            end
+        end
+        for i, key in ipairs(KEYS) do
+            local capacity, rate = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+            local tokens = levels[i]
+            if shortest == 0 then
+                tokens = tokens - cost
+            end
+            redis.call('HSET', key, 'tokens', tokens, 'updated_at', now)
+            redis.call('EXPIRE', key, math.ceil(capacity / rate) + 60)
+        end
+        return {shortest, tostring(wait)}
+    """
+
+    def __init__(self, url: str, prefix: str = 'conversation-trainer:ratelimit:'):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis needs the 'redis' package (pip install redis)")
+        self.client = redis.Redis.from_url(url, socket_timeout=1.0, socket_connect_timeout=1.0)
+        self.prefix = prefix
+        self._take = self.client.register_script(self.SCRIPT)
+
+    def take(self, buckets: List[Tuple[str, RateLimit]], cost: float = 1.0) -> Tuple[bool, float, Optional[int]]:
+        args = [cost]
+        for _, limit in buckets:
+            args += [limit.capacity, limit.refill_rate]
+        shortest, retry_after = self._take(keys=[self.prefix + key for key, _ in buckets], args=args)
+        if not shortest:
+            return True, 0.0, None
+        return False, float(retry_after), int(shortest) - 1  # Lua counts from 1
+
+    def snapshot(self) -> Dict:
+        try:
+            self.client.ping()
+            return dict(super().snapshot(), reachable=True)
+        except Exception as e:
+            return dict(super().snapshot(), reachable=False, error=str(e))
+
+
+# ============================================
+# LIMITER
+# ============================================
+
+class RateLimiter:
+    """
+    Applies the configured limits to one request
+    check() raises RateLimited naming the bucket that's furthest from a token; routes
+    without rules (and a limiter with none at all) cost nothing
+    """
+
+    def __init__(self, rules: Dict[str, List[RateLimit]], store: BucketStore):
+        self.rules = rules
+        self.store = store
+        self.blocking = store.blocking
+
+        self.checked = 0
+        self.limited: Dict[str, int] = {}  # route -> 429s
+        self.store_errors = 0
+        self.last_error = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rules)
+
+    def applies_to(self, route: str) -> bool:
+        return route in self.rules
+
+    def check(self, route: str, user_id: Optional[str], client_ip: Optional[str]):
+        """Spend a token from each of the route's buckets - raises RateLimited (spending none) when one is empty"""
+        limits = self.rules.get(route)
+        if not limits:
+            return
+        self.checked += 1
+        buckets = []
+        for limit in limits:
+            identity = {'user': user_id, 'ip': client_ip, 'all': '*'}[limit.scope]
+            if identity:  # No user id sent - the IP limit still applies
+                buckets.append((f"{route}|{limit.scope}|{identity}", limit))
+        if not buckets:
+            return
+        try:
+            allowed, retry_after, shortest = self.store.take(buckets)
+        except Exception as e:
+            # Fail open: a broken shared backend shouldn't turn into an outage
+            self.store_errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            return
+        if not allowed:
+            limit = buckets[shortest][1]
+            self.limited[route] = self.limited.get(route, 0) + 1
+            record_rate_limited(route, limit.scope)
+            raise RateLimited(route, limit, retry_after)
+
+    def snapshot(self) -> Dict:
+        """Limiter stats for /health"""
+        return {
+            'enabled': self.enabled,
+            'rules': {route: [limit.describe() for limit in limits] for route, limits in self.rules.items()},
+            'store': self.store.snapshot(),
+            'checked': self.checked,
+            'limited': dict(self.limited),
+            'store_errors': self.store_errors,
+            'last_error': self.last_error
+        }
+
+
+def client_user_id(header_value: Optional[str]) -> Optional[str]:
+    """The browser's X-User-ID if it looks like one of ours (random, 8-64 safe characters)"""
+    if header_value and CLIENT_ID_PATTERN.match(header_value):
+        return header_value
+    return None
+
+
+def client_ip(remote_addr: Optional[str], forwarded_for: Optional[str], proxy_hops: int) -> Optional[str]:
+    """
+    The caller's address: with `proxy_hops` trusted proxies in front (Railway's
+    edge is one), the entry that many places from the right of
+    X-Forwarded-For - anything further left is whatever the client claimed
+    """
+    if proxy_hops > 0 and forwarded_for:
+        hops = [part.strip() for part in forwarded_for.split(',') if part.strip()]
+        if hops:
+            return hops[-min(proxy_hops, len(hops))]
+    return remote_addr
+
+
+# ============================================
+# SHARED INSTANCE
+# ============================================
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def create_bucket_store(config) -> BucketStore:
+    """Build the configured backend (shared SQLite with several workers), falling back to memory if it can't be set up"""
+    backend = (config.RATE_LIMIT_BACKEND or ('sqlite' if config.WEB_CONCURRENCY > 1 else 'memory')).lower()
+    if backend == 'memory' and config.WEB_CONCURRENCY > 1:
+        raise RuntimeError(
+            f"Rate limit buckets would be kept in each worker's memory, but {config.WEB_CONCURRENCY} workers "
+            "serve requests (every limit would be multiplied by the worker count) - set "
+            "RATE_LIMIT_BACKEND=sqlite (or redis), or WEB_CONCURRENCY=1"
+        )
+    try:
+        if backend == 'sqlite':
+            return SQLiteBucketStore(config.RATE_LIMIT_SQLITE_PATH)
+        if backend == 'redis':
+            if not config.RATE_LIMIT_REDIS_URL:
+                raise RuntimeError('RATE_LIMIT_BACKEND=redis needs RATE_LIMIT_REDIS_URL (or REDIS_URL)')
+            return RedisBucketStore(config.RATE_LIMIT_REDIS_URL)
+        if backend != 'memory':
+            print(f"⚠️ Unknown RATE_LIMIT_BACKEND '{config.RATE_LIMIT_BACKEND}', using memory")
+    except Exception as e:
+        print(f"⚠️ Rate limit backend '{backend}' unavailable ({e}), using memory")
+    return MemoryBucketStore(max_keys=config.RATE_LIMIT_MAX_KEYS)
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide rate limiter (no rules when RATE_LIMIT_ENABLED is off)"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                config = get_config()
+                rules = parse_rate_limits(config.RATE_LIMITS) if config.RATE_LIMIT_ENABLED else {}
+                _limiter = RateLimiter(rules, create_bucket_store(config) if rules else MemoryBucketStore())
+                if rules:
+                    print(f"🚦 Rate limits on {len(rules)} routes, buckets in: {_limiter.store.backend}")
+    return _limiter
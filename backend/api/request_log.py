@@ -0,0 +1,294 @@
+"""
+Structured logging for the request path
+Handlers log a short event name plus fields instead of print()ing whole
+payloads. A record is stamped with the request id and conversation id of
+the request that logged it and dropped on a queue; a background thread
+formats and writes them to stderr in batches, so a slow terminal or log
+shipper never holds up a reply.
+
+- Levels and sampling: LOG_LEVEL drops records below it; LOG_SAMPLE_RATES
+  keeps a fraction of a level ("debug=0.05,info=0.5") - unlisted levels
+  are all kept, so warnings and errors are never sampled unless asked
+- Bounded: text fields are cut to LOG_MAX_FIELD_CHARS; lists and dicts are
+  written as their (cut) JSON
+- Never blocks: a full queue drops the record and counts it
+- LOG_FORMAT=json writes one JSON object per line; text writes key=value
+"""
+
+import atexit
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from api.codec import dumps
+from api.metrics import record_log_drop
+from config import get_config
+
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+LEVEL_NAMES = {number: name for name, number in LEVELS.items()}
+
+WRITE_BATCH = 256  # Most lines per write() call
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._:-]{1,64}$')  # Accepted from X-Request-ID
+BARE_TEXT_PATTERN = re.compile(r'^[^\s"=]+$')                  # Text format: values written unquoted
+
+# Correlation fields for whatever request this thread (or asyncio task) is serving
+_log_context: ContextVar[Dict] = ContextVar('log_context', default={})
+
+
+def parse_sample_rates(spec: str) -> Dict[int, float]:
+    """'debug=0.05,info=0.5' -> {10: 0.05, 20: 0.5} (unknown levels and bad numbers are ignored)"""
+    rates = {}
+    for part in (spec or '').split(','):
+        name, _, value = part.partition('=')
+        level = LEVELS.get(name.strip().lower())
+        try:
+            if level is not None:
+                rates[level] = min(1.0, max(0.0, float(value)))
+        except ValueError:
+            pass
+    return rates
+
+
+# ============================================
+# REQUEST CORRELATION
+# ============================================
+
+def start_log_context(request_id: Optional[str] = None) -> str:
+    """
+    Begin a request: later records from this thread / task carry its id
+    A well-formed id from the client (X-Request-ID) is kept so logs line up
+    with the caller's; anything else gets a fresh one
+    """
+    if not request_id or not REQUEST_ID_PATTERN.match(request_id):
+        request_id = uuid.uuid4().hex[:16]
+    _log_context.set({'request_id': request_id})
+    return request_id
+
+
+def bind_log_context(**fields):
+    """Add correlation fields (e.g. conversation_id) for the rest of this request"""
+    _log_context.set(dict(_log_context.get(), **fields))
+
+
+# ============================================
+# WRITER
+# ============================================
+
+class RequestLog:
+    """
+    Queue-backed log writer shared by every logger in the process
+    Think of this as the office's out-tray: dropping a note in it takes no
+    time, and someone else walks the pile to the filing room
+
+    Records are (timestamp, level, component, event, fields, context)
+    tuples; nothing is formatted on the caller's thread.
+    """
+
+    def __init__(self, level: str = 'info', sample_rates: Optional[Dict[int, float]] = None,
+                 max_field_chars: int = 300, log_format: str = 'json', queue_size: int = 10000,
+                 stream=None):
+        self.level = LEVELS.get(level.lower(), LEVELS['info'])
+        self.sample_rates = sample_rates or {}
+        self.max_field_chars = max_field_chars
+        self.log_format = log_format
+        self.stream = stream  # None = sys.stderr at write time (so test runners / gunicorn can swap it)
+
+        self.queue_size = queue_size
+        self._queue = queue.SimpleQueue()  # C queue - put() is a fraction of queue.Queue's cost
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        self.written = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def enabled_for(self, level: int) -> bool:
+        """Below LOG_LEVEL, or sampled out this time - decided before any fields are built"""
+        if level < self.level:
+            return False
+        rate = self.sample_rates.get(level)
+        if rate is not None and rate < 1.0 and random.random() >= rate:
+            self.sampled_out += 1
+            return False
+        return True
+
+    def submit(self, level: int, component: str, event: str, fields: Dict):
+        if self._pid != os.getpid():
+            self._ensure_started()
+        if self._queue.qsize() >= self.queue_size:
+            self.dropped += 1
+            record_log_drop()
+            return
+        self._queue.put((time.time(), level, component, event, fields, _log_context.get()))
+
+    def flush(self, timeout: float = 2.0):
+        """Wait (briefly) until everything queued so far is written - used at exit"""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def snapshot(self) -> Dict:
+        """Logging stats for /health"""
+        return {
+            'level': LEVEL_NAMES.get(self.level, self.level),
+            'format': self.log_format,
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'sampled_out': self.sampled_out,
+            'dropped': self.dropped,
+            'errors': self.errors
+        }
+
+    # ---------- internals ----------
+
+    def _ensure_started(self):
+        """Start the writer thread (again after a gunicorn fork - threads don't survive it)"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                self._queue = queue.SimpleQueue()  # The parent's records are the parent's
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, daemon=True, name='request-log-writer')
+            self._thread.start()
+
+    def _run(self):
+        """Writer loop: take whatever has piled up (up to WRITE_BATCH) and write it in one go"""
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch: List):
+        waiters = [item for item in batch if isinstance(item, threading.Event)]
+        lines = []
+        for item in batch:
+            if isinstance(item, threading.Event):
+                continue
+            try:
+                lines.append(self._format(*item))
+            except Exception:
+                self.errors += 1
+        try:
+            if lines:
+                stream = self.stream or sys.stderr
+                stream.write('\n'.join(lines) + '\n')
+                stream.flush()
+                self.written += len(lines)
+        except Exception:
+            self.errors += 1
+        finally:
+            for done in waiters:
+                done.set()
+
+    def _format(self, timestamp: float, level: int, component: str, event: str, fields: Dict, context: Dict) -> str:
+        record = {
+            'ts': datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': LEVEL_NAMES[level],
+            'component': component,
+            'event': event
+        }
+        record.update(context)
+        for key, value in fields.items():
+            record[key] = self._bound(value)
+        if self.log_format == 'json':
+            return dumps(record).decode('utf-8')
+        return ' '.join(f"{key}={_text_value(value)}" for key, value in record.items())
+
+    def _bound(self, value):
+        """Keep a field to max_field_chars - payloads never go out whole"""
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        if isinstance(value, BaseException):
+            value = f"{type(value).__name__}: {value}"
+        elif not isinstance(value, str):
+            try:
+                value = dumps(value).decode('utf-8')
+            except Exception:
+                value = repr(value)
+        if len(value) > self.max_field_chars:
+            return f"{value[:self.max_field_chars]}...(+{len(value) - self.max_field_chars} chars)"
+        return value
+
+
+def _text_value(value) -> str:
+    """key=value form: bare when unambiguous, JSON-quoted otherwise"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return dumps(value).decode('utf-8')
+    if value and BARE_TEXT_PATTERN.match(value):
+        return value
+    return dumps(value).decode('utf-8')
+
+
+class Logger:
+    """Named front end for the shared RequestLog: log.info('event', field=value, ...)"""
+
+    __slots__ = ('component',)
+
+    def __init__(self, component: str):
+        self.component = component
+
+    def log(self, level: int, event: str, **fields):
+        writer = get_request_log()
+        if writer.enabled_for(level):
+            writer.submit(level, self.component, event, fields)
+
+    def debug(self, event: str, **fields):
+        self.log(10, event, **fields)
+
+    def info(self, event: str, **fields):
+        self.log(20, event, **fields)
+
+    def warning(self, event: str, **fields):
+        self.log(30, event, **fields)
+
+    def error(self, event: str, **fields):
+        self.log(40, event, **fields)
+
+
+# ============================================
+# SHARED INSTANCE
+# ============================================
+
+_request_log: Optional[RequestLog] = None
+_request_log_lock = threading.Lock()
+
+
+def get_request_log() -> RequestLog:
+    """Process-wide log writer, configured from LOG_* settings"""
+    global _request_log
+    if _request_log is None:
+        with _request_log_lock:
+            if _request_log is None:
+                config = get_config()
+                _request_log = RequestLog(
+                    level=config.LOG_LEVEL,
+                    sample_rates=parse_sample_rates(config.LOG_SAMPLE_RATES),
+                    max_field_chars=config.LOG_MAX_FIELD_CHARS,
+                    log_format=config.LOG_FORMAT,
+                    queue_size=config.LOG_QUEUE_SIZE
+                )
+                atexit.register(_request_log.flush)
+    return _request_log
+
+
+def get_logger(component: str) -> Logger:
+    return Logger(component)
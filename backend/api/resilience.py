@@ -0,0 +1,189 @@
+"""
+Retry and circuit breaker helpers for Claude API calls
+Rides out short overload spikes, and stops calling once the API is clearly down
+"""
+
+import random
+import threading
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from config import get_config
+
+# Statuses worth another attempt (529 is Anthropic's "overloaded")
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504, 529}
+
+# Statuses that mean the upstream itself is struggling (429 is just our quota)
+BREAKER_FAILURE_STATUS = {500, 502, 503, 504, 529}
+
+
+class UpstreamBusyError(Exception):
+    """Claude can't take this request right now - try again after `retry_after` seconds"""
+
+    def __init__(self, message: str, retry_after: Optional[float], upstream_status: Optional[int] = None):
+        self.retry_after = retry_after
+        self.upstream_status = upstream_status  # Claude's 429 / 5xx / 529, when it answered at all
+        super().__init__(message)
+
+
+class CircuitOpenError(UpstreamBusyError):
+    """Raised instead of calling Claude while the circuit breaker is open"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Claude API circuit open - retry in {retry_after:.0f}s", retry_after)
+
+
+class CircuitBreaker:
+    """
+    Classic three-state circuit breaker
+    Think of this as a fuse: enough consecutive failures trip it open,
+    requests then fail fast until a single probe proves the API is back
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+        self.last_failure = None
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Check whether a call may go out right now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+            # Half open: let exactly one probe through
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+            return True
+
+    def is_closed(self) -> bool:
+        """Read-only: is the breaker letting normal traffic through? (never takes the probe slot)"""
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        """The upstream answered - close the circuit"""
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+
+    def release_probe(self):
+        """A call ended without an answer either way (e.g. cancelled) - free the half-open probe slot"""
+        with self._lock:
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        """The upstream failed - trip the circuit if it keeps happening"""
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_failure = datetime.now().isoformat()
+            self.probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker will let a probe through"""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def snapshot(self) -> Dict:
+        """Breaker state for /health"""
+        return {
+            'state': self.state,
+            'probe_in_flight': self.probe_in_flight,
+            'consecutive_failures': self.consecutive_failures,
+            'failure_threshold': self.failure_threshold,
+            'times_opened': self.times_opened,
+            'last_failure': self.last_failure,
+            'retry_after_seconds': round(self.retry_after(), 1)
+        }
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter, bounded by a per-request deadline
+    Jitter spreads a cohort's retries out so they don't land all at once
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0, deadline: float = 45.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before the next attempt (attempt counts from 1)"""
+        if retry_after is not None:
+            # Honour the server's hint, plus a little jitter
+            return min(retry_after, self.max_delay * 4) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a retry-after header (seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# ============================================
+# SHARED INSTANCES
+# ============================================
+
+_breaker: Optional[CircuitBreaker] = None
+_breaker_lock = threading.Lock()
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Process-wide breaker shared by the sync and async Claude clients"""
+    global _breaker
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                config = get_config()
+                _breaker = CircuitBreaker(
+                    failure_threshold=config.CLAUDE_BREAKER_THRESHOLD,
+                    reset_timeout=config.CLAUDE_BREAKER_RESET
+                )
+    return _breaker
+
+
+def get_retry_policy() -> RetryPolicy:
+    """Retry policy built from config"""
+    config = get_config()
+    return RetryPolicy(
+        max_attempts=config.CLAUDE_MAX_ATTEMPTS,
+        base_delay=config.CLAUDE_RETRY_BASE_DELAY,
+        max_delay=config.CLAUDE_RETRY_MAX_DELAY,
+        deadline=config.CLAUDE_REQUEST_DEADLINE
+    )
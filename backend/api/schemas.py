@@ -0,0 +1,67 @@
+"""
+Typed request bodies for the conversation and email endpoints
+Decoded with api.codec - the Flask and ASGI handlers share these
+"""
+
+from api.codec import RequestStruct
+
+
+class StartConversationRequest(RequestStruct):
+    """POST /api/conversations/start"""
+
+    __slots__ = ('user_name', 'personality_type', 'scenario', 'custom_character', 'custom_scenario')
+    FIELDS = (
+        ('user_name', str, 'user'),
+        ('personality_type', str, None),
+        ('scenario', str, 'Practice conversation'),
+        ('custom_character', dict, None),
+        ('custom_scenario', dict, None),
+    )
+
+
+class ConversationMessageRequest(RequestStruct):
+    """
+    POST /api/conversations/message
+    conversation_id names the server-side session; conversation_data,
+    conversation_history and personality_data are only sent to rebuild a
+    session the server no longer has (see app.restore_conversation_session)
+    """
+
+    __slots__ = ('user_message', 'conversation_id', 'stream', 'conversation_data',
+                 'conversation_history', 'personality_data')
+    FIELDS = (
+        ('user_message', str, ''),
+        ('conversation_id', str, None),
+        ('stream', bool, False),
+        ('conversation_data', dict, None),
+        ('conversation_history', list, list),
+        ('personality_data', dict, None),
+    )
+
+
+class EmailAnalysisRequest(RequestStruct):
+    """POST /api/email/analyze"""
+
+    __slots__ = ('subject', 'content', 'colleague', 'stream')
+    FIELDS = (
+        ('subject', str, ''),
+        ('content', str, ''),
+        ('colleague', dict, dict),
+        ('stream', bool, False),
+    )
+
+
+class EmailBatchRequest(RequestStruct):
+    """
+    POST /api/email/analyze/batch
+    Each entry of emails is checked by email_batch.parse_batch_emails;
+    colleague is the default for entries that don't bring their own
+    """
+
+    __slots__ = ('emails', 'colleague', 'mode', 'stream')
+    FIELDS = (
+        ('emails', list, list),
+        ('colleague', dict, dict),
+        ('mode', str, 'live'),
+        ('stream', bool, False),
+    )
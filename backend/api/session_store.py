@@ -0,0 +1,364 @@
+"""
+Server-side conversation sessions
+The persona prompt and the running history live here, keyed by
+conversation_id, so a chat turn only has to carry the id and the new message
+
+Backends (SESSION_STORE):
+    memory - bounded LRU in this process (single worker / dev only)
+    sqlite - a WAL-mode SQLite file shared by every worker on the machine (default)
+    redis  - any Redis-protocol server, shared across replicas (needs `redis`)
+
+A memory store is refused when several workers serve requests: a turn that
+lands on a worker with an older copy of the session would be answered from
+stale history.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from config import get_config
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+def _split(session: Dict):
+    """(metadata, history) - history is stored separately so a turn is an append, not a rewrite"""
+    meta = {key: value for key, value in session.items() if key != 'history'}
+    return meta, list(session.get('history') or [])
+
+
+class SessionStore(ABC):
+    """
+    Where conversations live between turns
+    Think of this as the case file: whoever picks up the next turn (any
+    worker, any replica) reads the same file instead of asking the trainee
+    to recite the whole conversation again
+
+    A session is a dict: conversation_id, personality {name, type, prompt,
+    custom_character}, scenario details and `history` (frontend-shaped turns).
+    Sessions expire `ttl` seconds after they were last used.
+    """
+
+    backend = 'base'
+    blocking = True  # Does a call do I/O? (async callers run it in a thread)
+
+    def __init__(self, ttl: float = 86400.0):
+        self.ttl = ttl
+
+    @abstractmethod
+    def create(self, session: Dict):
+        """Store a new session (replaces one with the same id)"""
+
+    @abstractmethod
+    def get(self, conversation_id: str) -> Optional[Dict]:
+        """The session with its full history, or None if unknown or expired"""
+
+    @abstractmethod
+    def append(self, conversation_id: str, turns: List[Dict]) -> bool:
+        """Add turns to a session's history; False if the session is gone"""
+
+    @abstractmethod
+    def delete(self, conversation_id: str):
+        """Forget a session (no-op if it's already gone)"""
+
+    def snapshot(self) -> Dict:
+        """Store stats for /health"""
+        return {'backend': self.backend, 'ttl_seconds': self.ttl}
+
+
+# ============================================
+# IN-MEMORY (LRU)
+# ============================================
+
+class MemorySessionStore(SessionStore):
+    """Bounded LRU in this process - sessions are lost on restart and not shared between workers"""
+
+    backend = 'memory'
+    blocking = False
+
+    def __init__(self, max_sessions: int = 1000, ttl: float = 86400.0):
+        super().__init__(ttl)
+        self.max_sessions = max_sessions
+        self._sessions: 'OrderedDict[str, list]' = OrderedDict()  # id -> [touched_at, meta, history]
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def create(self, session: Dict):
+        meta, history = _split(session)
+        with self._lock:
+            self._sessions[session['conversation_id']] = [time.monotonic(), meta, history]
+            self._sessions.move_to_end(session['conversation_id'])
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, conversation_id: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._live_entry(conversation_id)
+            if entry is None:
+                return None
+            return dict(entry[1], history=list(entry[2]))
+
+    def append(self, conversation_id: str, turns: List[Dict]) -> bool:
+        with self._lock:
+            entry = self._live_entry(conversation_id)
+            if entry is None:
+                return False
+            entry[2].extend(turns)
+            return True
+
+    def delete(self, conversation_id: str):
+        with self._lock:
+            self._sessions.pop(conversation_id, None)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return dict(super().snapshot(), sessions=len(self._sessions),
+                        max_sessions=self.max_sessions, evictions=self.evictions)
+
+    def _live_entry(self, conversation_id: str) -> Optional[list]:
+        """Entry if present and fresh, touched and marked recently used (lock held)"""
+        entry = self._sessions.get(conversation_id)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if now - entry[0] >= self.ttl:
+            del self._sessions[conversation_id]
+            return None
+        entry[0] = now
+        self._sessions.move_to_end(conversation_id)
+        return entry
+
+
+# ============================================
+# SQLITE (shared by workers on one machine)
+# ============================================
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in a SQLite file in WAL mode, so gunicorn workers on the same
+    machine (or a Railway volume) share them. Turns are rows, so appending
+    one never rewrites the history.
+    """
+
+    backend = 'sqlite'
+    PRUNE_INTERVAL_SECONDS = 60.0
+
+    def __init__(self, path: str, ttl: float = 86400.0):
+        super().__init__(ttl)
+        self.path = path
+        self._local = threading.local()
+        self._last_prune = 0.0
+        with self._connect() as db:
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    conversation_id TEXT PRIMARY KEY,
+                    meta TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS session_turns (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation_id TEXT NOT NULL,
+                    turn TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_session_turns_conversation ON session_turns (conversation_id, id);
+                CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (updated_at);
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread (and per process - connections don't survive a fork)"""
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=5.0)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def create(self, session: Dict):
+        meta, history = _split(session)
+        conversation_id = session['conversation_id']
+        db = self._connect()
+        with db:
+            db.execute('DELETE FROM session_turns WHERE conversation_id = ?', (conversation_id,))
+            db.execute('INSERT OR REPLACE INTO sessions (conversation_id, meta, updated_at) VALUES (?, ?, ?)',
+                       (conversation_id, json.dumps(meta), time.time()))
+            db.executemany('INSERT INTO session_turns (conversation_id, turn) VALUES (?, ?)',
+                           [(conversation_id, json.dumps(turn)) for turn in history])
+        self._prune()
+
+    def get(self, conversation_id: str) -> Optional[Dict]:
+        db = self._connect()
+        now = time.time()
+        with db:
+            row = db.execute('SELECT meta FROM sessions WHERE conversation_id = ? AND updated_at > ?',
+                             (conversation_id, now - self.ttl)).fetchone()
+            if row is None:
+                return None
+            db.execute('UPDATE sessions SET updated_at = ? WHERE conversation_id = ?', (now, conversation_id))
+            turns = db.execute('SELECT turn FROM session_turns WHERE conversation_id = ? ORDER BY id',
+                               (conversation_id,)).fetchall()
+        return dict(json.loads(row[0]), history=[json.loads(turn) for (turn,) in turns])
+
+    def append(self, conversation_id: str, turns: List[Dict]) -> bool:
+        db = self._connect()
+        now = time.time()
+        with db:
+            touched = db.execute('UPDATE sessions SET updated_at = ? WHERE conversation_id = ? AND updated_at > ?',
+                                 (now, conversation_id, now - self.ttl)).rowcount
+            if not touched:
+                return False
+            db.executemany('INSERT INTO session_turns (conversation_id, turn) VALUES (?, ?)',
+                           [(conversation_id, json.dumps(turn)) for turn in turns])
+        return True
+
+    def delete(self, conversation_id: str):
+        db = self._connect()
+        with db:
+            db.execute('DELETE FROM session_turns WHERE conversation_id = ?', (conversation_id,))
+            db.execute('DELETE FROM sessions WHERE conversation_id = ?', (conversation_id,))
+
+    def snapshot(self) -> Dict:
+        try:
+            count = self._connect().execute('SELECT COUNT(*) FROM sessions WHERE updated_at > ?',
+                                            (time.time() - self.ttl,)).fetchone()[0]
+        except sqlite3.Error as e:
+            return dict(super().snapshot(), path=self.path, error=str(e))
+        return dict(super().snapshot(), path=self.path, sessions=count)
+
+    def _prune(self):
+        """Drop expired sessions now and then (piggybacks on create)"""
+        now = time.time()
+        if now - self._last_prune < self.PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_prune = now
+        db = self._connect()
+        with db:
+            cutoff = now - self.ttl
+            db.execute('DELETE FROM session_turns WHERE conversation_id IN '
+                       '(SELECT conversation_id FROM sessions WHERE updated_at <= ?)', (cutoff,))
+            db.execute('DELETE FROM sessions WHERE updated_at <= ?', (cutoff,))
+
+
+# ============================================
+# REDIS PROTOCOL (shared across replicas)
+# ============================================
+
+class RedisSessionStore(SessionStore):
+    """
+    Sessions in Redis (or anything that speaks its protocol - Valkey,
+    KeyDB, Dragonfly). Metadata is a string key and the history a list,
+    so a turn is one RPUSH; both keys slide their expiry on every use.
+    """
+
+    backend = 'redis'
+
+    def __init__(self, url: str, ttl: float = 86400.0, prefix: str = 'conversation-trainer:session:'):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("SESSION_STORE=redis needs the 'redis' package (pip install redis)")
+        super().__init__(ttl)
+        self.client = redis.Redis.from_url(url, socket_timeout=2.0, socket_connect_timeout=2.0)
+        self.prefix = prefix
+
+    def _keys(self, conversation_id: str):
+        return f"{self.prefix}{conversation_id}:meta", f"{self.prefix}{conversation_id}:turns"
+
+    def create(self, session: Dict):
+        meta, history = _split(session)
+        meta_key, turns_key = self._keys(session['conversation_id'])
+        ttl = int(self.ttl)
+        pipe = self.client.pipeline()
+        pipe.set(meta_key, json.dumps(meta), ex=ttl)
+        pipe.delete(turns_key)
+        if history:
+            pipe.rpush(turns_key, *[json.dumps(turn) for turn in history])
+            pipe.expire(turns_key, ttl)
+        pipe.execute()
+
+    def get(self, conversation_id: str) -> Optional[Dict]:
+        meta_key, turns_key = self._keys(conversation_id)
+        ttl = int(self.ttl)
+        pipe = self.client.pipeline()
+        pipe.get(meta_key)
+        pipe.lrange(turns_key, 0, -1)
+        pipe.expire(meta_key, ttl)
+        pipe.expire(turns_key, ttl)
+        meta, turns, _, _ = pipe.execute()
+        if meta is None:
+            return None
+        return dict(json.loads(meta), history=[json.loads(turn) for turn in turns])
+
+    def append(self, conversation_id: str, turns: List[Dict]) -> bool:
+        meta_key, turns_key = self._keys(conversation_id)
+        ttl = int(self.ttl)
+        if not self.client.expire(meta_key, ttl):
+            return False  # Expired or never existed
+        pipe = self.client.pipeline()
+        pipe.rpush(turns_key, *[json.dumps(turn) for turn in turns])
+        pipe.expire(turns_key, ttl)
+        pipe.execute()
+        return True
+
+    def delete(self, conversation_id: str):
+        self.client.delete(*self._keys(conversation_id))
+
+    def snapshot(self) -> Dict:
+        try:
+            self.client.ping()
+            return dict(super().snapshot(), reachable=True)
+        except Exception as e:
+            return dict(super().snapshot(), reachable=False, error=str(e))
+
+
+# ============================================
+# SHARED INSTANCE
+# ============================================
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def create_session_store(config) -> SessionStore:
+    """Build the configured store, falling back to memory if it can't be set up"""
+    backend = config.SESSION_STORE.lower()
+    try:
+        if backend == 'sqlite':
+            return SQLiteSessionStore(config.SESSION_SQLITE_PATH, ttl=config.SESSION_TTL)
+        if backend == 'redis':
+            if not config.SESSION_REDIS_URL:
+                raise RuntimeError('SESSION_STORE=redis needs SESSION_REDIS_URL (or REDIS_URL)')
+            return RedisSessionStore(config.SESSION_REDIS_URL, ttl=config.SESSION_TTL)
+        if backend != 'memory':
+            print(f"⚠️ Unknown SESSION_STORE '{config.SESSION_STORE}', using memory")
+    except Exception as e:
+        print(f"⚠️ Session store '{backend}' unavailable ({e}), using memory")
+    if config.WEB_CONCURRENCY > 1:
+        raise RuntimeError(
+            f"Conversation sessions would be kept in each worker's memory, but {config.WEB_CONCURRENCY} workers "
+            "serve requests - set SESSION_STORE=sqlite (or redis), or WEB_CONCURRENCY=1"
+        )
+    return MemorySessionStore(max_sessions=config.SESSION_MAX, ttl=config.SESSION_TTL)
+
+
+def get_session_store() -> SessionStore:
+    """Process-wide conversation session store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_session_store(get_config())
+                print(f"🗂️ Conversation sessions stored in: {_store.backend}")
+    return _store
@@ -0,0 +1,187 @@
+"""
+Cached Claude upstream health
+Real Claude traffic and a rate-limited background prober feed one rolling
+window of latency and errors, so /health/ready answers from memory instead
+of making a billed API call on every probe
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import get_config
+
+# Answers that prove the upstream is reachable and serving (429 is just our quota)
+UNHEALTHY_STATUS = {401, 403, 500, 502, 503, 504, 529}
+
+
+class UpstreamMonitor:
+    """
+    Rolling view of how Claude is doing, from the outside
+    Think of this as the receptionist who remembers how the last few calls
+    went, so nobody has to ring Claude just to ask if it's awake
+
+    Observations older than `window` seconds drop out. The prober only calls
+    Claude when real traffic hasn't produced an observation for `interval`
+    seconds, so a busy server never probes at all.
+    """
+
+    def __init__(self, interval: float = 60.0, window: float = 300.0, error_threshold: float = 0.5,
+                 min_samples: int = 3):
+        self.interval = interval
+        self.window = window
+        self.error_threshold = error_threshold
+        self.min_samples = min_samples
+
+        self._samples = deque()  # (monotonic time, latency seconds, ok)
+        self._lock = threading.Lock()
+        self.last_success_at = None
+        self.last_error = None
+        self.last_observed = 0.0
+        self.probes = 0
+        self.last_probe_at = None
+
+        self._probe: Optional[Callable] = None
+        self._thread = None
+        self._pid = None
+
+    # ---------- observations ----------
+
+    def record(self, latency: float, status_code: Optional[int] = None, error: Optional[Exception] = None):
+        """One upstream answer (status code) or failure (exception)"""
+        ok = error is None and status_code is not None and status_code not in UNHEALTHY_STATUS
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, latency, ok))
+            self.last_observed = now
+            if ok:
+                self.last_success_at = now
+            else:
+                self.last_error = {
+                    'status_code': status_code,
+                    'error': str(error) if error is not None else None,
+                    'at': datetime.now().isoformat()
+                }
+            self._expire(now)
+
+    def _expire(self, now: float):
+        """Caller holds the lock"""
+        while self._samples and now - self._samples[0][0] > self.window:
+            self._samples.popleft()
+
+    # ---------- background prober ----------
+
+    def start(self, probe: Callable):
+        """Run `probe` (returns a response with status_code) in the background when traffic is quiet"""
+        self._probe = probe
+        self.ensure_started()
+
+    def ensure_started(self):
+        """(Re)start the prober thread - threads don't survive a gunicorn fork"""
+        if self._probe is None or self.interval <= 0:
+            return
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, daemon=True, name='claude-prober')
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            quiet_for = time.monotonic() - self.last_observed
+            if quiet_for >= self.interval:
+                self.probe_once()
+                time.sleep(self.interval)
+            else:
+                time.sleep(self.interval - quiet_for)
+
+    def probe_once(self):
+        """One probe call, recorded like any other observation"""
+        started = time.monotonic()
+        try:
+            response = self._probe()
+            self.record(time.monotonic() - started, status_code=response.status_code)
+        except Exception as e:
+            self.record(time.monotonic() - started, error=e)
+        with self._lock:
+            self.probes += 1
+            self.last_probe_at = time.monotonic()
+
+    # ---------- views ----------
+
+    def snapshot(self) -> Dict:
+        """Rolling latency / error rate and an overall status"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            samples = list(self._samples)
+            last_success_at = self.last_success_at
+            last_error = self.last_error
+            probes = self.probes
+            last_probe_at = self.last_probe_at
+
+        latencies = sorted(latency for _, latency, _ in samples)
+        errors = sum(1 for _, _, ok in samples if not ok)
+        error_rate = errors / len(samples) if samples else None
+
+        return {
+            'status': self._status(samples, error_rate),
+            'samples': len(samples),
+            'window_seconds': self.window,
+            'error_rate': round(error_rate, 3) if error_rate is not None else None,
+            'latency_ms': _latency_summary(latencies),
+            'last_success_seconds_ago': round(now - last_success_at, 1) if last_success_at else None,
+            'last_error': last_error,
+            'probes': probes,
+            'last_probe_seconds_ago': round(now - last_probe_at, 1) if last_probe_at else None
+        }
+
+    def _status(self, samples: List, error_rate: Optional[float]) -> str:
+        if not samples:
+            return 'unknown'
+        if len(samples) >= self.min_samples and error_rate >= self.error_threshold:
+            return 'down'
+        return 'healthy' if error_rate == 0 else 'degraded'
+
+    def readiness(self) -> Tuple[bool, Dict]:
+        """Ready unless the upstream is known to be down (unknown counts as ready)"""
+        snapshot = self.snapshot()
+        return snapshot['status'] != 'down', snapshot
+
+
+def _latency_summary(latencies: List[float]) -> Optional[Dict]:
+    if not latencies:
+        return None
+
+    def pick(q):
+        return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 1)
+    return {'p50': pick(0.50), 'p95': pick(0.95), 'max': round(latencies[-1] * 1000, 1)}
+
+
+# ============================================
+# SHARED INSTANCE
+# ============================================
+
+_monitor: Optional[UpstreamMonitor] = None
+_monitor_lock = threading.Lock()
+
+
+def get_upstream_monitor() -> UpstreamMonitor:
+    """Process-wide upstream monitor fed by every Claude call"""
+    global _monitor
+    if _monitor is None:
+        with _monitor_lock:
+            if _monitor is None:
+                config = get_config()
+                _monitor = UpstreamMonitor(
+                    interval=config.CLAUDE_PROBE_INTERVAL,
+                    window=config.CLAUDE_HEALTH_WINDOW,
+                    error_threshold=config.CLAUDE_READY_ERROR_RATE
+                )
+    return _monitor
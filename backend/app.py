@@ -5,10 +5,14 @@ NSW Local Government Professional Development Tool
 Version: 2.1 - Now with Custom Character Support!
 """
 
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, current_app, request, jsonify, Response, stream_with_context, g
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import os
 import json
+import math
+import threading
+import time
 import uuid  # ADDED: Missing import
 import requests  # ADDED: Missing import
 from datetime import datetime
@@ -22,41 +26,72 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import our custom models and Claude integration
 try:
-    from models.personality import Personality, create_skeptical_councillor, create_frustrated_resident
-    from models.conversation import Conversation, create_budget_cut_scenario, create_angry_resident_scenario
-    from api.claude_integration import ClaudeAPIClient, ConversationOrchestrator, test_claude_integration
-
-    print("✅ Successfully imported all custom modules")
+    from models.personality import Personality, get_persona_registry
+    from models.conversation import Conversation, RenderedConversations
+    from models.storage import get_storage
+    from api.claude_integration import ClaudeAPIClient, test_claude_integration
+    from api.claude_transport import get_transport, iter_stream_events, stream_text_deltas, format_sse
+    from api.resilience import UpstreamBusyError, RETRYABLE_STATUS, get_circuit_breaker, parse_retry_after
+    from api.admission import get_admission_controller
+    from api.prompt_caching import cacheable_system, cacheable_content, extract_usage, describe_usage
+    from api.opening_pool import OpeningMessagePool
+    from api.http_cache import CatalogResponse, etag_matches
+    from api.codec import RequestBodyError, choose_encoding, compress, decompress_body, dumps as codec_dumps, loads as codec_loads
+    from api.schemas import ConversationMessageRequest, EmailAnalysisRequest, EmailBatchRequest, StartConversationRequest
+    from api.context_window import ConversationSummarizer, build_summary_request, conversation_key
+    from api.session_store import get_session_store
+    from api.analysis_cache import email_cache_key, get_analysis_cache
+    from api.upstream_health import get_upstream_monitor
+    from api.metrics import observe_http_request, observe_ttft, update_gauges, render_metrics
+    from api.request_log import bind_log_context, get_logger, get_request_log, start_log_context
+    from api.rate_limit import RateLimited, client_ip, client_user_id, get_rate_limiter
+    from api.claude_integration import build_email_analysis_request
+    from api.email_stream import ProgressiveAnalysis, replay_cached_analysis
+    from api.email_batch import (
+        parse_batch_emails, run_email_batch, summarise_batch, submit_deferred_batch, get_deferred_batch
+    )
 except ImportError as e:
     print(f"⚠️  Import error: {e}")
     print("Some features may not work until all files are created")
 
-# Create Flask application
-app = Flask(__name__)
-CORS(app, origins=["*"])  # Allow frontend to talk to backend
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify and request.get_json through api.codec (orjson when it's installed)"""
+
+    def dumps(self, obj, **kwargs):
+        return codec_dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return codec_loads(s)
+
+    def response(self, *args, **kwargs):
+        return self._app.response_class(codec_dumps(self._prepare_response_obj(args, kwargs)), mimetype=self.mimetype)
 
-# Configuration
-app.config['DEBUG'] = True
 
-# Initialize Claude integration
+# Every route and hook below hangs off this blueprint; create_app() builds the Flask app around it
+routes = Blueprint('conversation_trainer', __name__)
+
 from config import get_config, check_environment
 
 config = get_config()
 
-# Check environment on startup
-if not check_environment():
-    print("❌ Configuration errors found. Please fix before continuing.")
+log = get_logger('app')
 
-# Initialize Claude integration with API key from config
-claude_client = None
-orchestrator = None
+# Claude integration - built on first use, not at import (see get_claude_client)
+_claude_client = None
+_claude_client_lock = threading.Lock()
 
-try:
-    claude_client = ClaudeAPIClient(api_key=config.CLAUDE_API_KEY)
-    orchestrator = ConversationOrchestrator(claude_client)
-    print("✅ Claude integration initialized")
-except Exception as e:
-    print(f"⚠️  Claude integration error: {e}")
+
+def get_claude_client():
+    """The process's ClaudeAPIClient, created the first time something needs it (None if it can't be)"""
+    global _claude_client
+    if _claude_client is None:
+        with _claude_client_lock:
+            if _claude_client is None:
+                try:
+                    _claude_client = ClaudeAPIClient(api_key=config.CLAUDE_API_KEY)
+                except Exception as e:
+                    print(f"⚠️  Claude integration error: {e}")
+    return _claude_client
 
 
 # ============================================
@@ -105,53 +140,420 @@ Begin the meeting naturally, acknowledging the context and your role."""
     return prompt
 
 
+def get_claude_transport():
+    """Pooled transport shared with the Claude client (one connection pool per process)"""
+    client = get_claude_client()
+    if client:
+        return client.transport
+    return get_transport()
+
+
+DEFAULT_OPENING_MESSAGE = "Hello, I'm ready to begin our conversation."
+
+
+def build_opening_request(character_prompt):
+    """Build the Claude messages payload for a conversation opening"""
+    return {
+        "model": config.CLAUDE_MODEL,
+        "max_tokens": 200,
+        "messages": [
+            {
+                "role": "user",
+                # Preset persona + scenario openings repeat across trainees, so cache them too
+                "content": cacheable_content(character_prompt)
+            }
+        ]
+    }
+
+
+def fetch_opening_message(character_prompt):
+    """Ask Claude for an opening message (raises on failure - no default text)"""
+    response = get_claude_transport().post_messages(build_opening_request(character_prompt))
+    if response.status_code != 200:
+        raise RuntimeError(f"Claude API error: {response.status_code}")
+
+    result = response.json()
+    log.info('opening_generated', usage=describe_usage(extract_usage(result.get('usage'))))
+    return result['content'][0]['text']
+
+
 def get_ai_opening_message(character_prompt):
     """Get opening message from Claude AI"""
     try:
         api_key = os.getenv('CLAUDE_API_KEY')
         if not api_key:
-            return "Hello, I'm ready to begin our conversation."
+            return DEFAULT_OPENING_MESSAGE
 
-        headers = {
-            'x-api-key': api_key,
-            'Content-Type': 'application/json'
-        }
+        return fetch_opening_message(character_prompt)
 
-        request_data = {
-            "model": "claude-3-sonnet-20240229",
-            "max_tokens": 200,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": character_prompt
-                }
-            ]
-        }
+    except Exception as e:
+        log.warning('opening_failed', error=e)
+        return DEFAULT_OPENING_MESSAGE
 
-        response = requests.post(
-            'https://api.anthropic.com/v1/messages',
-            headers=headers,
-            json=request_data,
-            timeout=30
-        )
 
-        if response.status_code == 200:
-            result = response.json()
-            return result['content'][0]['text']
+# ============================================
+# PRESET PERSONAS
+# ============================================
+
+# Loaded once from backend/personas/*.json with the prompts pre-parsed;
+# edited or added files are picked up without a restart
+persona_registry = get_persona_registry()
+
+
+# ============================================
+# OPENING MESSAGE POOL
+# ============================================
+
+# The scenario text the frontend sends for its standard scenarios (see
+# getScenarioDescription) - openings are kept for each "prewarm" persona
+POOL_PRESET_SCENARIOS = [
+    'You need to discuss budget reductions with your team while maintaining morale and finding creative solutions.',
+    'Handle a frustrated ratepayer who is upset about service levels and rate increases.',
+    'Practice conversation scenario',
+    'Practice conversation'  # StartConversationRequest's default, for API callers that send no scenario
+]
+
+
+def opening_pool_has_room():
+    """Only refill while live requests aren't queueing and Claude is healthy"""
+    return get_admission_controller().waiting == 0 and get_circuit_breaker().is_closed()
+
+
+opening_pool = OpeningMessagePool(
+    generate=fetch_opening_message,
+    target_size=config.OPENING_POOL_SIZE if config.CLAUDE_API_KEY else 0,
+    ttl=config.OPENING_POOL_TTL,
+    max_keys=config.OPENING_POOL_MAX_KEYS,
+    workers=config.OPENING_POOL_WORKERS,
+    can_refill=opening_pool_has_room
+)
+
+
+def is_poolable_start(personality_type, scenario=None, custom_character=None, custom_scenario=None):
+    """Preset persona with one of the standard scenarios - the same prompt every trainee gets"""
+    if custom_scenario or not personality_type or scenario not in POOL_PRESET_SCENARIOS:
+        return False
+    if personality_type == 'custom_character' or personality_type.startswith('saved_colleague_'):
+        return False
+    return True
+
+
+def take_pooled_opening(personality_type, scenario, custom_character, custom_scenario, character_prompt):
+    """A pre-generated opening for this start request, or None to fall back to a live call"""
+    if not is_poolable_start(personality_type, scenario, custom_character, custom_scenario):
+        return None
+    return opening_pool.take(character_prompt)
+
+
+def prewarm_opening_pool():
+    """Queue openings for every preset persona + standard scenario (refilled in the background)"""
+    if not (opening_pool.enabled and config.OPENING_POOL_PREWARM):
+        return
+    prompts = [persona.prompt(scenario)
+               for persona in persona_registry.personas() if persona.prewarm
+               for scenario in POOL_PRESET_SCENARIOS]
+    opening_pool.register(prompts)
+    print(f"🧊 Opening pool warming {len(prompts)} persona/scenario combinations")
+
+
+# Edited personas have new prompts - start keeping openings for those too
+persona_registry.on_reload(lambda registry: prewarm_opening_pool())
+
+
+def resolve_conversation_character(personality_type, scenario, custom_character=None, custom_scenario=None):
+    """
+    Work out which character a start request wants and build its prompt
+    Returns (personality_name, character_prompt) - no Claude calls happen here
+    """
+    # Handle custom characters vs preset characters
+    if (personality_type == 'custom_character' and custom_character) or (
+            personality_type and personality_type.startswith('saved_colleague_') and custom_character):
+        log.debug('custom_character', name=custom_character.get('name'))
+        personality_name = custom_character.get('name', 'Custom Character')
+        character_prompt = create_custom_character_prompt(custom_character, scenario, custom_scenario)
+    else:
+
+        # Enhanced preset characters with custom scenario support
+        if custom_scenario:
+            scenario_context = f"""
+CUSTOM MEETING CONTEXT:
+- {custom_scenario.get('title', 'Meeting')}
+- Background: {custom_scenario.get('context', '')}
+- User's Goal: {custom_scenario.get('objective', '')}
+- Challenges: {custom_scenario.get('challenges', '')}
+
+{scenario}"""
         else:
-            print(f"Claude API error: {response.status_code}")
-            return "Hello, I'm ready to begin our conversation."
+            scenario_context = scenario
+
+        # Preset personas come from the registry (backend/personas/*.json) - only the scenario is filled in here
+        persona = persona_registry.get(personality_type)
+        if not persona:
+            log.warning('unknown_personality', personality_type=personality_type, default=config.PERSONA_DEFAULT)
+            persona = persona_registry.get(config.PERSONA_DEFAULT)
+
+        personality_name = persona.name
+        character_prompt = persona.prompt(scenario_context)
+
+    return personality_name, character_prompt
+
+
+def build_conversation_start_result(conversation_id, start, personality_name, character_prompt, opening_message):
+    """
+    Build the /api/conversations/start response body (`start` is the StartConversationRequest)
+    The character prompt stays on the server (in the session) - conversation_data
+    only carries what's needed to rebuild it if the session expires
+    """
+    personality_type = start.personality_type or ''
+    custom_character = start.custom_character
+    uses_custom_character = personality_type == 'custom_character' or personality_type.startswith('saved_colleague_')
+
+    # Store conversation data (include custom scenario info)
+    conversation_data = {
+        'personality': {
+            'name': personality_name,
+            'type': personality_type,
+            'custom_character': custom_character if uses_custom_character else None
+        },
+        'scenario': start.scenario,
+        'custom_scenario': start.custom_scenario,
+        'created_at': datetime.now().isoformat()
+    }
+
+    return {
+        "success": True,
+        "conversation_id": conversation_id,
+        "conversation_data": conversation_data,
+        "personality_name": personality_name,
+        "opening_message": opening_message,
+        "timestamp": datetime.now().isoformat()
+    }
+
 
+# ============================================
+# CONVERSATION SESSIONS
+# ============================================
+
+def conversation_turn(sender, sender_type, content):
+    """One history entry, in the same shape the frontend keeps"""
+    return {
+        'sender': sender,
+        'sender_type': sender_type,
+        'content': content,
+        'timestamp': datetime.now().isoformat()
+    }
+
+
+def build_conversation_session(conversation_id, start_result, character_prompt, history, user_name='user'):
+    """Session record for the store: the start details plus the server-only prompt and the history"""
+    conversation_data = start_result['conversation_data']
+    return {
+        'conversation_id': conversation_id,
+        'user_name': user_name,
+        'personality': dict(conversation_data['personality'], prompt=character_prompt),
+        'scenario': conversation_data.get('scenario'),
+        'custom_scenario': conversation_data.get('custom_scenario'),
+        'created_at': conversation_data.get('created_at'),
+        'history': history
+    }
+
+
+def persist_new_conversation(session):
+    """Queue a just-started conversation for storage (write-behind - returns immediately)"""
+    storage = get_storage()
+    if storage is None:
+        return
+    custom_scenario = session.get('custom_scenario') or {}
+    conversation = Conversation(session.get('user_name', 'user'), custom_scenario.get('title') or session.get('scenario') or '')
+    conversation.id = session['conversation_id']
+    conversation.scenario_context = session.get('scenario') or ''
+    conversation.add_personality(session['personality'].get('type') or session['personality'].get('name', ''))
+    for turn in session['history']:
+        conversation.add_message(turn['sender'], turn['content'], turn['sender_type'])
+    storage.save_conversation(conversation)
+
+
+def save_conversation_session(session):
+    """Store a session - a store outage only costs the client a resend of its history"""
+    try:
+        get_session_store().create(session)
     except Exception as e:
-        print(f"Error getting opening message: {e}")
-        return "Hello, I'm ready to begin our conversation."
+        log.warning('session_store_failed', error=e)
+
+
+def restore_conversation_session(conversation_id, message):
+    """
+    Rebuild a session the store doesn't have (expired, evicted, older client)
+    from what the ConversationMessageRequest carries: conversation_data (the
+    character is resolved again here) or a legacy personality_data prompt,
+    plus conversation_history
+    """
+    history = message.conversation_history
+    conversation_data = message.conversation_data
+    if conversation_data and conversation_data.get('personality'):
+        personality = conversation_data['personality']
+        scenario = conversation_data.get('scenario', 'Practice conversation')
+        personality_name, character_prompt = resolve_conversation_character(
+            personality.get('type'), scenario, personality.get('custom_character'), conversation_data.get('custom_scenario')
+        )
+        session = {
+            'conversation_id': conversation_id,
+            'personality': dict(personality, name=personality_name, prompt=character_prompt),
+            'scenario': scenario,
+            'custom_scenario': conversation_data.get('custom_scenario'),
+            'created_at': conversation_data.get('created_at'),
+            'history': history
+        }
+    elif message.personality_data:
+        session = {
+            'conversation_id': conversation_id,
+            'personality': message.personality_data,
+            'history': history
+        }
+    else:
+        return None
+
+    if conversation_id:
+        save_conversation_session(session)
+        log.info('session_restored', turns=len(history))
+    return session
+
+
+def load_conversation_session(message):
+    """Session for a message request, from the store or rebuilt from the request; None if neither works"""
+    conversation_id = message.conversation_id
+    session = None
+    if conversation_id:
+        try:
+            session = get_session_store().get(conversation_id)
+        except Exception as e:
+            log.warning('session_load_failed', error=e)
+    return session or restore_conversation_session(conversation_id, message)
+
+
+def record_conversation_exchange(session, user_message, ai_response):
+    """Append a completed turn to the session's history"""
+    conversation_id = session.get('conversation_id')
+    if not conversation_id:
+        return
+    personality_name = session['personality'].get('name', 'AI Assistant')
+    turns = [
+        conversation_turn('user', 'user', user_message),
+        conversation_turn(personality_name, 'ai_personality', ai_response)
+    ]
+    try:
+        get_session_store().append(conversation_id, turns)
+    except Exception as e:
+        log.warning('session_append_failed', error=e)
+
+    storage = get_storage()
+    if storage is not None:
+        storage.append_messages(conversation_id, turns, session.get('user_name'))
+
+
+SESSION_EXPIRED_BODY = {
+    "success": False,
+    "error": "Conversation not found or expired - please start a new conversation",
+    "session_expired": True
+}
+
+
+# ============================================
+# REQUEST METRICS
+# ============================================
+
+def refresh_metric_gauges():
+    """Point-in-time gauges (queue depth, cache sizes) for this worker"""
+    update_gauges(
+        admission=get_admission_controller().snapshot(),
+        caches={
+            'email_analysis': get_analysis_cache().snapshot(),
+            'opening_pool': {'entries': opening_pool.snapshot()['openings_ready']}
+        }
+    )
+
+
+@routes.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.request_id = start_log_context(request.headers.get('X-Request-ID'))
+
+
+@routes.before_app_request
+def enforce_rate_limits():
+    """429 before any Claude work when this caller has used up a limited route's budget"""
+    limiter = get_rate_limiter()
+    if request.method == 'OPTIONS' or not request.url_rule or not limiter.applies_to(request.url_rule.rule):
+        return None
+    try:
+        limiter.check(
+            request.url_rule.rule,
+            client_user_id(request.headers.get('X-User-ID')),
+            client_ip(request.remote_addr, request.headers.get('X-Forwarded-For'), config.RATE_LIMIT_PROXY_HOPS)
+        )
+    except RateLimited as limited:
+        log.info('rate_limited', route=limited.route, limit=limited.limit.describe(), retry_after=limited.retry_after)
+        body = rate_limited_body(limited)
+        response = jsonify(body)
+        response.status_code = 429
+        response.headers['Retry-After'] = str(body['retry_after'])
+        return response
+    return None
+
+
+@routes.after_app_request
+def record_request_metrics(response):
+    """Count and time every request by route template (streams: time until the stream starts)"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        observe_http_request(route, request.method, response.status_code, time.perf_counter() - started)
+        refresh_metric_gauges()
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id  # So a user's error report can be found in the logs
+    return response
+
+
+@routes.after_app_request
+def compress_response(response):
+    """gzip / brotli JSON bodies for clients that accept it (streams, tiny bodies and 304s are left alone)"""
+    if (response.direct_passthrough or response.is_streamed or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers or response.mimetype != 'application/json'):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    if not encoding or response.calculate_content_length() < config.COMPRESS_MIN_BYTES:
+        return response
+    response.set_data(compress(response.get_data(), encoding, config.COMPRESS_LEVEL))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def read_request(struct_class):
+    """Decode this request's body (gzip / br allowed) into a typed struct - raises RequestBodyError"""
+    body = decompress_body(request.get_data(cache=False), request.headers.get('Content-Encoding'),
+                           config.MAX_REQUEST_BYTES)
+    return struct_class.from_json(body)
+
+
+def request_body_error(error):
+    """Response for a body that failed to decode or validate"""
+    return jsonify({"success": False, "error": str(error)}), error.status
+
+
+@routes.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint (summed across gunicorn workers - see gunicorn.conf.py)"""
+    refresh_metric_gauges()
+    body, content_type = render_metrics()
+    return Response(body, mimetype=None, content_type=content_type)
 
 
 # ============================================
 # BASIC HEALTH CHECK ROUTES
 # ============================================
 
-@app.route('/')
+@routes.route('/')
 def home():
     """Main API information page"""
     return jsonify({
@@ -168,6 +570,9 @@ def home():
         ],
         'endpoints': {
             'health': '/health',
+            'liveness': '/health/live',
+            'readiness': '/health/ready',
+            'metrics': '/metrics',
             'claude_test': '/test-claude',
             'personalities': '/api/personalities',
             'conversations': '/api/conversations',
@@ -177,7 +582,7 @@ def home():
     })
 
 
-@app.route('/health')
+@routes.route('/health')
 def health_check():
     """Detailed health check"""
     health_status = {
@@ -194,7 +599,7 @@ def health_check():
     # Test our models
     try:
         test_personality = Personality("Test", "Test Role")
-        health_status['components']['personality_model'] = 'healthy'
+        health_status['components']['personality_model'] = 'healthy' if persona_registry.listing() else 'error'
     except:
         health_status['components']['personality_model'] = 'error'
 
@@ -204,28 +609,106 @@ def health_check():
     except:
         health_status['components']['conversation_model'] = 'error'
 
-    # Test Claude connection
-    if claude_client:
-        try:
-            claude_test = claude_client.test_connection()
-            health_status['components']['claude_integration'] = 'healthy' if claude_test['success'] else 'error'
-            health_status['claude_test_result'] = claude_test
-        except:
-            health_status['components']['claude_integration'] = 'error'
+    # Claude status from the cached upstream monitor (no API call here - use /test-claude for a live check)
+    if get_claude_client():
+        upstream = get_upstream_monitor().snapshot()
+        health_status['components']['claude_integration'] = {
+            'healthy': 'healthy', 'degraded': 'degraded', 'down': 'error'
+        }.get(upstream['status'], 'unknown')
+        health_status['claude_upstream'] = upstream
+
+    # Circuit breaker state (open = failing fast while the API recovers)
+    breaker = get_circuit_breaker().snapshot()
+    health_status['circuit_breaker'] = breaker
+    if breaker['state'] != 'closed':
+        health_status['status'] = 'degraded'
+
+    # Outbound admission control (in-flight cap, token budget, queue depth)
+    health_status['claude_admission'] = get_admission_controller().snapshot()
+
+    # Pre-generated opening messages for preset personas
+    health_status['opening_pool'] = opening_pool.snapshot()
+
+    # Email analysis result cache (hit rate, evictions, memory)
+    health_status['email_analysis_cache'] = get_analysis_cache().snapshot()
+
+    # Server-side conversation sessions
+    health_status['conversation_sessions'] = get_session_store().snapshot()
+
+    # Preset persona files (version, reloads, last load error)
+    health_status['personas'] = persona_registry.snapshot()
+
+    # Conversation storage (write-behind queue depth, batches, errors)
+    storage = get_storage()
+    health_status['storage'] = storage.snapshot() if storage else {'enabled': False}
+
+    # Running summaries of turns that left the conversation context window
+    health_status['conversation_summaries'] = conversation_summaries.snapshot()
+    health_status['rendered_conversations'] = rendered_conversations.snapshot()
+
+    # Request log queue (written, sampled out, dropped)
+    health_status['logging'] = get_request_log().snapshot()
+
+    # Rate limits on the Claude-backed endpoints (rules, 429s, shared backend errors)
+    health_status['rate_limits'] = get_rate_limiter().snapshot()
 
     return jsonify(health_status)
 
 
-@app.route('/test-claude')
+@routes.route('/health/live')
+def liveness_check():
+    """Liveness - the process is up and serving (no I/O, safe to poll constantly)"""
+    return jsonify({'status': 'alive', 'timestamp': datetime.now().isoformat()})
+
+
+@routes.route('/health/ready')
+def readiness_check():
+    """
+    Readiness - can this instance usefully take traffic?
+    Answered from cached state only: configuration, the circuit breaker and
+    the upstream monitor's rolling error rate. 503 when not ready
+    """
+    monitor = get_upstream_monitor()
+    monitor.ensure_started()  # Restart the prober in a freshly forked worker
+    upstream_ready, upstream = monitor.readiness()
+    breaker = get_circuit_breaker().snapshot()
+
+    reasons = []
+    if not get_claude_client() or not config.CLAUDE_API_KEY:
+        reasons.append('Claude API key not configured')
+    if breaker['state'] == 'open':
+        reasons.append('Claude circuit breaker is open')
+    elif breaker['state'] == 'half_open':
+        # Only the probe gets through until it answers - everything else is a 503
+        reasons.append('Claude circuit breaker is half open' + (' (probe in flight)' if breaker['probe_in_flight'] else ''))
+    if not upstream_ready:
+        reasons.append(f"Claude upstream error rate {upstream['error_rate']:.0%} over the last "
+                       f"{upstream['window_seconds']:g}s")
+
+    response = jsonify({
+        'status': 'ready' if not reasons else 'not_ready',
+        'reasons': reasons,
+        'timestamp': datetime.now().isoformat(),
+        'claude_upstream': upstream,
+        'circuit_breaker': breaker['state'],
+        'circuit_breaker_probe_in_flight': breaker['probe_in_flight'],
+        'claude_admission': get_admission_controller().snapshot()
+    })
+    response.status_code = 200 if not reasons else 503
+    return response
+
+
+@routes.route('/test-claude')
 def test_claude_endpoint():
     """Test Claude API connection"""
-    if not claude_client:
+    client = get_claude_client()
+    if not client:
         return jsonify({
             'success': False,
             'message': 'Claude client not initialized'
         })
 
-    result = claude_client.test_connection()
+    result = client.test_connection()
     return jsonify(result)
 
 
@@ -233,95 +716,44 @@ def test_claude_endpoint():
 # PERSONALITY MANAGEMENT
 # ============================================
 
-# Replace the get_personalities function in your app.py with this updated version
+def send_catalog(catalog):
+    """A precomputed catalog response, or a bodiless 304 if the browser's copy is current"""
+    body, etag, encoding = catalog.current(choose_encoding(request.headers.get('Accept-Encoding')))
+    headers = {'ETag': etag, 'Cache-Control': catalog.cache_control, 'Vary': 'Accept-Encoding'}
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        return Response(status=304, headers=headers)
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(body, mimetype='application/json', headers=headers)
+
+
+def build_personalities_catalog():
+    personalities = persona_registry.listing()
+    return {
+        'success': True,
+        'personalities': personalities,
+        'count': len(personalities),
+        'disc_personalities': [p for p in personalities if 'disc_profile' in p],
+        'legacy_personalities': [p for p in personalities if 'disc_profile' not in p]
+    }
 
-@app.route('/api/personalities', methods=['GET'])
+
+# Re-serialised only when the persona files change (the registry's version moves)
+personalities_catalog = CatalogResponse(
+    build=build_personalities_catalog,
+    version=lambda: persona_registry.version,
+    serialize=lambda payload: current_app.json.response(payload).get_data(),
+    max_age=config.CATALOG_MAX_AGE,
+    compress_level=config.COMPRESS_LEVEL,
+    compress_min_bytes=config.COMPRESS_MIN_BYTES
+)
+
+
+@routes.route('/api/personalities', methods=['GET'])
 def get_personalities():
     """Get list of available personalities - Updated with DISC personalities"""
     try:
-        personalities = [
-            # NEW DISC-BASED NSW LOCAL GOVERNMENT PERSONALITIES
-            {
-                'id': 'infrastructure_engineer',
-                'name': 'Terry Mitchell',
-                'role': 'Senior Infrastructure Engineer',
-                'description': 'Technical expert, detail-oriented, skeptical of quick fixes. Expects thorough engineering analysis.',
-                'department': 'Engineering & Infrastructure',
-                'difficulty': 'Hard',
-                'disc_profile': {'D': 65, 'I': 25, 'S': 35, 'C': 85}
-            },
-            {
-                'id': 'community_engagement',
-                'name': 'Sarah Chen',
-                'role': 'Community Engagement Officer',
-                'description': 'People-focused, enthusiastic about community consultation. Diplomatic but can be overly optimistic.',
-                'department': 'Community Services',
-                'difficulty': 'Medium',
-                'disc_profile': {'D': 35, 'I': 85, 'S': 70, 'C': 40}
-            },
-            {
-                'id': 'budget_director',
-                'name': 'David Walsh',
-                'role': 'Budget & Finance Director',
-                'description': 'Numbers-driven, direct about financial constraints. Challenges spending proposals with detailed questions.',
-                'department': 'Finance',
-                'difficulty': 'Hard',
-                'disc_profile': {'D': 80, 'I': 20, 'S': 30, 'C': 90}
-            },
-            {
-                'id': 'union_rep',
-                'name': 'Maria Santos',
-                'role': 'Union Representative',
-                'description': 'Assertive advocate for workers\' rights. Direct communicator who challenges management decisions affecting staff.',
-                'department': 'Employee Relations',
-                'difficulty': 'Hard',
-                'disc_profile': {'D': 85, 'I': 60, 'S': 45, 'C': 55}
-            },
-            {
-                'id': 'councillor_thompson',
-                'name': 'Robert Thompson',
-                'role': 'Long-term Councillor',
-                'description': 'Steady, consensus-building approach. Values tradition and established processes. Asks thoughtful questions.',
-                'department': 'Council',
-                'difficulty': 'Medium',
-                'disc_profile': {'D': 40, 'I': 50, 'S': 85, 'C': 65}
-            },
-            {
-                'id': 'strategic_planner',
-                'name': 'Emily Kim',
-                'role': 'Strategic Planner',
-                'description': 'Analytical yet enthusiastic about new ideas. Balances data-driven decisions with stakeholder engagement.',
-                'department': 'Strategy & Planning',
-                'difficulty': 'Medium',
-                'disc_profile': {'D': 50, 'I': 75, 'S': 45, 'C': 80}
-            },
-
-            # LEGACY PERSONALITIES (for backward compatibility)
-            {
-                'id': 'skeptical_councillor',
-                'name': 'Councillor Margaret Stevens',
-                'role': 'Budget-focused Councillor',
-                'description': 'A skeptical councillor who focuses on budget implications and detailed justifications',
-                'department': 'Council',
-                'difficulty': 'Medium-Hard'
-            },
-            {
-                'id': 'frustrated_resident',
-                'name': 'Robert Chen',
-                'role': 'Local Business Owner',
-                'description': 'A frustrated community member concerned about service delivery and value for money',
-                'department': 'Community',
-                'difficulty': 'Medium'
-            }
-        ]
-
-        return jsonify({
-            'success': True,
-            'personalities': personalities,
-            'count': len(personalities),
-            'disc_personalities': [p for p in personalities if 'disc_profile' in p],
-            'legacy_personalities': [p for p in personalities if 'disc_profile' not in p]
-        })
+        return send_catalog(personalities_catalog)
 
     except Exception as e:
         return jsonify({
@@ -337,257 +769,52 @@ def get_personalities():
 
 # Replace the start_conversation function in your app.py with this updated version
 
-@app.route('/api/conversations/start', methods=['POST'])
+@routes.route('/api/conversations/start', methods=['POST'])
 def start_conversation():
     """Start conversation with custom character and scenario support + DISC personalities"""
     try:
-        data = request.json
-        print(f"📥 Start conversation request: {data}")
+        start = read_request(StartConversationRequest)
 
-        user_name = data.get('user_name', 'user')
-        personality_type = data.get('personality_type')
-        scenario = data.get('scenario', 'Practice conversation')
-        custom_character = data.get('custom_character')
-        custom_scenario = data.get('custom_scenario')
+        user_name = start.user_name
+        personality_type = start.personality_type
+        scenario = start.scenario
+        custom_character = start.custom_character
+        custom_scenario = start.custom_scenario
 
         conversation_id = str(uuid.uuid4())
+        bind_log_context(conversation_id=conversation_id)
 
-        # Handle custom characters vs preset characters
-        # Handle custom characters vs preset characters
-        if (personality_type == 'custom_character' and custom_character) or (
-                personality_type and personality_type.startswith('saved_colleague_') and custom_character):
-            print(f"🎭 Creating custom character: {custom_character.get('name')}")
-            personality_name = custom_character.get('name', 'Custom Character')
-            character_prompt = create_custom_character_prompt(custom_character, scenario, custom_scenario)
-        else:
-            print(f"🎭 Using preset character: {personality_type}")
-
-            # Enhanced preset characters with custom scenario support
-            if custom_scenario:
-                scenario_context = f"""
-CUSTOM MEETING CONTEXT:
-- {custom_scenario.get('title', 'Meeting')}
-- Background: {custom_scenario.get('context', '')}
-- User's Goal: {custom_scenario.get('objective', '')}
-- Challenges: {custom_scenario.get('challenges', '')}
-
-{scenario}"""
-            else:
-                scenario_context = scenario
-
-            # COMPLETE DISC-BASED PERSONALITY MAPPING
-            personalities = {
-                # NEW: NSW Local Government DISC-Based Personalities
-                'infrastructure_engineer': {
-                    'name': 'Terry Mitchell',
-                    'prompt': f"""You are Terry Mitchell, Senior Infrastructure Engineer at NSW Local Council.
-
-DISC PROFILE: High C (85%), Moderate D (65%), Low I (25%), Low S (35%)
-- Cautious, analytical, technically precise
-- Skeptical of quick fixes and shortcuts
-- Expects thorough engineering analysis and data
-- Direct when technical standards are compromised
-- Reserved in social interactions, prefers facts over feelings
-
-PERSONALITY TRAITS:
-- Technical expert who values precision and thoroughness
-- Challenges proposals with detailed technical questions
-- Skeptical of solutions that haven't been properly analysed
-- Expects comprehensive engineering reports and data
-- Can be blunt when technical standards are at risk
-
-SCENARIO: {scenario_context}
-
-Stay completely in character as Terry. Focus on technical details, proper engineering processes, and data-driven decisions.
-Begin the conversation naturally, introducing yourself and your engineering perspective."""
-                },
-
-                'community_engagement': {
-                    'name': 'Sarah Chen',
-                    'prompt': f"""You are Sarah Chen, Community Engagement Officer at NSW Local Council.
-
-DISC PROFILE: High I (85%), High S (70%), Moderate C (40%), Moderate D (35%)
-- Enthusiastic, people-focused, optimistic about consultation
-- Values community input and stakeholder relationships
-- Sometimes overly idealistic about consensus-building
-- Diplomatic but can be frustrated by purely technical approaches
-
-PERSONALITY TRAITS:
-- Passionate about community consultation and engagement
-- Optimistic about finding solutions that work for everyone
-- Values stakeholder relationships and collaborative processes
-- Sometimes underestimates practical constraints
-- Enthusiastic communicator who builds rapport easily
-
-SCENARIO: {scenario_context}
-
-Stay completely in character as Sarah. Focus on community impact, stakeholder engagement, and collaborative solutions.
-Begin the conversation naturally, introducing yourself and your community perspective."""
-                },
-
-                'budget_director': {
-                    'name': 'David Walsh',
-                    'prompt': f"""You are David Walsh, Budget & Finance Director at NSW Local Council.
-
-DISC PROFILE: High C (90%), High D (80%), Low I (20%), Low S (30%)
-- Extremely analytical, data-driven, direct about financial constraints
-- Results-oriented with little patience for unfunded proposals
-- Challenges spending with detailed financial questions
-- Can be blunt about budget realities
-
-PERSONALITY TRAITS:
-- Numbers-driven decision maker who demands financial justification
-- Direct communicator about budget constraints and fiscal responsibility
-- Challenges all spending proposals with detailed cost-benefit analysis
-- Impatient with vague or poorly justified budget requests
-- Focused on long-term financial sustainability
-
-SCENARIO: {scenario_context}
-
-Stay completely in character as David. Focus on budget implications, cost-benefit analysis, and fiscal responsibility.
-Begin the conversation naturally, introducing yourself and your financial perspective."""
-                },
-
-                'union_rep': {
-                    'name': 'Maria Santos',
-                    'prompt': f"""You are Maria Santos, Union Representative for NSW Local Council employees.
-
-DISC PROFILE: High D (85%), Moderate I (60%), Moderate C (55%), Moderate S (45%)
-- Assertive advocate for workers' rights and workplace conditions
-- Direct communicator who challenges management decisions affecting staff
-- Strong negotiator who pushes for staff benefits and fair treatment
-- Knowledgeable about workplace agreements and regulations
-
-PERSONALITY TRAITS:
-- Fierce advocate for employee rights and workplace conditions
-- Challenges management decisions that impact staff welfare
-- Negotiates firmly but professionally for better conditions
-- Well-versed in awards, agreements, and workplace law
-- Direct communicator who speaks up for employees
-
-SCENARIO: {scenario_context}
-
-Stay completely in character as Maria. Focus on staff impact, workplace conditions, and employee advocacy.
-Begin the conversation naturally, introducing yourself and your union perspective."""
-                },
-
-                'councillor_thompson': {
-                    'name': 'Robert Thompson',
-                    'prompt': f"""You are Robert Thompson, long-term Councillor for NSW Local Council.
-
-DISC PROFILE: High S (85%), Moderate C (65%), Moderate I (50%), Moderate D (40%)
-- Steady, consensus-building approach to council decisions
-- Values tradition, established processes, and community stability
-- Thoughtful questioner who seeks collaborative solutions
-- Cautious about rapid changes, prefers gradual implementation
-
-PERSONALITY TRAITS:
-- Experienced councillor who values stability and consensus
-- Thoughtful decision-maker who considers long-term community impact
-- Asks probing questions to understand all perspectives
-- Prefers collaborative approaches and gradual change
-- Respects established processes and community traditions
-
-SCENARIO: {scenario_context}
-
-Stay completely in character as Robert. Focus on community impact, consensus-building, and thoughtful decision-making.
-Begin the conversation naturally, introducing yourself and your councillor perspective."""
-                },
-
-                'strategic_planner': {
-                    'name': 'Emily Kim',
-                    'prompt': f"""You are Emily Kim, Strategic Planner at NSW Local Council.
-
-DISC PROFILE: High C (80%), High I (75%), Moderate D (50%), Moderate S (45%)
-- Analytical yet enthusiastic about new ideas and innovation
-- Balances data-driven decisions with stakeholder engagement
-- Forward-thinking but methodical in planning approaches
-- Values both research and community input in strategic decisions
-
-PERSONALITY TRAITS:
-- Strategic thinker who combines analysis with stakeholder engagement
-- Enthusiastic about innovative approaches and long-term planning
-- Balances data analysis with community consultation
-- Forward-thinking but methodical in implementation
-- Values both quantitative research and qualitative feedback
-
-SCENARIO: {scenario_context}
-
-Stay completely in character as Emily. Focus on strategic implications, long-term planning, and balanced decision-making.
-Begin the conversation naturally, introducing yourself and your strategic perspective."""
-                },
-
-                # LEGACY PERSONALITIES (maintain backward compatibility)
-                'skeptical_councillor': {
-                    'name': 'Councillor Margaret Stevens',
-                    'prompt': f"""You are Councillor Margaret Stevens, a budget-focused local councillor. 
-                    You are skeptical, detail-oriented, and expect thorough justifications for spending.
-
-                    SCENARIO: {scenario_context}
-
-                    Stay in character and respond to the specific meeting context. Be particularly focused on budget implications and ratepayer value.
-                    Introduce yourself and begin the conversation."""
-                },
-                'frustrated_resident': {
-                    'name': 'Robert Chen',
-                    'prompt': f"""You are Robert Chen, a local business owner frustrated with council services. 
-                    You are articulate but frustrated, concerned about value for rates paid.
-
-                    SCENARIO: {scenario_context}
-
-                    Stay in character and respond to the specific meeting context. Focus on service delivery and value for money.
-                    Introduce yourself and begin the conversation."""
-                }
-            }
-
-            # Get personality data with logging
-            if personality_type in personalities:
-                personality_data = personalities[personality_type]
-                print(f"✅ Found personality: {personality_type} -> {personality_data['name']}")
-            else:
-                print(f"⚠️ Unknown personality type: {personality_type}, defaulting to frustrated_resident")
-                personality_data = personalities['frustrated_resident']
-
-            personality_name = personality_data['name']
-            character_prompt = personality_data['prompt']
-
-        print(f"🤖 Getting opening message from Claude for {personality_name}...")
-        opening_message = get_ai_opening_message(character_prompt)
-        print(f"✅ Got opening message: {opening_message[:50]}...")
-
-        # Store conversation data (include custom scenario info)
-        conversation_data = {
-            'personality': {
-                'name': personality_name,
-                'type': personality_type,
-                'prompt': character_prompt,
-                'custom_character': custom_character if personality_type == 'custom_character' else None
-            },
-            'scenario': scenario,
-            'custom_scenario': custom_scenario,
-            'created_at': datetime.now().isoformat()
-        }
+        personality_name, character_prompt = resolve_conversation_character(
+            personality_type, scenario, custom_character, custom_scenario
+        )
 
-        result = {
-            "success": True,
-            "conversation_id": conversation_id,
-            "conversation_data": conversation_data,
-            "personality_name": personality_name,
-            "opening_message": opening_message,
-            "timestamp": datetime.now().isoformat()
-        }
+        opening_message = take_pooled_opening(
+            personality_type, scenario, custom_character, custom_scenario, character_prompt
+        )
+        pooled = bool(opening_message)
+        if not pooled:
+            opening_message = get_ai_opening_message(character_prompt)
 
-        # Log successful creation
-        if custom_scenario:
-            print(f"✅ Started custom scenario: {custom_scenario.get('title', 'Untitled')}")
-        if custom_character:
-            print(f"✅ Started with custom character: {custom_character.get('name', 'Unnamed')}")
+        result = build_conversation_start_result(
+            conversation_id, start, personality_name, character_prompt, opening_message
+        )
+        session = build_conversation_session(
+            conversation_id, result, character_prompt,
+            [conversation_turn(personality_name, 'ai_personality', opening_message)], user_name
+        )
+        save_conversation_session(session)
+        persist_new_conversation(session)
 
-        print(f"✅ Conversation started successfully with {personality_name}")
+        log.info('conversation_started', personality=personality_name, personality_type=personality_type,
+                 custom_character=bool(custom_character), custom_scenario=bool(custom_scenario),
+                 pooled_opening=pooled)
         return jsonify(result)
 
+    except RequestBodyError as e:
+        return request_body_error(e)
+
     except Exception as e:
-        print(f"❌ Error starting conversation: {e}")
+        log.error('conversation_start_failed', error=e)
         return jsonify({
             "success": False,
             "error": str(e)
@@ -598,59 +825,33 @@ Begin the conversation naturally, introducing yourself and your strategic perspe
 
 # REPLACE the conversation_message function in your app.py with this fixed version:
 
-@app.route('/api/conversations/message', methods=['POST'])
+@routes.route('/api/conversations/message', methods=['POST'])
 def conversation_message():
     """Handle conversation messages - FIXED for Claude API"""
     try:
-        data = request.json
-        print(f"📥 Message request received")
+        message = read_request(ConversationMessageRequest)
+        if message.conversation_id:
+            bind_log_context(conversation_id=message.conversation_id)
 
-        user_message = data.get('user_message')
-        personality_data = data.get('personality_data')
-        conversation_history = data.get('conversation_history', [])
+        user_message = message.user_message
 
-        if not user_message or not personality_data:
+        if not user_message or not (message.conversation_id or message.personality_data):
             return jsonify({
                 "success": False,
-                "error": "Missing user_message or personality_data"
+                "error": "Missing user_message or conversation_id"
             }), 400
 
-        print(f"💬 User message: {user_message}")
-        print(f"🎭 Character: {personality_data.get('name', 'Unknown')}")
-
-        # Get character info
-        character_name = personality_data.get('name', 'AI Assistant')
-        character_prompt = personality_data.get('prompt', '')
-
-        # FIXED: Build conversation context properly for Claude
-        # Start with character instructions
-        system_prompt = f"""You are {character_name}. {character_prompt}
-
-Continue this conversation naturally as {character_name}. Stay in character and respond based on your personality."""
-
-        # Build message history for Claude API
-        messages = []
-
-        # Add conversation history (recent messages only)
-        for msg in conversation_history[-4:]:  # Last 4 messages to avoid token limits
-            if msg.get('sender_type') == 'ai_personality':
-                messages.append({
-                    "role": "assistant",
-                    "content": msg.get('content', '')
-                })
-            elif msg.get('sender_type') == 'user':
-                messages.append({
-                    "role": "user",
-                    "content": msg.get('content', '')
-                })
-
-        # Add the current user message
-        messages.append({
-            "role": "user",
-            "content": user_message
-        })
+        # Persona and history come from the server-side session
+        session = load_conversation_session(message)
+        if session is None:
+            return jsonify(SESSION_EXPIRED_BODY), 404
+        personality_data = session['personality']
 
-        print(f"🔗 Sending {len(messages)} messages to Claude")
+        request_data = build_claude_message_request(
+            personality_data, session['history'], user_message, session.get('conversation_id')
+        )
+        log.debug('conversation_message', character=personality_data.get('name'), user_message=user_message,
+                  messages_sent=len(request_data['messages']))
 
         # Get AI response with FIXED request format
         api_key = os.getenv('CLAUDE_API_KEY')
@@ -660,44 +861,38 @@ Continue this conversation naturally as {character_name}. Stay in character and
                 "error": "Claude API key not configured"
             }), 500
 
-        headers = {
-            'x-api-key': api_key,
-            'Content-Type': 'application/json',
-            'anthropic-version': '2023-06-01'  # ADDED: Required header
-        }
-
-        # FIXED: Proper Claude API request format
-        request_data = {
-            "model": "claude-3-sonnet-20240229",
-            "max_tokens": 300,
-            "system": system_prompt,  # FIXED: Use system parameter instead of user message
-            "messages": messages
-        }
-
-        print(f"🤖 Calling Claude API...")
-        response = requests.post(
-            'https://api.anthropic.com/v1/messages',
-            headers=headers,
-            json=request_data,
-            timeout=30
-        )
+        # Streaming mode: pass Claude's tokens straight through as server-sent events
+        if wants_stream(message.stream):
+            return Response(
+                stream_with_context(stream_conversation_reply(
+                    request_data, lambda ai_response: record_conversation_exchange(session, user_message, ai_response)
+                )),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
 
-        print(f"🤖 Claude API response status: {response.status_code}")
+        response = get_claude_transport().post_messages(request_data)
 
         if response.status_code == 200:
             result = response.json()
             ai_response = result['content'][0]['text']
-            print(f"✅ Got AI response: {ai_response[:50]}...")
+            usage = extract_usage(result.get('usage'))
+            log.info('conversation_reply', reply_chars=len(ai_response), usage=describe_usage(usage))
+            record_conversation_exchange(session, user_message, ai_response)
 
             return jsonify({
                 "success": True,
                 "ai_response": ai_response,
+                "usage": usage,
                 "timestamp": datetime.now().isoformat()
             })
         else:
             # Log the exact error for debugging
-            error_text = response.text
-            print(f"❌ Claude API error {response.status_code}: {error_text}")
+            log.error('claude_error', status=response.status_code, body=response.text)
+
+            # Overloaded / rate limited even after retries: tell the browser when to come back
+            if response.status_code in RETRYABLE_STATUS:
+                return ai_service_busy(parse_retry_after(response.headers.get('retry-after')), response.status_code)
 
             # Return a helpful error message
             return jsonify({
@@ -705,55 +900,243 @@ Continue this conversation naturally as {character_name}. Stay in character and
                 "error": f"AI service temporarily unavailable (error {response.status_code})"
             }), 500
 
+    except RequestBodyError as e:
+        return request_body_error(e)
+
+    except UpstreamBusyError as e:
+        log.warning('upstream_busy', error=e, retry_after=e.retry_after)
+        return ai_service_busy(e.retry_after)
+
     except requests.exceptions.Timeout:
-        print(f"❌ Claude API timeout")
+        log.error('claude_timeout')
         return jsonify({
             "success": False,
             "error": "AI service timeout - please try again"
         }), 500
 
     except Exception as e:
-        print(f"❌ Error in conversation message: {e}")
+        log.error('conversation_message_failed', error=e)
         return jsonify({
             "success": False,
             "error": "Conversation service error - please try again"
         }), 500
 
 
+def ai_service_busy_body(retry_after=None, upstream_status=None):
+    """Error body for an overloaded or circuit-broken upstream"""
+    seconds = max(1, int(math.ceil(retry_after if retry_after is not None else 5)))
+    return {
+        "success": False,
+        "error": "AI service is busy - please try again shortly",
+        "retry_after": seconds,
+        "upstream_status": upstream_status
+    }
+
+
+def rate_limited_body(limited):
+    """Error body for a caller over a route's rate limit (Retry-After in whole seconds)"""
+    return {
+        "success": False,
+        "error": "Too many requests - please wait a moment and try again",
+        "retry_after": max(1, int(math.ceil(limited.retry_after))),
+        "rate_limit": limited.limit.describe()
+    }
+
+
+def ai_service_busy(retry_after=None, upstream_status=None):
+    """503 with Retry-After instead of a generic 500, so clients back off"""
+    body = ai_service_busy_body(retry_after, upstream_status)
+    response = jsonify(body)
+    response.status_code = 503
+    response.headers['Retry-After'] = str(body['retry_after'])
+    return response
+
+
+# ============================================
+# CONVERSATION CONTEXT WINDOW
+# ============================================
+
+def summarize_conversation_turns(previous_summary, turns, character_name):
+    """Fold older turns into a conversation's running summary (runs on a background thread)"""
+    response = get_claude_transport().post_messages(build_summary_request(
+        config.CLAUDE_MODEL, character_name, previous_summary, turns, config.CONTEXT_SUMMARY_MAX_TOKENS
+    ))
+    if response.status_code != 200:
+        raise Exception(f"Claude API error: {response.status_code}")
+    return response.json()['content'][0]['text']
+
+
+conversation_summaries = ConversationSummarizer(
+    summarize=summarize_conversation_turns,
+    max_entries=config.CONTEXT_SUMMARY_SIZE if config.CLAUDE_API_KEY else 0,
+    workers=config.CONTEXT_SUMMARY_WORKERS,
+    can_summarize=opening_pool_has_room
+)
+
+
+# Each conversation's history stays rendered between turns (checked against the session every time)
+rendered_conversations = RenderedConversations(max_entries=config.CONTEXT_RENDER_CACHE_SIZE)
+
+
+def build_claude_message_request(personality_data, conversation_history, user_message, conversation_id=None):
+    """Build the Claude messages payload for one conversation turn"""
+    # Get character info
+    character_name = personality_data.get('name', 'AI Assistant')
+    character_prompt = personality_data.get('prompt', '')
+
+    # Only turns added since the last request are rendered; the window start comes from running token totals
+    window_start = rendered_conversations.window_start(
+        conversation_id, conversation_history, config.CONTEXT_TOKEN_BUDGET
+    )
+
+    # Recent turns word for word up to the token budget; older ones live on in a running summary
+    summary, first_turn = conversation_summaries.window(
+        conversation_key(conversation_id, character_prompt, conversation_history),
+        conversation_history,
+        window_start,
+        character_name
+    )
+
+    # FIXED: Build conversation context properly for Claude
+    # Start with character instructions - identical every turn, so Claude can cache it
+    instructions = f"Continue this conversation naturally as {character_name}. Stay in character and respond based on your personality."
+    if summary:
+        instructions += f"\n\nEARLIER IN THIS CONVERSATION (summary):\n{summary}"
+    system_prompt = cacheable_system(f"You are {character_name}. {character_prompt}", instructions)
+
+    # Build message history for Claude API (within the token budget)
+    messages = rendered_conversations.claude_messages(conversation_id, conversation_history, first_turn)
+
+    # Add the current user message
+    messages.append({
+        "role": "user",
+        "content": user_message
+    })
+
+    # FIXED: Proper Claude API request format
+    return {
+        "model": config.CLAUDE_MODEL,
+        "max_tokens": 300,
+        "system": system_prompt,  # FIXED: Use system parameter instead of user message
+        "messages": messages
+    }
+
+
+def wants_stream(stream_requested):
+    """Client asked for SSE via `stream: true` or an event-stream Accept header"""
+    if stream_requested:
+        return True
+    return 'text/event-stream' in request.headers.get('Accept', '')
+
+
+def stream_conversation_reply(request_data, on_complete=None):
+    """
+    Relay a streamed Claude reply to the browser as server-sent events
+    Events: `token` (text chunk), `first_token` (time-to-first-token),
+    `done` (full reply + timings) and `error`
+    on_complete(ai_response) runs once the whole reply has arrived
+    """
+    started = time.perf_counter()
+    ttft_ms = None
+    parts = []
+    usage = {}
+
+    try:
+        response = get_claude_transport().open_stream(request_data)
+        if response.status_code != 200:
+            log.error('claude_stream_error', status=response.status_code, body=response.text)
+            response.close()
+            if response.status_code in RETRYABLE_STATUS:
+                yield format_sse('error', ai_service_busy_body(
+                    parse_retry_after(response.headers.get('retry-after')), response.status_code
+                ))
+                return
+            yield format_sse('error', {
+                "success": False,
+                "error": f"AI service temporarily unavailable (error {response.status_code})"
+            })
+            return
+
+        for text in stream_text_deltas(iter_stream_events(response), usage):
+            if ttft_ms is None:
+                ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+                observe_ttft('/api/conversations/message', ttft_ms / 1000)
+                yield format_sse('first_token', {"ttft_ms": ttft_ms})
+            parts.append(text)
+            yield format_sse('token', {"text": text})
+
+        ai_response = ''.join(parts)
+        log.info('conversation_reply', reply_chars=len(ai_response), usage=describe_usage(usage),
+                 ttft_ms=ttft_ms, streamed=True)
+        if on_complete:
+            on_complete(ai_response)
+        yield format_sse('done', {
+            "success": True,
+            "ai_response": ai_response,
+            "usage": extract_usage(usage),
+            "ttft_ms": ttft_ms,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),
+            "timestamp": datetime.now().isoformat()
+        })
+
+    except UpstreamBusyError as e:
+        log.warning('upstream_busy', error=e, retry_after=e.retry_after)
+        yield format_sse('error', ai_service_busy_body(e.retry_after))
+
+    except requests.exceptions.Timeout:
+        log.error('claude_timeout', streamed=True)
+        yield format_sse('error', {"success": False, "error": "AI service timeout - please try again"})
+
+    except Exception as e:
+        log.error('conversation_stream_failed', error=e, partial_chars=sum(len(part) for part in parts))
+        yield format_sse('error', {
+            "success": False,
+            "error": "Conversation service error - please try again",
+            "partial_response": ''.join(parts)
+        })
+
+
 # ============================================
 # SCENARIO MANAGEMENT
 # ============================================
 
-@app.route('/api/scenarios', methods=['GET'])
+SCENARIO_CATALOG = [
+    {
+        'id': 'budget_cuts',
+        'title': 'Budget Reduction Discussion',
+        'description': 'Practice explaining budget cuts while maintaining team morale',
+        'type': 'preset'
+    },
+    {
+        'id': 'angry_resident',
+        'title': 'Challenging Resident Interaction',
+        'description': 'Handle frustrated ratepayer complaints about service levels',
+        'type': 'preset'
+    },
+    {
+        'id': 'custom_scenario',
+        'title': 'Create Custom Scenario',
+        'description': 'Design your specific meeting situation',
+        'type': 'custom'
+    }
+]
+
+# Fixed for the life of the process - the ETag (a body hash) changes whenever the list above does
+scenarios_catalog = CatalogResponse(
+    build=lambda: {'success': True, 'scenarios': SCENARIO_CATALOG, 'count': len(SCENARIO_CATALOG)},
+    version=lambda: 'preset',
+    serialize=lambda payload: current_app.json.response(payload).get_data(),
+    max_age=config.CATALOG_MAX_AGE,
+    compress_level=config.COMPRESS_LEVEL,
+    compress_min_bytes=config.COMPRESS_MIN_BYTES
+)
+
+
+@routes.route('/api/scenarios', methods=['GET'])
 def get_scenarios():
     """Get available practice scenarios"""
     try:
-        scenarios = [
-            {
-                'id': 'budget_cuts',
-                'title': 'Budget Reduction Discussion',
-                'description': 'Practice explaining budget cuts while maintaining team morale',
-                'type': 'preset'
-            },
-            {
-                'id': 'angry_resident',
-                'title': 'Challenging Resident Interaction',
-                'description': 'Handle frustrated ratepayer complaints about service levels',
-                'type': 'preset'
-            },
-            {
-                'id': 'custom_scenario',
-                'title': 'Create Custom Scenario',
-                'description': 'Design your specific meeting situation',
-                'type': 'custom'
-            }
-        ]
-
-        return jsonify({
-            'success': True,
-            'scenarios': scenarios,
-            'count': len(scenarios)
-        })
+        return send_catalog(scenarios_catalog)
 
     except Exception as e:
         return jsonify({
@@ -767,17 +1150,16 @@ def get_scenarios():
 # EMAIL ANALYSIS ENDPOINTS
 # ============================================
 
-@app.route('/api/email/analyze', methods=['POST'])
+@routes.route('/api/email/analyze', methods=['POST'])
 def analyze_email():
     """Analyze email for professional communication and Code of Conduct compliance"""
     try:
-        data = request.get_json()
-        print(f"📧 Email analysis request received")
+        email = read_request(EmailAnalysisRequest)
 
         # Extract email data
-        email_subject = data.get('subject', '')
-        email_content = data.get('content', '')
-        colleague_info = data.get('colleague', {})
+        email_subject = email.subject
+        email_content = email.content
+        colleague_info = email.colleague
 
         if not email_content:
             return jsonify({
@@ -785,17 +1167,26 @@ def analyze_email():
                 'error': 'Email content is required'
             }), 400
 
-        print(f"📝 Analyzing email: Subject='{email_subject}', Content length={len(email_content)}")
+        log.debug('email_analysis', subject=email_subject, content_chars=len(email_content))
 
         # Use Claude integration for analysis
-        if claude_client:
-            analysis_result = claude_client.analyze_email_professional(
+        client = get_claude_client()
+        if client and wants_stream(email.stream):
+            # Progressive mode - each section is sent as soon as it parses
+            return Response(
+                stream_with_context(stream_email_analysis(email_content, email_subject, colleague_info)),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
+        if client:
+            analysis_result = client.analyze_email_professional(
                 email_content=email_content,
                 email_subject=email_subject,
                 colleague_info=colleague_info
             )
 
-            print(f"✅ Email analysis completed: Score={analysis_result.get('overall_score', 'N/A')}")
+            log.info('email_analysed', score=analysis_result.get('overall_score'))
 
             return jsonify({
                 'success': True,
@@ -808,28 +1199,185 @@ def analyze_email():
                 'error': 'AI analysis service not available'
             }), 503
 
+    except RequestBodyError as e:
+        return request_body_error(e)
+
+    except UpstreamBusyError as e:
+        log.warning('upstream_busy', error=e, retry_after=e.retry_after)
+        return ai_service_busy(e.retry_after, e.upstream_status)
+
     except Exception as e:
-        print(f"❌ Email analysis error: {e}")
+        log.error('email_analysis_failed', error=e)
         return jsonify({
             'success': False,
             'error': f'Analysis failed: {str(e)}'
         }), 500
 
 
-@app.route('/api/email/test', methods=['GET'])
+def stream_email_analysis(email_content, email_subject, colleague_info):
+    """
+    Stream an email analysis section by section as server-sent events
+    Events: `section` ({name, value}) as each part of the JSON completes,
+    then `done` (full analysis, `partial` if the reply broke) or `error`
+    """
+    cache = get_analysis_cache()
+    model = get_claude_client().model
+    cache_key = email_cache_key(email_content, email_subject, colleague_info, model)
+    cached = cache.get(cache_key)
+    if cached:
+        yield from replay_cached_analysis(cached)
+        return
+
+    progress = ProgressiveAnalysis()
+    try:
+        response = get_claude_transport().open_stream(
+            build_email_analysis_request(model, email_content, email_subject, colleague_info)
+        )
+        if response.status_code != 200:
+            log.error('claude_stream_error', status=response.status_code, body=response.text)
+            response.close()
+            if response.status_code in RETRYABLE_STATUS:
+                yield format_sse('error', ai_service_busy_body(
+                    parse_retry_after(response.headers.get('retry-after')), response.status_code
+                ))
+                return
+            yield format_sse('error', {
+                'success': False,
+                'error': f'AI analysis service unavailable (error {response.status_code})'
+            })
+            return
+
+        for text in stream_text_deltas(iter_stream_events(response)):
+            yield from progress.feed(text)
+
+    except UpstreamBusyError as e:
+        log.warning('upstream_busy', error=e, retry_after=e.retry_after)
+        yield format_sse('error', ai_service_busy_body(e.retry_after))
+        return
+
+    except Exception as e:
+        log.error('email_analysis_stream_failed', error=e, sections=len(progress.sections))
+        if not progress.sections:
+            yield format_sse('error', {'success': False, 'error': f'Analysis failed: {str(e)}'})
+            return
+        # Keep whatever sections already arrived
+        yield progress.finish(e)
+        return
+
+    done = progress.finish()
+    cache.put(cache_key, progress.analysis)
+    log.info('email_analysed', score=progress.analysis.get('overall_score'), streamed=True)
+    yield done
+
+
+@routes.route('/api/email/analyze/batch', methods=['POST'])
+def analyze_email_batch():
+    """
+    Analyze many emails at once
+    Live mode runs them in parallel and (with `stream: true`) sends each result
+    as an SSE `result` event the moment it's ready, then a `done` summary.
+    `mode: "deferred"` submits a Message Batch instead - cheaper, but results
+    arrive later via GET /api/email/analyze/batch/<batch_id>
+    """
+    try:
+        batch_request = read_request(EmailBatchRequest)
+        items, error = parse_batch_emails(batch_request.to_dict(), config.EMAIL_BATCH_MAX)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+
+        client = get_claude_client()
+        if not client:
+            return jsonify({
+                'success': False,
+                'error': 'AI analysis service not available'
+            }), 503
+
+        log.info('email_batch', emails=len(items), mode=batch_request.mode)
+
+        if batch_request.mode == 'deferred':
+            batch = submit_deferred_batch(get_claude_transport(), items, config.CLAUDE_MODEL)
+            log.info('email_batch_submitted', batch_id=batch['batch_id'])
+            return jsonify(dict(batch, success=True, mode='deferred',
+                                status_url=f"/api/email/analyze/batch/{batch['batch_id']}")), 202
+
+        if wants_stream(batch_request.stream):
+            return Response(
+                stream_with_context(stream_email_batch(items)),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
+        started = time.perf_counter()
+        results = sorted(run_email_batch(client, items, config.EMAIL_BATCH_CONCURRENCY),
+                         key=lambda r: r['index'])
+        summary = summarise_batch(results, time.perf_counter() - started)
+        log.info('email_batch_completed', **summary)
+        return jsonify({'success': True, 'results': results, 'summary': summary})
+
+    except RequestBodyError as e:
+        return request_body_error(e)
+
+    except UpstreamBusyError as e:
+        log.warning('upstream_busy', error=e, retry_after=e.retry_after)
+        return ai_service_busy(e.retry_after)
+
+    except Exception as e:
+        log.error('email_batch_failed', error=e)
+        return jsonify({
+            'success': False,
+            'error': f'Batch analysis failed: {str(e)}'
+        }), 500
+
+
+def stream_email_batch(items):
+    """SSE stream of batch results in completion order"""
+    started = time.perf_counter()
+    results = []
+    for result in run_email_batch(get_claude_client(), items, config.EMAIL_BATCH_CONCURRENCY):
+        results.append(result)
+        yield format_sse('result', result)
+
+    summary = summarise_batch(results, time.perf_counter() - started)
+    log.info('email_batch_completed', streamed=True, **summary)
+    yield format_sse('done', dict(summary, success=True))
+
+
+@routes.route('/api/email/analyze/batch/<batch_id>', methods=['GET'])
+def get_email_batch(batch_id):
+    """Status of a deferred batch - includes `results` once processing has ended"""
+    try:
+        batch = get_deferred_batch(get_claude_transport(), batch_id)
+        return jsonify(dict(batch, success=True, mode='deferred'))
+
+    except LookupError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+
+    except UpstreamBusyError as e:
+        log.warning('upstream_busy', error=e, retry_after=e.retry_after)
+        return ai_service_busy(e.retry_after)
+
+    except Exception as e:
+        log.error('email_batch_status_failed', batch_id=batch_id, error=e)
+        return jsonify({
+            'success': False,
+            'error': f'Could not fetch batch: {str(e)}'
+        }), 502
+
+
+@routes.route('/api/email/test', methods=['GET'])
 def test_email_endpoint():
     """Test email analysis endpoint availability"""
     return jsonify({
         'status': 'working',
         'message': 'Email analysis endpoint is available',
-        'claude_available': claude_client is not None,
+        'claude_available': get_claude_client() is not None,
         'timestamp': datetime.now().isoformat()
     })
 # ============================================
 # ERROR HANDLERS
 # ============================================
 
-@app.errorhandler(404)
+@routes.app_errorhandler(404)
 def not_found(error):
     return jsonify({
         'success': False,
@@ -846,7 +1394,7 @@ def not_found(error):
     }), 404
 
 
-@app.errorhandler(500)
+@routes.app_errorhandler(500)
 def internal_error(error):
     return jsonify({
         'success': False,
@@ -855,7 +1403,7 @@ def internal_error(error):
     }), 500
 
 
-@app.route('/api/scenarios/custom', methods=['POST'])
+@routes.route('/api/scenarios/custom', methods=['POST'])
 def save_custom_scenario():
     """Save a custom scenario for reuse"""
     try:
@@ -872,8 +1420,10 @@ def save_custom_scenario():
         scenario_data['id'] = str(uuid.uuid4())
         scenario_data['created_at'] = datetime.now().isoformat()
 
-        # For now, just return success (later we'll add persistent storage)
-        print(f"📋 Custom scenario saved: {scenario_data.get('title', 'Untitled')}")
+        storage = get_storage()
+        if storage is not None:
+            storage.save_scenario(scenario_data)
+        log.info('custom_scenario_saved', scenario_id=scenario_data['id'], title=scenario_data.get('title'))
 
         return jsonify({
             'success': True,
@@ -882,12 +1432,96 @@ def save_custom_scenario():
         })
 
     except Exception as e:
-        print(f"❌ Error saving custom scenario: {e}")
+        log.error('custom_scenario_save_failed', error=e)
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+
+@routes.route('/api/scenarios/custom', methods=['GET'])
+def list_custom_scenarios():
+    """Saved custom scenarios, newest first"""
+    storage = get_storage()
+    scenarios = storage.list_scenarios() if storage else []
+    return jsonify({
+        'success': True,
+        'scenarios': scenarios,
+        'count': len(scenarios)
+    })
+
+# ============================================
+# BACKGROUND SERVICES
+# ============================================
+
+_background_pid = None
+
+
+def start_background_services():
+    """
+    Warm the Claude connection pool, start the upstream prober and fill the
+    opening pool - once per process. With gunicorn's preload_app the master
+    imports this module and the workers call this after the fork (see
+    gunicorn.conf.py), so no sockets or threads are shared across the fork
+    """
+    global _background_pid
+    if _background_pid == os.getpid():
+        return
+    _background_pid = os.getpid()
+
+    client = get_claude_client()
+    if client:
+        client.transport.warm_up_async()  # Open pooled connections in the background
+        if config.CLAUDE_API_KEY:
+            # Keeps /health/ready's cached upstream status fresh when traffic is quiet
+            get_upstream_monitor().start(probe=client.transport.probe)
+    prewarm_opening_pool()
+
+
+# ============================================
+# APPLICATION FACTORY
+# ============================================
+
+def create_app():
+    """
+    Build the Flask app: JSON codec, CORS and every route on `routes`
+    Importing this module only defines things - the environment check, the
+    Claude client and the background services happen here (or on first use),
+    so gunicorn, the ASGI wrapper and scripts decide when startup work runs
+    """
+    flask_app = Flask(__name__)
+    flask_app.json = FastJSONProvider(flask_app)
+    CORS(flask_app, origins=["*"])  # Allow frontend to talk to backend
+    flask_app.config['DEBUG'] = True
+    flask_app.register_blueprint(routes)
+
+    if not check_environment():
+        print("❌ Configuration errors found. Please fix before continuing.")
+
+    get_rate_limiter()  # Read RATE_LIMITS now - a typo should stop startup, not 500 the first request
+    get_session_store()  # Likewise a session store that can't be shared by this many workers
+
+    # A preloading gunicorn master leaves these to each worker (post_fork)
+    if not config.DEFER_BACKGROUND_SERVICES:
+        start_background_services()
+    return flask_app
+
+
+_app = None
+_app_lock = threading.Lock()
+
+
+def __getattr__(name):
+    """`app` is built on first access, so `gunicorn app:app` and `from app import app` keep working"""
+    global _app
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                _app = create_app()
+    return _app
+
 # ============================================
 # RUN APPLICATION
 # ============================================
@@ -908,9 +1542,9 @@ if __name__ == '__main__':
     print("  POST /api/conversations/message - Send message")
     print()
 
-    # Run the Flask development server
+    # Run the Flask development server (production: `gunicorn 'app:create_app()'`, settings in gunicorn.conf.py)
     port = int(os.environ.get('PORT', 5000))  # Railway provides PORT variable
-    app.run(
+    create_app().run(
         host='0.0.0.0',
         port=port,
         debug=False  # Disable debug in production
@@ -0,0 +1,517 @@
+"""
+Conversation Trainer - Async (ASGI) serving path
+Start, message and email-analyze (single and batch) run on asyncio; everything else is the Flask app
+
+Run with:
+    cd backend && uvicorn asgi:app --host 0.0.0.0 --port $PORT
+
+The Flask app in app.py is unchanged and can still be served on its own
+(gunicorn 'app:create_app()') for compatibility.
+"""
+
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import (
+    app as flask_app,
+    DEFAULT_OPENING_MESSAGE,
+    SESSION_EXPIRED_BODY,
+    ai_service_busy_body,
+    build_claude_message_request,
+    build_conversation_session,
+    build_conversation_start_result,
+    conversation_turn,
+    build_opening_request,
+    get_claude_transport,
+    load_conversation_session,
+    persist_new_conversation,
+    rate_limited_body,
+    record_conversation_exchange,
+    refresh_metric_gauges,
+    resolve_conversation_character,
+    save_conversation_session,
+    take_pooled_opening,
+)
+from api.async_claude import get_async_client, close_async_client
+from api.analysis_cache import email_cache_key, get_analysis_cache
+from api.claude_integration import build_email_analysis_request
+from api.email_stream import ProgressiveAnalysis, replay_cached_analysis
+from api.email_batch import parse_batch_emails, run_email_batch_async, summarise_batch, submit_deferred_batch
+from api.claude_transport import format_sse
+from api.codec import RequestBodyError, decompress_body, dumps as codec_dumps
+from api.schemas import ConversationMessageRequest, EmailAnalysisRequest, EmailBatchRequest, StartConversationRequest
+from api.prompt_caching import describe_usage, extract_usage
+from api.resilience import UpstreamBusyError, RETRYABLE_STATUS, parse_retry_after
+from api.metrics import observe_http_request, observe_ttft
+from api.rate_limit import RateLimited, client_ip, client_user_id, get_rate_limiter
+from api.request_log import bind_log_context, get_logger, start_log_context
+from api.session_store import get_session_store
+from config import get_config
+
+config = get_config()
+log = get_logger('asgi')
+
+
+# ============================================
+# REQUEST / RESPONSE CODEC
+# ============================================
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered through api.codec (orjson when it's installed)"""
+
+    def render(self, content) -> bytes:
+        return codec_dumps(content)
+
+
+async def read_request(request: Request, struct_class):
+    """Async twin of app.read_request - gzip / br bodies decoded into a typed struct"""
+    body = decompress_body(await request.body(), request.headers.get('content-encoding'), config.MAX_REQUEST_BYTES)
+    return struct_class.from_json(body)
+
+
+def request_body_error(error):
+    return FastJSONResponse({"success": False, "error": str(error)}, status_code=error.status)
+
+
+# ============================================
+# ASYNC ROUTES
+# ============================================
+
+async def run_session_io(func, *args):
+    """Session store calls - SQLite / Redis block, so they run off the event loop"""
+    if get_session_store().blocking:
+        return await asyncio.to_thread(func, *args)
+    return func(*args)
+
+
+def ai_service_busy(retry_after=None, upstream_status=None):
+    """503 with Retry-After (async twin of app.ai_service_busy)"""
+    body = ai_service_busy_body(retry_after, upstream_status)
+    return FastJSONResponse(body, status_code=503, headers={'Retry-After': str(body['retry_after'])})
+
+
+async def get_ai_opening_message_async(character_prompt):
+    """Async twin of app.get_ai_opening_message"""
+    try:
+        if not config.CLAUDE_API_KEY:
+            return DEFAULT_OPENING_MESSAGE
+
+        response = await get_async_client().post_messages(build_opening_request(character_prompt))
+
+        if response.status_code == 200:
+            return response.json()['content'][0]['text']
+        else:
+            log.warning('opening_failed', status=response.status_code)
+            return DEFAULT_OPENING_MESSAGE
+
+    except Exception as e:
+        log.warning('opening_failed', error=e)
+        return DEFAULT_OPENING_MESSAGE
+
+
+async def start_conversation(request: Request):
+    """Async /api/conversations/start"""
+    try:
+        start = await read_request(request, StartConversationRequest)
+
+        personality_name, character_prompt = resolve_conversation_character(
+            start.personality_type, start.scenario, start.custom_character, start.custom_scenario
+        )
+
+        conversation_id = str(uuid.uuid4())
+        bind_log_context(conversation_id=conversation_id)
+
+        opening_message = take_pooled_opening(
+            start.personality_type, start.scenario, start.custom_character, start.custom_scenario, character_prompt
+        )
+        pooled = bool(opening_message)
+        if not pooled:
+            opening_message = await get_ai_opening_message_async(character_prompt)
+
+        result = build_conversation_start_result(
+            conversation_id, start, personality_name, character_prompt, opening_message
+        )
+        session = build_conversation_session(
+            conversation_id, result, character_prompt,
+            [conversation_turn(personality_name, 'ai_personality', opening_message)], start.user_name
+        )
+        await run_session_io(save_conversation_session, session)
+        persist_new_conversation(session)  # Only queues the write
+        log.info('conversation_started', personality=personality_name, personality_type=start.personality_type,
+                 custom_character=bool(start.custom_character), custom_scenario=bool(start.custom_scenario),
+                 pooled_opening=pooled)
+        return FastJSONResponse(result)
+
+    except RequestBodyError as e:
+        return request_body_error(e)
+
+    except Exception as e:
+        log.error('conversation_start_failed', error=e)
+        return FastJSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+
+async def conversation_message(request: Request):
+    """Async /api/conversations/message (JSON or server-sent events)"""
+    try:
+        message = await read_request(request, ConversationMessageRequest)
+        if message.conversation_id:
+            bind_log_context(conversation_id=message.conversation_id)
+
+        user_message = message.user_message
+
+        if not user_message or not (message.conversation_id or message.personality_data):
+            return FastJSONResponse({
+                "success": False,
+                "error": "Missing user_message or conversation_id"
+            }, status_code=400)
+
+        session = await run_session_io(load_conversation_session, message)
+        if session is None:
+            return FastJSONResponse(SESSION_EXPIRED_BODY, status_code=404)
+
+        if not config.CLAUDE_API_KEY:
+            return FastJSONResponse({
+                "success": False,
+                "error": "Claude API key not configured"
+            }, status_code=500)
+
+        request_data = build_claude_message_request(
+            session['personality'], session['history'], user_message, session.get('conversation_id')
+        )
+
+        async def on_complete(ai_response):
+            await run_session_io(record_conversation_exchange, session, user_message, ai_response)
+
+        if message.stream or 'text/event-stream' in request.headers.get('accept', ''):
+            return StreamingResponse(
+                stream_conversation_reply(request_data, on_complete),
+                media_type='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
+        response = await get_async_client().post_messages(request_data)
+
+        if response.status_code == 200:
+            result = response.json()
+            await on_complete(result['content'][0]['text'])
+            log.info('conversation_reply', reply_chars=len(result['content'][0]['text']),
+                     usage=describe_usage(extract_usage(result.get('usage'))))
+            return FastJSONResponse({
+                "success": True,
+                "ai_response": result['content'][0]['text'],
+                "usage": extract_usage(result.get('usage')),
+                "timestamp": datetime.now().isoformat()
+            })
+
+        log.error('claude_error', status=response.status_code, body=response.text)
+        if response.status_code in RETRYABLE_STATUS:
+            return ai_service_busy(parse_retry_after(response.headers.get('retry-after')), response.status_code)
+        return FastJSONResponse({
+            "success": False,
+            "error": f"AI service temporarily unavailable (error {response.status_code})"
+        }, status_code=500)
+
+    except RequestBodyError as e:
+        return request_body_error(e)
+
+    except UpstreamBusyError as e:
+        log.warning('upstream_busy', error=e, retry_after=e.retry_after)
+        return ai_service_busy(e.retry_after)
+
+    except Exception as e:
+        log.error('conversation_message_failed', error=e)
+        return FastJSONResponse({
+            "success": False,
+            "error": "Conversation service error - please try again"
+        }, status_code=500)
+
+
+async def stream_conversation_reply(request_data, on_complete=None):
+    """Async twin of app.stream_conversation_reply (same event names; on_complete is awaited)"""
+    started = time.perf_counter()
+    ttft_ms = None
+    parts = []
+    usage = {}
+
+    try:
+        async for text in get_async_client().stream_text(request_data, usage):
+            if ttft_ms is None:
+                ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+                observe_ttft('/api/conversations/message', ttft_ms / 1000)
+                yield format_sse('first_token', {"ttft_ms": ttft_ms})
+            parts.append(text)
+            yield format_sse('token', {"text": text})
+
+        if on_complete:
+            await on_complete(''.join(parts))
+        log.info('conversation_reply', reply_chars=sum(len(part) for part in parts), usage=describe_usage(usage),
+                 ttft_ms=ttft_ms, streamed=True)
+        yield format_sse('done', {
+            "success": True,
+            "ai_response": ''.join(parts),
+            "usage": extract_usage(usage),
+            "ttft_ms": ttft_ms,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),
+            "timestamp": datetime.now().isoformat()
+        })
+
+    except UpstreamBusyError as e:
+        yield format_sse('error', ai_service_busy_body(e.retry_after, e.upstream_status))
+
+    except Exception as e:
+        log.error('conversation_stream_failed', error=e, partial_chars=sum(len(part) for part in parts))
+        yield format_sse('error', {
+            "success": False,
+            "error": "Conversation service error - please try again",
+            "partial_response": ''.join(parts)
+        })
+
+
+async def analyze_email(request: Request):
+    """Async /api/email/analyze"""
+    try:
+        email = await read_request(request, EmailAnalysisRequest)
+
+        email_content = email.content
+        if not email_content:
+            return FastJSONResponse({
+                'success': False,
+                'error': 'Email content is required'
+            }, status_code=400)
+
+        if email.stream or 'text/event-stream' in request.headers.get('accept', ''):
+            return StreamingResponse(
+                stream_email_analysis(email_content, email.subject, email.colleague),
+                media_type='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
+        analysis_result = await get_async_client().analyze_email_professional(
+            email_content=email_content,
+            email_subject=email.subject,
+            colleague_info=email.colleague
+        )
+
+        log.info('email_analysed', score=analysis_result.get('overall_score'))
+        return FastJSONResponse({
+            'success': True,
+            'analysis': analysis_result
+        })
+
+    except RequestBodyError as e:
+        return request_body_error(e)
+
+    except UpstreamBusyError as e:
+        log.warning('upstream_busy', error=e, retry_after=e.retry_after)
+        return ai_service_busy(e.retry_after, e.upstream_status)
+
+    except Exception as e:
+        log.error('email_analysis_failed', error=e)
+        return FastJSONResponse({
+            'success': False,
+            'error': f'Analysis failed: {str(e)}'
+        }, status_code=500)
+
+
+async def stream_email_analysis(email_content, email_subject, colleague_info):
+    """Async twin of app.stream_email_analysis (same events)"""
+    client = get_async_client()
+    cache = get_analysis_cache()
+    cache_key = email_cache_key(email_content, email_subject, colleague_info, client.model)
+    cached = cache.get(cache_key)
+    if cached:
+        for event in replay_cached_analysis(cached):
+            yield event
+        return
+
+    progress = ProgressiveAnalysis()
+    try:
+        payload = build_email_analysis_request(client.model, email_content, email_subject, colleague_info)
+        async for text in client.stream_text(payload):
+            for event in progress.feed(text):
+                yield event
+
+    except UpstreamBusyError as e:
+        yield format_sse('error', ai_service_busy_body(e.retry_after, e.upstream_status))
+        return
+
+    except Exception as e:
+        log.error('email_analysis_stream_failed', error=e, sections=len(progress.sections))
+        if not progress.sections:
+            yield format_sse('error', {'success': False, 'error': f'Analysis failed: {str(e)}'})
+            return
+        yield progress.finish(e)
+        return
+
+    done = progress.finish()
+    cache.put(cache_key, progress.analysis)
+    log.info('email_analysed', score=progress.analysis.get('overall_score'), streamed=True)
+    yield done
+
+
+async def analyze_email_batch(request: Request):
+    """Async /api/email/analyze/batch (same modes and events as the Flask route)"""
+    try:
+        batch_request = await read_request(request, EmailBatchRequest)
+        items, error = parse_batch_emails(batch_request.to_dict(), config.EMAIL_BATCH_MAX)
+        if error:
+            return FastJSONResponse({'success': False, 'error': error}, status_code=400)
+
+        if batch_request.mode == 'deferred':
+            # Blocking requests call - keep it off the event loop
+            batch = await asyncio.to_thread(submit_deferred_batch, get_claude_transport(), items, config.CLAUDE_MODEL)
+            log.info('email_batch_submitted', batch_id=batch['batch_id'])
+            return FastJSONResponse(dict(batch, success=True, mode='deferred',
+                                     status_url=f"/api/email/analyze/batch/{batch['batch_id']}"), status_code=202)
+
+        if batch_request.stream or 'text/event-stream' in request.headers.get('accept', ''):
+            return StreamingResponse(
+                stream_email_batch(items),
+                media_type='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
+        started = time.perf_counter()
+        results = [result async for result in
+                   run_email_batch_async(get_async_client(), items, config.EMAIL_BATCH_CONCURRENCY)]
+        results.sort(key=lambda r: r['index'])
+        summary = summarise_batch(results, time.perf_counter() - started)
+        log.info('email_batch_completed', **summary)
+        return FastJSONResponse({'success': True, 'results': results, 'summary': summary})
+
+    except RequestBodyError as e:
+        return request_body_error(e)
+
+    except UpstreamBusyError as e:
+        log.warning('upstream_busy', error=e, retry_after=e.retry_after)
+        return ai_service_busy(e.retry_after)
+
+    except Exception as e:
+        log.error('email_batch_failed', error=e)
+        return FastJSONResponse({
+            'success': False,
+            'error': f'Batch analysis failed: {str(e)}'
+        }, status_code=500)
+
+
+async def stream_email_batch(items):
+    """Async twin of app.stream_email_batch"""
+    started = time.perf_counter()
+    results = []
+    async for result in run_email_batch_async(get_async_client(), items, config.EMAIL_BATCH_CONCURRENCY):
+        results.append(result)
+        yield format_sse('result', result)
+
+    summary = summarise_batch(results, time.perf_counter() - started)
+    log.info('email_batch_completed', streamed=True, **summary)
+    yield format_sse('done', dict(summary, success=True))
+
+
+# ============================================
+# APPLICATION
+# ============================================
+
+@asynccontextmanager
+async def lifespan(app):
+    """Create the async Claude client on startup and close it on shutdown"""
+    get_async_client()
+    yield
+    await close_async_client()
+
+
+class RequestMetricsMiddleware:
+    """
+    Times an async route the same way app.py's after_request hook times Flask
+    routes (until the response starts), so /metrics covers both serving paths,
+    and gives the request its log correlation id
+    """
+
+    def __init__(self, app, route: str):
+        self.app = app
+        self.route = route
+
+    async def __call__(self, scope, receive, send):
+        started = time.perf_counter()
+        # Tag this request's log records (same X-Request-ID handling as app.py)
+        request_id = start_log_context(Headers(scope=scope).get('x-request-id'))
+
+        async def send_with_metrics(message):
+            if message['type'] == 'http.response.start':
+                observe_http_request(self.route, scope['method'], message['status'], time.perf_counter() - started)
+                refresh_metric_gauges()
+                MutableHeaders(scope=message)['X-Request-ID'] = request_id
+            await send(message)
+
+        await self.app(scope, receive, send_with_metrics)
+
+
+class RateLimitMiddleware:
+    """
+    app.py's enforce_rate_limits for the async routes: a 429 with Retry-After
+    before the endpoint runs. Shared backends do I/O, so they're checked on
+    a worker thread rather than on the event loop
+    """
+
+    def __init__(self, app, route: str):
+        self.app = app
+        self.route = route
+
+    async def __call__(self, scope, receive, send):
+        limiter = get_rate_limiter()
+        if scope['method'] == 'OPTIONS' or not limiter.applies_to(self.route):
+            return await self.app(scope, receive, send)
+
+        headers = Headers(scope=scope)
+        remote_addr = scope['client'][0] if scope.get('client') else None
+        identity = (self.route, client_user_id(headers.get('x-user-id')),
+                    client_ip(remote_addr, headers.get('x-forwarded-for'), config.RATE_LIMIT_PROXY_HOPS))
+        try:
+            if limiter.blocking:
+                await asyncio.to_thread(limiter.check, *identity)
+            else:
+                limiter.check(*identity)
+        except RateLimited as limited:
+            log.info('rate_limited', route=limited.route, limit=limited.limit.describe(),
+                     retry_after=limited.retry_after)
+            body = rate_limited_body(limited)
+            response = FastJSONResponse(body, status_code=429, headers={'Retry-After': str(body['retry_after'])})
+            return await response(scope, receive, send)
+        await self.app(scope, receive, send)
+
+
+# Flask-CORS covers the mounted Flask app; the async routes need their own
+cors = [Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])]
+
+
+def async_route(path, endpoint):
+    """POST route with CORS, request metrics, rate limits and gzip for JSON replies (event streams are never buffered)"""
+    middleware = [Middleware(RequestMetricsMiddleware, route=path)] + cors + [
+        Middleware(RateLimitMiddleware, route=path),
+        Middleware(GZipMiddleware, minimum_size=config.COMPRESS_MIN_BYTES, compresslevel=config.COMPRESS_LEVEL)
+    ]
+    return Route(path, endpoint, methods=['POST', 'OPTIONS'], middleware=middleware)
+
+
+app = Starlette(
+    routes=[
+        async_route('/api/conversations/start', start_conversation),
+        async_route('/api/conversations/message', conversation_message),
+        async_route('/api/email/analyze', analyze_email),
+        async_route('/api/email/analyze/batch', analyze_email_batch),
+        Mount('/', app=WSGIMiddleware(flask_app)),
+    ],
+    lifespan=lifespan
+)
@@ -0,0 +1,122 @@
+"""
+CPU benchmark for the request/response codec
+Times the JSON work one conversation turn does - decode the request body,
+read its fields, encode the Claude payload, parse Claude's reply and encode
+the response - the old way (stdlib json, dicts and .get) and through
+api.codec with typed structs, for growing conversation histories.
+Also reports what gzip does to response size.
+
+    cd backend && python benchmarks/codec_benchmark.py --turns 10 50 200 --iterations 2000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import codec
+from api.schemas import ConversationMessageRequest
+
+USER_LINE = 'I understand your concerns. Can we walk through the numbers together before the meeting on Thursday?'
+AI_LINE = ("I'm not convinced. Show me where the savings come from, what it does to the maintenance "
+           "backlog and how we explain it to ratepayers before we go any further.")
+SYSTEM_PROMPT = 'You are David Walsh, Budget & Finance Director at NSW Local Council. ' * 20
+
+
+# ============================================
+# ONE TURN'S JSON WORK
+# ============================================
+
+def build_bodies(turns: int) -> Dict:
+    history = [{'sender': 'user' if i % 2 else 'David Walsh',
+                'sender_type': 'user' if i % 2 else 'ai_personality',
+                'content': USER_LINE if i % 2 else AI_LINE,
+                'timestamp': '2026-10-18T09:00:00.000000'} for i in range(turns)]
+    request = {
+        'conversation_id': 'c0ffee00-0000-0000-0000-000000000000',
+        'user_message': USER_LINE,
+        'stream': False,
+        'conversation_data': {'personality': {'name': 'David Walsh', 'type': 'budget_director'},
+                              'scenario': 'Budget talk'},
+        'conversation_history': history
+    }
+    upstream_reply = {
+        'id': 'msg_1', 'type': 'message', 'role': 'assistant', 'model': 'claude',
+        'content': [{'type': 'text', 'text': AI_LINE}],
+        'usage': {'input_tokens': 40 * turns, 'output_tokens': 60}
+    }
+    return {
+        'request': json.dumps(request).encode('utf-8'),
+        'upstream_reply': json.dumps(upstream_reply).encode('utf-8')
+    }
+
+
+def claude_payload(history: List[Dict], user_message: str) -> Dict:
+    messages = [{'role': 'assistant' if turn.get('sender_type') == 'ai_personality' else 'user',
+                 'content': turn.get('content', '')} for turn in history]
+    messages.append({'role': 'user', 'content': user_message})
+    return {'model': 'claude', 'max_tokens': 300, 'system': SYSTEM_PROMPT, 'messages': messages}
+
+
+def turn_stdlib(bodies: Dict) -> int:
+    """Before: request.json, .get chains, requests' json=, response.json(), jsonify"""
+    data = json.loads(bodies['request'])
+    user_message = data.get('user_message')
+    history = data.get('conversation_history') or []
+    _ = (data.get('conversation_id'), data.get('conversation_data'), data.get('stream'))
+    upstream_body = json.dumps(claude_payload(history, user_message), allow_nan=False).encode('utf-8')
+    reply = json.loads(bodies['upstream_reply'])
+    response = json.dumps({'success': True, 'ai_response': reply['content'][0]['text'],
+                           'usage': reply.get('usage'), 'history': history},
+                          indent=None, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return len(upstream_body) + len(response)
+
+
+def turn_codec(bodies: Dict) -> int:
+    """After: typed struct, codec.dumps for the upstream body, codec.loads for the reply"""
+    message = ConversationMessageRequest.from_json(bodies['request'])
+    upstream_body = codec.dumps(claude_payload(message.conversation_history, message.user_message))
+    reply = codec.loads(bodies['upstream_reply'])
+    response = codec.dumps({'success': True, 'ai_response': reply['content'][0]['text'],
+                            'usage': reply.get('usage'), 'history': message.conversation_history})
+    return len(upstream_body) + len(response)
+
+
+def cpu_per_call(func, bodies: Dict, iterations: int) -> float:
+    func(bodies)  # Warm up
+    started = time.process_time()
+    for _ in range(iterations):
+        func(bodies)
+    return (time.process_time() - started) / iterations * 1e6
+
+
+# ============================================
+# MAIN
+# ============================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Request/response codec CPU benchmark')
+    parser.add_argument('--turns', type=int, nargs='+', default=[10, 50, 200], help='History lengths to try')
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"🧪 JSON encoder: {'orjson' if codec.FAST_JSON else 'stdlib json (install orjson)'}, "
+          f"compression: {', '.join(codec.SUPPORTED_ENCODINGS)}\n")
+    print(f"{'turns':>6} {'request KB':>11} {'stdlib us':>10} {'codec us':>9} {'saved':>7} {'gzip ratio':>11}")
+
+    for turns in args.turns:
+        bodies = build_bodies(turns)
+        before = cpu_per_call(turn_stdlib, bodies, args.iterations)
+        after = cpu_per_call(turn_codec, bodies, args.iterations)
+        request = bodies['request']
+        ratio = len(codec.compress(request, 'gzip')) / len(request)
+        print(f"{turns:>6} {len(request) / 1024:>11.1f} {before:>10.1f} {after:>9.1f} "
+              f"{(1 - after / before) * 100:>6.0f}% {ratio:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Load test for the Conversation Trainer backend
+Fires concurrent start / message / email-analyze requests and reports throughput and latency
+
+Run it against a backend that points at the local Claude stand-in:
+    python tools/fake_claude.py --port 8787 &
+    CLAUDE_API_URL=http://127.0.0.1:8787/v1/messages python app.py &
+    python benchmarks/load_test.py --base-url http://127.0.0.1:5000 --endpoint all --requests 200 --concurrency 40
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import requests
+
+PRESET_PERSONAS = ['infrastructure_engineer', 'community_engagement', 'budget_director',
+                   'union_rep', 'councillor_thompson', 'strategic_planner']
+
+_local = threading.local()
+
+
+def session() -> requests.Session:
+    """One keep-alive session per worker thread"""
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def start_request(base_url: str, i: int) -> Dict:
+    response = session().post(f"{base_url}/api/conversations/start", json={
+        'user_name': f'trainee_{i}',
+        'personality_type': PRESET_PERSONAS[i % len(PRESET_PERSONAS)],
+        'scenario': 'Discussing the proposed changes to the capital works program'
+    }, timeout=60)
+    return {'status': response.status_code}
+
+
+def message_request(base_url: str, i: int, stream: bool = False) -> Dict:
+    body = {
+        'user_message': 'I understand your concerns. Can we walk through the numbers together?',
+        'personality_data': {
+            'name': 'David Walsh',
+            'prompt': 'You are David Walsh, Budget & Finance Director at NSW Local Council.'
+        },
+        'conversation_history': [
+            {'sender_type': 'ai_personality', 'content': "I'm David Walsh. What's this going to cost us?"},
+        ],
+        'stream': stream
+    }
+    started = time.perf_counter()
+    response = session().post(f"{base_url}/api/conversations/message", json=body, timeout=60, stream=stream)
+    result = {'status': response.status_code}
+
+    if stream and response.status_code == 200:
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith('event: token') and 'ttft' not in result:
+                result['ttft'] = time.perf_counter() - started
+            if line.startswith('event: error'):
+                result['status'] = 'stream_error'
+    else:
+        response.content  # Read the whole body
+    return result
+
+
+def email_request(base_url: str, i: int) -> Dict:
+    response = session().post(f"{base_url}/api/email/analyze", json={
+        'subject': f'Budget figures needed ({i})',
+        'content': 'Hi Sam, could you send through the updated figures for the depot upgrade by Friday? Thanks!',
+        'colleague': {'name': 'Sam', 'role': 'Finance Officer', 'personality': 'detail-oriented'}
+    }, timeout=60)
+    return {'status': response.status_code}
+
+
+def run(base_url: str, endpoint: str, total: int, concurrency: int, stream: bool) -> Dict:
+    """Run one endpoint's load and summarise it"""
+    calls = {
+        'start': lambda i: start_request(base_url, i),
+        'message': lambda i: message_request(base_url, i, stream),
+        'email': lambda i: email_request(base_url, i),
+    }
+    call = calls[endpoint]
+
+    def timed(i):
+        started = time.perf_counter()
+        try:
+            result = call(i)
+        except requests.RequestException as e:
+            result = {'status': type(e).__name__}
+        result['latency'] = time.perf_counter() - started
+        return result
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, range(total)))
+    elapsed = time.perf_counter() - started
+
+    return summarise(endpoint, results, elapsed, concurrency)
+
+
+def summarise(endpoint: str, results: List[Dict], elapsed: float, concurrency: int) -> Dict:
+    latencies = sorted(r['latency'] for r in results)
+    ttfts = sorted(r['ttft'] for r in results if 'ttft' in r)
+    ok = sum(1 for r in results if r['status'] == 200)
+
+    summary = {
+        'endpoint': endpoint,
+        'requests': len(results),
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(len(results) / elapsed, 2),
+        'success_rate': round(ok / len(results), 3),
+        'status_counts': dict(Counter(str(r['status']) for r in results)),
+        'latency_ms': percentiles(latencies),
+    }
+    if ttfts:
+        summary['ttft_ms'] = percentiles(ttfts)
+    return summary
+
+
+def percentiles(values: List[float]) -> Dict:
+    def pick(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 1)
+    return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99),
+            'mean': round(statistics.mean(values) * 1000, 1), 'max': round(values[-1] * 1000, 1)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test the Conversation Trainer backend')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--endpoint', choices=['start', 'message', 'email', 'all'], default='all')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--stream', action='store_true', help='Use SSE for message requests (reports TTFT)')
+    parser.add_argument('--json', action='store_true', help='Print machine-readable results')
+    args = parser.parse_args()
+
+    endpoints = ['start', 'message', 'email'] if args.endpoint == 'all' else [args.endpoint]
+    summaries = [run(args.base_url, endpoint, args.requests, args.concurrency, args.stream) for endpoint in endpoints]
+
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+    else:
+        for s in summaries:
+            print(f"📊 {s['endpoint']:8} {s['throughput_rps']:8.1f} req/s  "
+                  f"p50={s['latency_ms']['p50']}ms p95={s['latency_ms']['p95']}ms p99={s['latency_ms']['p99']}ms  "
+                  f"ok={s['success_rate']:.1%}  {s['status_counts']}")
+            if 'ttft_ms' in s:
+                print(f"          ttft p50={s['ttft_ms']['p50']}ms p95={s['ttft_ms']['p95']}ms")
@@ -0,0 +1,136 @@
+"""
+Memory benchmark for the Conversation / ConversationMessage models
+Builds many live conversations with the current (slotted, numeric-timestamp)
+models and with a copy of the previous dict-based ones, and reports memory
+per message and the cost of add_message
+
+    cd backend && python benchmarks/memory_benchmark.py --conversations 2000 --messages 30
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from typing import Callable, Dict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.conversation import Conversation
+
+
+# ============================================
+# PREVIOUS MODELS (for comparison only)
+# ============================================
+
+class LegacyMessage:
+    """ConversationMessage as it was: per-instance __dict__ and an ISO string timestamp"""
+
+    def __init__(self, sender: str, content: str, sender_type: str = 'user'):
+        self.timestamp = datetime.now().isoformat()
+        self.sender = sender
+        self.content = content
+        self.sender_type = sender_type
+
+    def to_dict(self) -> Dict:
+        return {'timestamp': self.timestamp, 'sender': self.sender, 'content': self.content,
+                'sender_type': self.sender_type}
+
+
+class LegacyConversation:
+    """Conversation as it was: ISO dates, re-parsed on every add_message"""
+
+    def __init__(self, user_name: str, scenario_title: str):
+        self.id = str(uuid.uuid4())[:8]
+        self.user_name = user_name
+        self.scenario_title = scenario_title
+        self.created_date = datetime.now().isoformat()
+        self.last_activity = datetime.now().isoformat()
+        self.status = 'active'
+        self.messages = []
+        self.personalities_involved = []
+        self.scenario_context = ""
+        self.total_messages = 0
+        self.duration_minutes = 0
+        self.user_satisfaction = None
+        self.learning_notes = ""
+
+    def add_message(self, sender: str, content: str, sender_type: str = 'user'):
+        self.messages.append(LegacyMessage(sender, content, sender_type))
+        self.total_messages += 1
+        self.last_activity = datetime.now().isoformat()
+        if len(self.messages) > 1:
+            start_time = datetime.fromisoformat(self.created_date)
+            self.duration_minutes = (datetime.now() - start_time).total_seconds() / 60
+
+
+# ============================================
+# MEASUREMENT
+# ============================================
+
+# Shared strings, like real traffic where the same persona name repeats
+USER_LINE = 'I understand your concerns. Can we walk through the numbers together?'
+AI_LINE = "I'm not convinced. Show me where the savings come from before we go any further."
+
+
+def build(factory: Callable, conversations: int, messages: int) -> list:
+    live = []
+    for i in range(conversations):
+        conversation = factory(f'trainee_{i}', 'Budget Cut Discussion')
+        for j in range(messages):
+            if j % 2:
+                conversation.add_message('David Walsh', AI_LINE, 'ai_personality')
+            else:
+                conversation.add_message('user', USER_LINE, 'user')
+        live.append(conversation)
+    return live
+
+
+def measure(label: str, factory: Callable, conversations: int, messages: int) -> Dict:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    live = build(factory, conversations, messages)
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total_messages = conversations * messages
+    result = {
+        'label': label,
+        'memory_mb': current / 1024 / 1024,
+        'bytes_per_message': current / total_messages,
+        'add_message_us': elapsed / total_messages * 1e6
+    }
+    del live
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Conversation model memory benchmark')
+    parser.add_argument('--conversations', type=int, default=2000)
+    parser.add_argument('--messages', type=int, default=30, help='Messages per conversation')
+    args = parser.parse_args()
+
+    print(f"🧪 {args.conversations} conversations x {args.messages} messages "
+          f"({args.conversations * args.messages} messages)\n")
+
+    results = [
+        measure('previous (dict + ISO strings)', LegacyConversation, args.conversations, args.messages),
+        measure('current (slots + numeric)', Conversation, args.conversations, args.messages)
+    ]
+
+    print(f"{'model':32} {'memory MB':>10} {'bytes/msg':>10} {'add_message us':>15}")
+    for r in results:
+        print(f"{r['label']:32} {r['memory_mb']:10.1f} {r['bytes_per_message']:10.0f} {r['add_message_us']:15.2f}")
+
+    before, after = results
+    print(f"\n💾 Memory saved: {(1 - after['memory_mb'] / before['memory_mb']) * 100:.0f}%  "
+          f"⚡ add_message: {before['add_message_us'] / after['add_message_us']:.1f}x faster")
+
+
+if __name__ == '__main__':
+    main()
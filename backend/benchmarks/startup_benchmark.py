@@ -0,0 +1,152 @@
+"""
+Cold start benchmark
+Measures what a Railway restart or scale-up waits on: how long `import app`
+takes in a fresh interpreter (against a budget - exits 1 when it's over, so
+it can gate CI), which of our modules that time goes to, and time to first
+request - from launching gunicorn until the first persona list and the
+first conversation start succeed
+
+    python tools/fake_claude.py --port 8787 --latency fixed:300 &
+    cd backend && python benchmarks/startup_benchmark.py --runs 5 --budget-ms 300
+"""
+
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_MODULES = ('app', 'config')
+PROJECT_PACKAGES = ('api.', 'models.')
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import app; "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+
+def quiet_env(args, **overrides) -> Dict:
+    """Same settings for every run: the local stand-in, no database, no boot-time Claude calls"""
+    return dict(
+        os.environ,
+        CLAUDE_API_URL=args.claude_url,
+        CLAUDE_API_KEY=os.getenv('CLAUDE_API_KEY') or 'benchmark',
+        STORAGE_PATH=os.path.join(tempfile.gettempdir(), 'startup_benchmark.db'),
+        OPENING_POOL_PREWARM='false',
+        **overrides
+    )
+
+
+# ============================================
+# IMPORT TIME
+# ============================================
+
+def import_ms(args) -> float:
+    """Wall time of `import app` in a fresh interpreter"""
+    output = subprocess.run([sys.executable, '-c', IMPORT_SNIPPET], cwd=BACKEND_DIR, env=quiet_env(args),
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def import_breakdown(args, top: int) -> List[tuple]:
+    """(cumulative ms, self ms, module) for our own modules, from python -X importtime"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=BACKEND_DIR,
+                            env=quiet_env(args), capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        module = module.strip()
+        if module in PROJECT_MODULES or module.startswith(PROJECT_PACKAGES):
+            rows.append((int(cumulative_us) / 1000, int(self_us) / 1000, module))
+    return sorted(rows, reverse=True)[:top]
+
+
+# ============================================
+# TIME TO FIRST REQUEST
+# ============================================
+
+def first_success(method: str, url: str, deadline: float, **kwargs) -> Optional[float]:
+    """Retry until the request succeeds; monotonic time it did, or None"""
+    while time.monotonic() < deadline:
+        try:
+            if requests.request(method, url, timeout=5, **kwargs).status_code == 200:
+                return time.monotonic()
+        except requests.RequestException:
+            pass
+        time.sleep(0.005)
+    return None
+
+
+def time_to_first_request(args) -> Optional[Dict]:
+    base_url = f"http://127.0.0.1:{args.port}"
+    env = quiet_env(args, PORT=str(args.port), WEB_CONCURRENCY='1',
+                    PROMETHEUS_MULTIPROC_DIR=os.path.join(tempfile.gettempdir(), 'startup-benchmark-metrics'))
+    launched = time.monotonic()
+    server = subprocess.Popen(['gunicorn', args.app], cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        deadline = launched + 60
+        catalog = first_success('GET', f"{base_url}/api/personalities", deadline)
+        start = first_success('POST', f"{base_url}/api/conversations/start", deadline,
+                              json={'personality_type': 'budget_director', 'scenario': 'Practice conversation'})
+        if catalog is None or start is None:
+            return None
+        return {'first_request_ms': (catalog - launched) * 1000, 'first_start_ms': (start - launched) * 1000}
+    finally:
+        try:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait(timeout=30)
+        except (ProcessLookupError, subprocess.TimeoutExpired):
+            os.killpg(server.pid, signal.SIGKILL)
+
+
+# ============================================
+# MAIN
+# ============================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Import time and time-to-first-request for the backend')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=300.0, help='Fail when median `import app` is slower')
+    parser.add_argument('--top', type=int, default=8, help='Slowest project modules to list')
+    parser.add_argument('--app', default='app:create_app()', help='gunicorn app spec')
+    parser.add_argument('--skip-server', action='store_true', help='Only measure the import')
+    parser.add_argument('--port', type=int, default=5610)
+    parser.add_argument('--claude-url', default='http://127.0.0.1:8787/v1/messages')
+    args = parser.parse_args()
+
+    import_runs = [import_ms(args) for _ in range(args.runs)]
+    median_import = statistics.median(import_runs)
+    print(f"🧪 import app: median {median_import:.0f}ms, best {min(import_runs):.0f}ms "
+          f"over {args.runs} runs (budget {args.budget_ms:.0f}ms)")
+    print(f"\n{'module':32} {'cumulative ms':>14} {'self ms':>8}")
+    for cumulative, own, module in import_breakdown(args, args.top):
+        print(f"{module:32} {cumulative:>14.1f} {own:>8.1f}")
+
+    if not args.skip_server:
+        results = [r for r in (time_to_first_request(args) for _ in range(args.runs)) if r]
+        if results:
+            print(f"\n🚀 gunicorn {args.app} (1 worker), median of {len(results)}:")
+            print(f"   first GET /api/personalities:        "
+                  f"{statistics.median(r['first_request_ms'] for r in results):.0f}ms after launch")
+            print(f"   first POST /api/conversations/start: "
+                  f"{statistics.median(r['first_start_ms'] for r in results):.0f}ms after launch")
+        else:
+            print("\n❌ server didn't come up")
+
+    if median_import > args.budget_ms:
+        print(f"\n❌ import app is over budget by {median_import - args.budget_ms:.0f}ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
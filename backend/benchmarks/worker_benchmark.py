@@ -0,0 +1,156 @@
+"""
+Gunicorn worker class benchmark
+Boots the backend under gunicorn (gunicorn.conf.py) once per worker class,
+points it at the local Claude stand-in, runs benchmarks/load_test.py's load
+against it and reports throughput, latency and memory (PSS - shared pages
+are split between the processes sharing them, so preload savings show up)
+
+    python tools/fake_claude.py --port 8787 --latency fixed:300 &
+    cd backend && python benchmarks/worker_benchmark.py --classes sync gthread gevent --requests 300 --concurrency 60
+"""
+
+import argparse
+import importlib.util
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BACKEND_DIR, 'benchmarks'))
+
+from load_test import run  # noqa: E402
+
+WORKER_PACKAGES = {'gevent': 'gevent'}  # Worker classes that need an extra install
+
+
+# ============================================
+# SERVER UNDER TEST
+# ============================================
+
+def boot(worker_class: str, args, preload: bool) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        PORT=str(args.port),
+        GUNICORN_WORKER_CLASS=worker_class,
+        GUNICORN_PRELOAD='true' if preload else 'false',
+        WEB_CONCURRENCY=str(args.workers),
+        GUNICORN_THREADS=str(args.threads),
+        CLAUDE_API_URL=args.claude_url,
+        CLAUDE_API_KEY=os.getenv('CLAUDE_API_KEY') or 'benchmark',
+        OPENING_POOL_PREWARM='false',  # Keep background Claude calls out of the numbers
+        STORAGE_PATH=os.path.join(tempfile.gettempdir(), 'worker_benchmark.db'),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(tempfile.gettempdir(), f'worker-benchmark-metrics-{worker_class}'),
+    )
+    return subprocess.Popen(['gunicorn', 'app:create_app()'], cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+
+def wait_until_live(base_url: str, timeout: float = 60.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/health/live", timeout=1).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    return False
+
+
+def process_tree(pid: int) -> List[int]:
+    """The gunicorn master and its workers (Linux /proc)"""
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(child) for child in f.read().split()]
+    except OSError:
+        pass
+    return pids
+
+
+def pss_mb(pids: List[int]) -> Optional[float]:
+    """Proportional set size of these processes in MB, or None off Linux"""
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith('Pss:'):
+                        total += int(line.split()[1])
+                        break
+        except OSError:
+            return None
+    return total / 1024
+
+
+def stop(server: subprocess.Popen):
+    try:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=30)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(server.pid, signal.SIGKILL)
+
+
+# ============================================
+# MAIN
+# ============================================
+
+def bench(worker_class: str, args, preload: bool) -> Optional[Dict]:
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = boot(worker_class, args, preload)
+    try:
+        if not wait_until_live(base_url):
+            print(f"❌ {worker_class}: server didn't come up")
+            return None
+        run(base_url, args.endpoint, min(args.requests, 20), args.concurrency, args.stream)  # Warm up
+        summary = run(base_url, args.endpoint, args.requests, args.concurrency, args.stream)
+        summary['memory_mb'] = pss_mb(process_tree(server.pid))
+        return summary
+    finally:
+        stop(server)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare gunicorn worker classes against the Claude stand-in')
+    parser.add_argument('--classes', nargs='+', default=['sync', 'gthread', 'gevent'])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=32, help='gthread threads per worker')
+    parser.add_argument('--endpoint', choices=['start', 'message', 'email'], default='message')
+    parser.add_argument('--stream', action='store_true', help='Stream message replies (SSE)')
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=60)
+    parser.add_argument('--no-preload', action='store_true', help='Also run each class without preload_app')
+    parser.add_argument('--port', type=int, default=5600)
+    parser.add_argument('--claude-url', default='http://127.0.0.1:8787/v1/messages')
+    args = parser.parse_args()
+
+    runs = [(worker_class, True) for worker_class in args.classes]
+    if args.no_preload:
+        runs += [(worker_class, False) for worker_class in args.classes]
+
+    print(f"🧪 {args.endpoint}{' (stream)' if args.stream else ''}: {args.requests} requests, "
+          f"concurrency {args.concurrency}, {args.workers} workers\n")
+    print(f"{'workers':18} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ok':>7} {'PSS MB':>7}")
+
+    for worker_class, preload in runs:
+        label = worker_class + ('' if preload else ' (no preload)')
+        package = WORKER_PACKAGES.get(worker_class)
+        if package and importlib.util.find_spec(package) is None:
+            print(f"{label:18} skipped - pip install {package}")
+            continue
+        s = bench(worker_class, args, preload)
+        if s is None:
+            continue
+        memory = f"{s['memory_mb']:.0f}" if s['memory_mb'] is not None else '-'
+        print(f"{label:18} {s['throughput_rps']:8.1f} {s['latency_ms']['p50']:8.0f} {s['latency_ms']['p95']:8.0f} "
+              f"{s['latency_ms']['p99']:8.0f} {s['success_rate']:7.1%} {memory:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -12,29 +12,113 @@ load_dotenv()
 class Config:
     """Application configuration"""
 
-    def check_environment():
-        """Check if environment is properly configured"""
-        config = get_config()
-        validation = config.validate_config()
-
-        print("🔧 Environment Configuration Check:")
-        print(
-            f"   Claude API Key: {'✅ Set' if config.CLAUDE_API_KEY and config.CLAUDE_API_KEY != 'your_actual_claude_api_key_here' else '❌ Missing'}")
-        print(f"   🧪 DEBUG: API key starts with: {config.CLAUDE_API_KEY[:20] if config.CLAUDE_API_KEY else 'None'}...")
-        print(f"   🧪 DEBUG: API key length: {len(config.CLAUDE_API_KEY) if config.CLAUDE_API_KEY else 0}")
-        print(f"   🧪 DEBUG: All environment variables: {list(os.environ.keys())}")  # NEW LINE
-        print(f"   Debug Mode: {'✅ Enabled' if config.DEBUG else '🔒 Disabled'}")
-
-        # ... rest of function
     # Claude API Configuration
     CLAUDE_API_KEY = os.getenv('CLAUDE_API_KEY')
+    CLAUDE_API_URL = os.getenv('CLAUDE_API_URL', 'https://api.anthropic.com/v1/messages')
+    CLAUDE_MODEL = os.getenv('CLAUDE_MODEL', 'claude-3-sonnet-20240229')
+    CLAUDE_TIMEOUT = float(os.getenv('CLAUDE_TIMEOUT', '30'))
+
+    # Claude HTTP connection pool (shared by every call site)
+    CLAUDE_POOL_SIZE = int(os.getenv('CLAUDE_POOL_SIZE', '20'))  # Max kept-alive connections
+    CLAUDE_POOL_WARM = int(os.getenv('CLAUDE_POOL_WARM', '2'))   # Connections opened at boot
+    CLAUDE_ASYNC_MAX_CONNECTIONS = int(os.getenv('CLAUDE_ASYNC_MAX_CONNECTIONS', '500'))  # Async (ASGI) path
+    CLAUDE_PROMPT_CACHE = os.getenv('CLAUDE_PROMPT_CACHE', 'True').lower() == 'true'  # Cache persona prompts
+
+    # Claude retry / circuit breaker
+    CLAUDE_MAX_ATTEMPTS = int(os.getenv('CLAUDE_MAX_ATTEMPTS', '3'))               # Including the first try
+    CLAUDE_RETRY_BASE_DELAY = float(os.getenv('CLAUDE_RETRY_BASE_DELAY', '0.5'))   # Seconds
+    CLAUDE_RETRY_MAX_DELAY = float(os.getenv('CLAUDE_RETRY_MAX_DELAY', '8'))       # Seconds
+    CLAUDE_REQUEST_DEADLINE = float(os.getenv('CLAUDE_REQUEST_DEADLINE', '45'))    # Total budget per request
+    CLAUDE_BREAKER_THRESHOLD = int(os.getenv('CLAUDE_BREAKER_THRESHOLD', '5'))     # Failures before opening
+    CLAUDE_BREAKER_RESET = float(os.getenv('CLAUDE_BREAKER_RESET', '30'))          # Seconds before a probe
+
+    # Claude admission control (outbound concurrency + token budget)
+    CLAUDE_MAX_IN_FLIGHT = int(os.getenv('CLAUDE_MAX_IN_FLIGHT', '16'))            # Per process ceiling
+    CLAUDE_TOKENS_PER_MINUTE = int(os.getenv('CLAUDE_TOKENS_PER_MINUTE', '80000')) # Whole account, split across workers; lowered by rate-limit headers
+    CLAUDE_QUEUE_TIMEOUT = float(os.getenv('CLAUDE_QUEUE_TIMEOUT', '10'))          # Max seconds a request waits
+    CLAUDE_QUEUE_MAX = int(os.getenv('CLAUDE_QUEUE_MAX', '200'))                   # Max requests waiting
+
+    # Pre-generated openings for preset personas (size 0 turns the pool off)
+    OPENING_POOL_SIZE = int(os.getenv('OPENING_POOL_SIZE', '2'))          # Ready openings per persona + scenario
+    OPENING_POOL_TTL = float(os.getenv('OPENING_POOL_TTL', '1800'))       # Seconds an opening stays servable
+    OPENING_POOL_MAX_KEYS = int(os.getenv('OPENING_POOL_MAX_KEYS', '64')) # Persona + scenario combinations tracked
+    OPENING_POOL_WORKERS = int(os.getenv('OPENING_POOL_WORKERS', '2'))    # Concurrent background generations
+    OPENING_POOL_PREWARM = os.getenv('OPENING_POOL_PREWARM', 'True').lower() == 'true'  # Fill presets at boot
+
+    # Batch email analysis
+    EMAIL_BATCH_MAX = int(os.getenv('EMAIL_BATCH_MAX', '100'))                  # Emails per batch request
+    EMAIL_BATCH_CONCURRENCY = int(os.getenv('EMAIL_BATCH_CONCURRENCY', '8'))    # Parallel analyses per batch
+
+    # Email analysis result cache (size 0 turns it off)
+    EMAIL_CACHE_SIZE = int(os.getenv('EMAIL_CACHE_SIZE', '512'))                # Analyses kept per process
+    EMAIL_CACHE_TTL = float(os.getenv('EMAIL_CACHE_TTL', '21600'))              # Seconds before re-analysing
+
+    # Server-side conversation sessions (memory / sqlite / redis)
+    SESSION_STORE = os.getenv('SESSION_STORE', 'sqlite')                        # Where sessions live (memory = one worker only)
+    SESSION_TTL = float(os.getenv('SESSION_TTL', '86400'))                      # Seconds a quiet session is kept
+    SESSION_MAX = int(os.getenv('SESSION_MAX', '1000'))                         # Memory store: sessions per process
+    SESSION_SQLITE_PATH = os.getenv('SESSION_SQLITE_PATH', 'data/sessions.db')  # SQLite store: database file
+    SESSION_REDIS_URL = os.getenv('SESSION_REDIS_URL', os.getenv('REDIS_URL', ''))  # Redis store: redis://...
+
+    # Conversation storage (SQLite, write-behind)
+    STORAGE_ENABLED = os.getenv('STORAGE_ENABLED', 'True').lower() == 'true'   # Save conversations and scenarios
+    STORAGE_PATH = os.getenv('STORAGE_PATH', 'data/conversation_trainer.db')   # Database file
+    STORAGE_BATCH_SIZE = int(os.getenv('STORAGE_BATCH_SIZE', '200'))           # Most writes per transaction
+    STORAGE_FLUSH_INTERVAL = float(os.getenv('STORAGE_FLUSH_INTERVAL', '0.5')) # Seconds a write may wait for company
+
+    # Preset personas (one JSON file each, reloaded when they change)
+    PERSONA_DIR = os.getenv('PERSONA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'personas'))  # Persona files
+    PERSONA_RELOAD_INTERVAL = float(os.getenv('PERSONA_RELOAD_INTERVAL', '2'))  # Seconds between file checks (0 = never)
+    PERSONA_DEFAULT = os.getenv('PERSONA_DEFAULT', 'frustrated_resident')     # Used for unknown personality types
+    CATALOG_MAX_AGE = int(os.getenv('CATALOG_MAX_AGE', '60'))                  # Seconds browsers reuse persona/scenario lists
+
+    # Request/response bodies (gzip, or brotli when installed)
+    COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))          # Smaller JSON responses go out as-is
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', '6'))                     # gzip level / brotli quality
+    MAX_REQUEST_BYTES = int(os.getenv('MAX_REQUEST_BYTES', str(4 * 1024 * 1024)))  # Largest (decompressed) request body
+
+    # Processes serving requests - gunicorn.conf.py sets it from its `workers` setting
+    WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+
+    # Set by gunicorn.conf.py when the master preloads the app - workers start their own threads after forking
+    DEFER_BACKGROUND_SERVICES = os.getenv('DEFER_BACKGROUND_SERVICES', 'False').lower() == 'true'
+
+    # Request logging (structured, queued - see api/request_log.py)
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'info')                                 # debug / info / warning / error
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')                               # json lines or key=value text
+    LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', '')                       # e.g. "debug=0.05,info=0.5" (unlisted = keep all)
+    LOG_MAX_FIELD_CHARS = int(os.getenv('LOG_MAX_FIELD_CHARS', '300'))         # Longer fields are cut
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))                 # Records waiting to be written before new ones drop
+
+    # Rate limits on the Claude-backed endpoints (see api/rate_limit.py)
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'  # Turn the limiter on/off
+    RATE_LIMITS = os.getenv('RATE_LIMITS', (
+        '/api/conversations/start user=10/min ip=60/min; '
+        '/api/conversations/message user=30/min ip=120/min; '
+        '/api/email/analyze user=10/min ip=60/min; '
+        '/api/email/analyze/batch user=3/min ip=10/min'
+    ))                                                                          # "route scope=count/period ..." entries
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', '')                   # memory (one worker) / sqlite / redis; unset = sqlite with several workers
+    RATE_LIMIT_SQLITE_PATH = os.getenv('RATE_LIMIT_SQLITE_PATH', 'data/rate_limits.db')  # SQLite backend: database file
+    RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL', os.getenv('REDIS_URL', ''))  # Redis backend: redis://...
+    RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', '10000'))       # Memory backend: buckets per process
+    RATE_LIMIT_PROXY_HOPS = int(os.getenv('RATE_LIMIT_PROXY_HOPS', '1'))       # Trusted proxies adding X-Forwarded-For (Railway = 1)
+
+    # Cached upstream health (for /health/ready)
+    CLAUDE_PROBE_INTERVAL = float(os.getenv('CLAUDE_PROBE_INTERVAL', '60'))     # Probe after this long without traffic (0 = never)
+    CLAUDE_HEALTH_WINDOW = float(os.getenv('CLAUDE_HEALTH_WINDOW', '300'))      # Seconds of latency/errors remembered
+    CLAUDE_READY_ERROR_RATE = float(os.getenv('CLAUDE_READY_ERROR_RATE', '0.5'))  # Error rate that means "down"
     
     # Flask Configuration
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
     
     # App Settings
-    MAX_CONVERSATION_HISTORY = 10  # Number of messages to send to Claude
+    CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '1500'))  # History tokens sent word for word
+    CONTEXT_SUMMARY_SIZE = int(os.getenv('CONTEXT_SUMMARY_SIZE', '1024'))  # Conversation summaries kept per worker (0 = off)
+    CONTEXT_SUMMARY_MAX_TOKENS = int(os.getenv('CONTEXT_SUMMARY_MAX_TOKENS', '300'))  # Length of a summary
+    CONTEXT_SUMMARY_WORKERS = int(os.getenv('CONTEXT_SUMMARY_WORKERS', '2'))  # Concurrent background summaries
+    CONTEXT_RENDER_CACHE_SIZE = int(os.getenv('CONTEXT_RENDER_CACHE_SIZE', '256'))  # Conversations kept rendered per worker (0 = off)
     DEFAULT_MAX_TOKENS = 300       # Claude response length limit
     
     @classmethod
@@ -65,8 +149,6 @@ def check_environment():
     print("🔧 Environment Configuration Check:")
     print(
         f"   Claude API Key: {'✅ Set' if config.CLAUDE_API_KEY and config.CLAUDE_API_KEY != 'your_actual_claude_api_key_here' else '❌ Missing'}")
-    print(f"   🧪 DEBUG: API key starts with: {config.CLAUDE_API_KEY[:20] if config.CLAUDE_API_KEY else 'None'}...")
-    print(f"   🧪 DEBUG: API key length: {len(config.CLAUDE_API_KEY) if config.CLAUDE_API_KEY else 0}")
     print(f"   Debug Mode: {'✅ Enabled' if config.DEBUG else '🔒 Disabled'}")
     
     if not validation['valid']:
@@ -0,0 +1,93 @@
+"""
+Gunicorn settings for the Conversation Trainer backend
+Picked up automatically by `cd backend && gunicorn 'app:create_app()'`
+
+Workers: almost all of a request's time is spent waiting on Claude, so each
+worker serves many requests at once - with threads (gthread, the default)
+or greenlets (gevent, needs `pip install gevent`). Pick with
+GUNICORN_WORKER_CLASS; WEB_CONCURRENCY, GUNICORN_THREADS,
+GUNICORN_WORKER_CONNECTIONS and GUNICORN_TIMEOUT tune the rest.
+
+Shared state: several workers only agree on a conversation, or on how
+many requests a client has made, through shared stores (SQLite by default
+for sessions, and for rate limits whenever there's more than one worker).
+If SESSION_STORE or RATE_LIMIT_BACKEND is set to memory, the default drops
+to one worker; asking for more then stops startup with an explanation.
+The Claude token budget is split evenly between workers. Caches (email
+analyses, conversation summaries, rendered histories, openings) stay per
+worker - a miss only costs a Claude call or a re-render.
+
+Preload: the master imports the app once and forks the workers from it, so
+the persona registry, prompt templates and imported modules are shared
+copy-on-write. Background threads and Claude connections are started by
+each worker after the fork (post_fork), never inherited.
+
+Metrics: every worker is its own process, so prometheus_client keeps its
+numbers in PROMETHEUS_MULTIPROC_DIR and /metrics adds them up. The directory
+is wiped when the master starts so old runs don't leak into the totals.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+
+if worker_class == 'gevent':
+    # Patch before the preloaded app imports ssl, socket and threading - patching later is too late
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Settings that keep state only in each worker's memory - fine for one worker, wrong for several
+PER_PROCESS_SETTINGS = {'SESSION_STORE': 'memory', 'RATE_LIMIT_BACKEND': 'memory'}
+per_process = [name for name, value in PER_PROCESS_SETTINGS.items() if os.getenv(name, '').lower() == value]
+
+# Processes: a few per core is plenty when requests mostly wait on the network - but only one
+# when a per-process backend was asked for (an explicit WEB_CONCURRENCY > 1 then fails at startup)
+workers = int(os.getenv('WEB_CONCURRENCY', 1 if per_process else min(multiprocessing.cpu_count() * 2, 8)))
+os.environ['WEB_CONCURRENCY'] = str(workers)  # So the app knows per-process state isn't enough (config.WEB_CONCURRENCY)
+# gthread: requests in flight per worker (gunicorn quietly turns sync into gthread when threads > 1)
+threads = int(os.getenv('GUNICORN_THREADS', '32')) if worker_class == 'gthread' else 1
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '500'))  # gevent: requests in flight per worker
+
+# A turn can take the whole Claude retry budget (CLAUDE_REQUEST_DEADLINE), and
+# streams stay open while tokens arrive - only a stuck worker should hit this
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))  # Let in-flight streams finish on deploys
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))                 # Seconds, behind Railway's proxy
+
+# Recycling workers throws away their caches and opening pool - off unless asked for
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '0'))
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+if preload_app:
+    # The master only imports app.py; each worker starts its own threads in post_fork
+    os.environ['DEFER_BACKGROUND_SERVICES'] = 'true'
+
+# Must be set before app.py (and prometheus_client) are imported in the workers
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'conversation-trainer-metrics'))
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)  # A preloading master imports it before on_starting
+
+
+def on_starting(server):
+    """Start each run with empty metric files"""
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+    """Warm this worker's own Claude connections and start its background threads"""
+    if preload_app:
+        from app import start_background_services
+        start_background_services()
+
+
+def child_exit(server, worker):
+    """Stop counting a dead worker's live gauges (queue depth, cache sizes)"""
+    from api.metrics import mark_worker_dead
+    mark_worker_dead(worker.pid)
@@ -4,27 +4,81 @@ Manages chat sessions between users and AI personalities
 """
 
 import json
-from datetime import datetime
-from typing import Dict, List, Optional
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from api.context_window import claude_message, estimate_tokens, turn_content, turn_sender_type
+from config import get_config
+
+# Timestamps are kept as whole microseconds of local time since 1970 and
+# only turned into ISO strings when someone asks (to_dict, storage)
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def now_micros() -> int:
+    """Current local time in the numeric form timestamps are stored in"""
+    return (datetime.now() - _EPOCH) // _MICROSECOND
+
+
+def micros_to_iso(micros: int) -> str:
+    """Same string datetime.now().isoformat() gave at that moment"""
+    return (_EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+def iso_to_micros(value: str) -> Optional[int]:
+    """Numeric form of an ISO timestamp, or None if it wouldn't render back exactly the same"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is not None:
+        return None
+    micros = (parsed - _EPOCH) // _MICROSECOND
+    return micros if micros_to_iso(micros) == value else None
+
 
 class ConversationMessage:
     """
     A single message in a conversation
     Like one text message in a chat thread
+    
+    Slotted with a numeric timestamp - a busy server holds a lot of these
     """
     
-    def __init__(self, sender: str, content: str, sender_type: str = 'user'):
+    __slots__ = ('sender', 'content', 'sender_type', 'created_us', '_timestamp_text')
+    
+    def __init__(self, sender: str, content: str, sender_type: str = 'user', created_us: int = None):
         """
         Create a new message
         
         sender: Who sent it ('user' or personality name like 'Councillor Stevens')
         content: What they said
         sender_type: 'user' or 'ai_personality'
+        created_us: When (see now_micros) - defaults to now
         """
-        self.timestamp = datetime.now().isoformat()
+        self.created_us = created_us if created_us is not None else now_micros()
+        self._timestamp_text = None  # Only set for loaded timestamps the numeric form can't reproduce
         self.sender = sender
         self.content = content
         self.sender_type = sender_type  # 'user' or 'ai_personality'
+    
+    @property
+    def timestamp(self) -> str:
+        """ISO timestamp, rendered on demand"""
+        return self._timestamp_text or micros_to_iso(self.created_us)
+    
+    @timestamp.setter
+    def timestamp(self, value: str):
+        micros = iso_to_micros(value)
+        if micros is None:
+            self._timestamp_text = value
+        else:
+            self.created_us = micros
+            self._timestamp_text = None
         
     def to_dict(self) -> Dict:
         """Convert message to dictionary for storage"""
@@ -39,15 +93,31 @@ class Conversation:
     """
     A complete conversation session
     Like an entire text message thread
+    
+    Dates are numeric underneath (created_us / last_activity_us); created_date
+    and last_activity render them as ISO strings when read
+    
+    Each message is rendered once - as a history line, a Claude `messages`
+    entry and a running token total - when add_message adds it (messages
+    appended to the list directly are caught up on the next prompt), so
+    preparing a turn costs the new message, not the history.
+    Replacing `messages` starts the render over; editing a message in place
+    isn't noticed.
     """
     
+    __slots__ = ('id', 'user_name', 'scenario_title', 'created_us', 'last_activity_us', 'status',
+                 '_messages', 'personalities_involved', 'scenario_context', 'history_summary', 'summary_covers',
+                 'total_messages', 'duration_minutes', 'user_satisfaction', 'learning_notes',
+                 '_created_text', '_last_activity_text',
+                 '_rendered_lines', '_claude_messages', '_token_totals', '_window_text')
+    
     def __init__(self, user_name: str, scenario_title: str):
         """Start a new conversation"""
         self.id = self._generate_id()
         self.user_name = user_name
         self.scenario_title = scenario_title
-        self.created_date = datetime.now().isoformat()
-        self.last_activity = datetime.now().isoformat()
+        self.created_us = self.last_activity_us = now_micros()
+        self._created_text = self._last_activity_text = None
         self.status = 'active'  # 'active', 'completed', 'paused'
         
         # Conversation data
@@ -55,6 +125,10 @@ class Conversation:
         self.personalities_involved = []  # List of personality IDs in this conversation
         self.scenario_context = ""  # Description of the situation being practiced
         
+        # Running summary of the messages that no longer fit the context window
+        self.history_summary = ""
+        self.summary_covers = 0  # How many of the first messages the summary covers
+        
         # Analytics data
         self.total_messages = 0
         self.duration_minutes = 0
@@ -66,37 +140,142 @@ class Conversation:
         import uuid
         return str(uuid.uuid4())[:8]
     
+    @property
+    def messages(self) -> List[ConversationMessage]:
+        return self._messages
+    
+    @messages.setter
+    def messages(self, value: List[ConversationMessage]):
+        self._messages = value
+        self._rendered_lines: List[str] = []  # 'USER: ...' / 'Name: ...' per message
+        self._claude_messages: List[Optional[Dict]] = []  # Claude messages entry per message
+        self._token_totals = [0]  # Estimated tokens of the first i messages
+        self._window_text = (None, None, '')  # (start, end, joined lines) of the last window rendered
+    
+    @property
+    def created_date(self) -> str:
+        return self._created_text or micros_to_iso(self.created_us)
+    
+    @created_date.setter
+    def created_date(self, value: str):
+        micros = iso_to_micros(value)
+        self._created_text = value if micros is None else None
+        if micros is not None:
+            self.created_us = micros
+    
+    @property
+    def last_activity(self) -> str:
+        return self._last_activity_text or micros_to_iso(self.last_activity_us)
+    
+    @last_activity.setter
+    def last_activity(self, value: str):
+        micros = iso_to_micros(value)
+        self._last_activity_text = value if micros is None else None
+        if micros is not None:
+            self.last_activity_us = micros
+    
     def add_message(self, sender: str, content: str, sender_type: str = 'user'):
         """Add a new message to the conversation"""
-        message = ConversationMessage(sender, content, sender_type)
+        now = now_micros()
+        message = ConversationMessage(sender, content, sender_type, now)
         self.messages.append(message)
         self.total_messages += 1
-        self.last_activity = datetime.now().isoformat()
+        self.last_activity_us = now
+        self._last_activity_text = None
         
-        # Update duration (rough calculation)
+        # Update duration (rough calculation) - plain arithmetic on the numeric dates
         if len(self.messages) > 1:
-            start_time = datetime.fromisoformat(self.created_date)
-            current_time = datetime.now()
-            self.duration_minutes = (current_time - start_time).total_seconds() / 60
+            self.duration_minutes = (now - self.created_us) / 60_000_000
+        
+        self._render_new_messages()
     
-    def get_conversation_history_for_claude(self) -> str:
+    def get_conversation_history_for_claude(self, token_budget: int = None) -> str:
         """
         Format conversation history for Claude API
         This helps Claude understand the context of previous messages
+        
+        The newest messages are included word for word up to `token_budget`
+        (CONTEXT_TOKEN_BUDGET by default); anything older is represented by
+        history_summary, if one has been folded in
         """
         if not self.messages:
             return f"SCENARIO: {self.scenario_context}\n\nThis is the start of the conversation."
         
-        history = f"SCENARIO: {self.scenario_context}\n\nCONVERSATION HISTORY:\n"
+        history = f"SCENARIO: {self.scenario_context}\n\n"
         
-        for msg in self.messages[-10:]:  # Only send last 10 messages to avoid token limits
-            if msg.sender_type == 'user':
-                history += f"USER: {msg.content}\n"
-            else:
-                history += f"{msg.sender}: {msg.content}\n"
+        start = self.window_start(token_budget)
+        if self.history_summary and self.summary_covers <= len(self.messages):
+            history += f"EARLIER IN THE CONVERSATION (summary):\n{self.history_summary}\n\n"
+            start = max(start, self.summary_covers)
         
-        history += "\nRespond as your character would to continue this conversation:"
-        return history
+        return (f"{history}CONVERSATION HISTORY:\n{self._window_lines(start)}"
+                "\nRespond as your character would to continue this conversation:")
+    
+    def get_claude_messages(self, token_budget: int = None, start: int = None, end: int = None) -> List[Dict]:
+        """
+        Claude `messages` entries for the word-for-word window (same window as
+        get_conversation_history_for_claude), or for messages[start:end] when
+        the caller has picked the window itself. The dicts are shared with the
+        cache - copy one before changing it
+        """
+        if start is None:
+            start = self.window_start(token_budget)
+            if self.history_summary and self.summary_covers <= len(self.messages):
+                start = max(start, self.summary_covers)
+        else:
+            self._render_new_messages()
+        return [message for message in self._claude_messages[start:end] if message]
+    
+    def messages_to_summarize(self, token_budget: int = None) -> List[ConversationMessage]:
+        """Messages that have left the context window but aren't in history_summary yet"""
+        return self.messages[self.summary_covers:self.window_start(token_budget)]
+    
+    # ---------- incremental rendering ----------
+    
+    def _render_new_messages(self):
+        """Render whatever was appended since the last prompt was built"""
+        if len(self._rendered_lines) > len(self._messages):
+            self.messages = self._messages  # The list shrank underneath us - start over
+        total = self._token_totals[-1]
+        for msg in self._messages[len(self._rendered_lines):]:
+            speaker = 'USER' if msg.sender_type == 'user' else msg.sender
+            self._rendered_lines.append(f"{speaker}: {msg.content}\n")
+            self._claude_messages.append(claude_message(msg))
+            total += estimate_tokens(msg.content)
+            self._token_totals.append(total)
+    
+    def window_start(self, token_budget: int = None) -> int:
+        """
+        Same answer as context_window.split_history - the longest run of newest
+        messages within `token_budget`, never fewer than one - found by binary
+        search over the running token totals instead of a walk back through history
+        """
+        self._render_new_messages()
+        count = len(self._messages)
+        if not count:
+            return 0
+        totals = self._token_totals
+        budget = token_budget or get_config().CONTEXT_TOKEN_BUDGET
+        return min(bisect_left(totals, totals[-1] - budget), count - 1)
+    
+    def _window_lines(self, start: int) -> str:
+        """History lines from `start` on, built by sliding the last rendered window rather than re-joining it"""
+        end = len(self._rendered_lines)
+        cached_start, cached_end, text = self._window_text
+        if cached_end is None or cached_end > end or not cached_start <= start <= cached_end:
+            text = ''.join(self._rendered_lines[start:end])
+        else:
+            # Slide: drop the lines that left the window, add the ones that arrived
+            dropped = sum(len(line) for line in self._rendered_lines[cached_start:start])
+            text = text[dropped:] + ''.join(self._rendered_lines[cached_end:end])
+        self._window_text = (start, end, text)
+        return text
+    
+    def fold_into_summary(self, summary: str, covers: int):
+        """Replace the running summary with one that covers the first `covers` messages"""
+        if covers >= self.summary_covers:
+            self.history_summary = summary
+            self.summary_covers = covers
     
     def add_personality(self, personality_id: str):
         """Add a personality to this conversation"""
@@ -106,7 +285,8 @@ class Conversation:
     def complete_conversation(self, satisfaction_rating: int = None, notes: str = ""):
         """Mark conversation as completed"""
         self.status = 'completed'
-        self.last_activity = datetime.now().isoformat()
+        self.last_activity_us = now_micros()
+        self._last_activity_text = None
         if satisfaction_rating:
             self.user_satisfaction = satisfaction_rating
         if notes:
@@ -127,7 +307,9 @@ class Conversation:
             'total_messages': self.total_messages,
             'duration_minutes': self.duration_minutes,
             'user_satisfaction': self.user_satisfaction,
-            'learning_notes': self.learning_notes
+            'learning_notes': self.learning_notes,
+            'history_summary': self.history_summary,
+            'summary_covers': self.summary_covers
         }
     
     @classmethod
@@ -144,6 +326,8 @@ class Conversation:
         conversation.duration_minutes = data.get('duration_minutes', 0)
         conversation.user_satisfaction = data.get('user_satisfaction')
         conversation.learning_notes = data.get('learning_notes', '')
+        conversation.history_summary = data.get('history_summary', '')
+        conversation.summary_covers = data.get('summary_covers', 0)
         
         # Recreate messages
         conversation.messages = []
@@ -158,6 +342,78 @@ class Conversation:
         
         return conversation
 
+
+class RenderedConversations:
+    """
+    Conversations kept rendered between turns, keyed by conversation id
+    Think of this as keeping the meeting notes open on the desk instead of
+    re-reading the whole file before every reply
+
+    The session store's history stays the source of truth: each turn the
+    cached Conversation is checked against it and only the new turns are
+    added. Anything that doesn't line up (another worker's copy, a restored
+    or restarted session) is rendered again from scratch, so a stale entry
+    costs a re-render, never a wrong prompt. Per process, LRU-bounded.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._conversations: 'OrderedDict[str, Conversation]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.rebuilds = 0
+
+    def window_start(self, conversation_id: Optional[str], history: List, token_budget: int = None) -> int:
+        """Start of the word-for-word window over `history` (context_window.split_history, without the walk)"""
+        with self._lock:
+            return self._sync(conversation_id, history).window_start(token_budget)
+
+    def claude_messages(self, conversation_id: Optional[str], history: List, start: int) -> List[Dict]:
+        """
+        Claude `messages` entries for history[start:], as a new list
+        Sliced under the lock - the cached Conversation itself never leaves
+        this class, so concurrent turns can't render into it while it's read
+        """
+        with self._lock:
+            conversation = self._sync(conversation_id, history)
+            return conversation.get_claude_messages(start=start, end=len(history))
+
+    def _sync(self, conversation_id: Optional[str], history: List) -> 'Conversation':
+        """Lock held - the cached Conversation brought up to `history` (or a fresh one)"""
+        conversation = self._conversations.get(conversation_id) if conversation_id else None
+        if conversation is not None and self._continues(conversation, history):
+            self.hits += 1
+            self._conversations.move_to_end(conversation_id)
+        else:
+            self.rebuilds += 1
+            conversation = Conversation('user', '')
+            if conversation_id and self.max_entries > 0:
+                self._conversations[conversation_id] = conversation
+                while len(self._conversations) > self.max_entries:
+                    self._conversations.popitem(last=False)
+        for turn in history[len(conversation.messages):]:
+            conversation.add_message(turn.get('sender', ''), turn_content(turn), turn_sender_type(turn))
+        return conversation
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {'conversations': len(self._conversations), 'hits': self.hits, 'rebuilds': self.rebuilds}
+
+    @staticmethod
+    def _continues(conversation: 'Conversation', history: List) -> bool:
+        """Is `history` this conversation plus (possibly) some newer turns?"""
+        count = len(conversation.messages)
+        if count > len(history):
+            return False
+        if count == 0:
+            return True
+        for index in (0, count - 1):
+            message, turn = conversation.messages[index], history[index]
+            if message.content != turn_content(turn) or message.sender_type != turn_sender_type(turn):
+                return False
+        return True
+
 # ============================================
 # CONVERSATION SCENARIOS FOR LOCAL GOVERNMENT
 # ============================================
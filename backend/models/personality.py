@@ -3,9 +3,17 @@ Personality Model for Conversation Trainer
 Defines how we store and manage AI personality data
 """
 
+import glob
+import hashlib
 import json
+import os
+import threading
+import time
 from datetime import datetime
-from typing import Dict, List, Optional
+from string import Formatter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import get_config
 
 class Personality:
     """
@@ -140,3 +148,199 @@ def create_frustrated_resident() -> Personality:
     resident.seniority_level = "ratepayer"
     resident.political_awareness = "medium"
     return resident
+
+
+# ============================================
+# PRESET PERSONA REGISTRY
+# ============================================
+
+class PersonaTemplate:
+    """
+    A persona prompt parsed once, at load time
+    Rendering just joins the fixed text around the filled-in slots
+    """
+    
+    SLOTS = ('scenario_context',)
+    
+    def __init__(self, text: str):
+        self.parts: List[Tuple[str, bool]] = []  # (literal text or slot name, is_slot)
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if literal:
+                self.parts.append((literal, False))
+            if field is None:
+                continue
+            if field not in self.SLOTS or spec or conversion:
+                raise ValueError(f"unknown template slot {{{field}}} (allowed: {', '.join(self.SLOTS)})")
+            self.parts.append((field, True))
+    
+    def render(self, **slots) -> str:
+        return ''.join(slots[part] if is_slot else part for part, is_slot in self.parts)
+
+
+class Persona:
+    """One preset character from the persona files"""
+    
+    __slots__ = ('id', 'name', 'template', 'listing', 'prewarm')
+    
+    LISTING_FIELDS = ('id', 'name', 'role', 'description', 'department', 'difficulty', 'disc_profile')
+    
+    def __init__(self, data: Dict):
+        self.id = data['id']
+        self.name = data['name']
+        self.template = PersonaTemplate(data['prompt'])
+        self.listing = {field: data[field] for field in self.LISTING_FIELDS if field in data}  # For /api/personalities
+        self.prewarm = bool(data.get('prewarm'))  # Keep pre-generated openings ready (see opening_pool)
+    
+    def prompt(self, scenario_context: str) -> str:
+        return self.template.render(scenario_context=scenario_context)
+
+
+class PersonaRegistry:
+    """
+    The preset personas, loaded from one JSON file each in `directory`
+    Think of this as the casting sheet pinned to the wall: everyone reads the
+    same copy, and swapping a page is noticed the next time someone looks
+    
+    Files are re-checked (a stat per file) at most every `reload_interval`
+    seconds, on access; changed files are reloaded as a whole. A directory
+    that fails to load leaves the previous personas in place.
+    """
+    
+    def __init__(self, directory: str, reload_interval: float = 2.0):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        
+        self._state: Tuple[Dict[str, Persona], List[Dict]] = ({}, [])  # Swapped as one on reload
+        self._signature = None
+        self._next_check = 0.0
+        self._listeners: List[Callable[['PersonaRegistry'], None]] = []
+        self._lock = threading.Lock()
+        
+        self._version = ''
+        self.loaded_at = None
+        self.reloads = 0
+        self.last_error = None
+        
+        self._check(force=True)
+    
+    def get(self, persona_id: str) -> Optional[Persona]:
+        self._check()
+        return self._state[0].get(persona_id)
+    
+    def personas(self) -> List[Persona]:
+        """Every persona, in listing order"""
+        self._check()
+        personas, listing = self._state
+        return [personas[entry['id']] for entry in listing]
+    
+    def listing(self) -> List[Dict]:
+        """Public persona details in listing order (shared - don't modify)"""
+        self._check()
+        return self._state[1]
+    
+    @property
+    def version(self) -> str:
+        """Hash of the loaded files - changes whenever the personas do"""
+        self._check()
+        return self._version
+    
+    def on_reload(self, callback: Callable[['PersonaRegistry'], None]):
+        """Call `callback(registry)` after each successful reload"""
+        self._listeners.append(callback)
+    
+    def snapshot(self) -> Dict:
+        """Registry stats for /health"""
+        return {
+            'directory': self.directory,
+            'personas': len(self._state[0]),
+            'version': self._version,
+            'loaded_at': self.loaded_at,
+            'reloads': self.reloads,
+            'last_error': self.last_error
+        }
+    
+    # ---------- loading ----------
+    
+    def _check(self, force: bool = False):
+        """Reload if the files changed - at most one stat pass per reload_interval"""
+        now = time.monotonic()
+        if not force and (self.reload_interval <= 0 or now < self._next_check):
+            return
+        with self._lock:
+            if not force and now < self._next_check:
+                return  # Another thread just checked
+            self._next_check = now + self.reload_interval
+            signature = self._scan()
+            if signature == self._signature:
+                return
+            self._signature = signature  # Even if loading fails - retry once the files change again
+            try:
+                personas, listing, version = self._load([path for path, _, _ in signature])
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"⚠️ Persona files in {self.directory} not loaded ({self.last_error}) - keeping previous personas")
+                return
+            first_load = self.loaded_at is None
+            self._state, self._version = (personas, listing), version
+            self.loaded_at = datetime.now().isoformat()
+            self.last_error = None
+            if not first_load:
+                self.reloads += 1
+        
+        print(f"🎭 {'Reloaded' if not first_load else 'Loaded'} {len(personas)} personas from {self.directory}")
+        if not first_load:
+            for callback in self._listeners:
+                try:
+                    callback(self)
+                except Exception as e:
+                    print(f"⚠️ Persona reload hook failed: {e}")
+    
+    def _scan(self) -> tuple:
+        signature = []
+        for path in sorted(glob.glob(os.path.join(self.directory, '*.json'))):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # Deleted between glob and stat
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+    
+    def _load(self, paths: List[str]) -> Tuple[Dict[str, Persona], List[Dict], str]:
+        if not paths:
+            raise ValueError('no persona files found')
+        digest = hashlib.sha1()
+        entries = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                raw = f.read()
+            digest.update(raw)
+            try:
+                data = json.loads(raw)
+                data.setdefault('id', os.path.splitext(os.path.basename(path))[0])
+                persona = Persona(data)
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"{os.path.basename(path)}: {e}") from e
+            entries.append((data.get('order', 1000), persona.id, persona))
+        
+        entries.sort(key=lambda entry: entry[:2])
+        personas = {}
+        for _, persona_id, persona in entries:
+            if persona_id in personas:
+                raise ValueError(f"persona id '{persona_id}' is defined twice")
+            personas[persona_id] = persona
+        return personas, [persona.listing for _, _, persona in entries], digest.hexdigest()[:16]
+
+
+_registry: Optional[PersonaRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_persona_registry() -> PersonaRegistry:
+    """Get the process-wide persona registry, loading it on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                config = get_config()
+                _registry = PersonaRegistry(config.PERSONA_DIR, config.PERSONA_RELOAD_INTERVAL)
+    return _registry
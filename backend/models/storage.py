@@ -0,0 +1,387 @@
+"""
+Storage for Conversation Trainer
+Persists conversations, their messages, personalities and custom scenarios
+to SQLite (WAL mode)
+
+Writes are write-behind: callers drop them on a queue and a background
+thread commits them in batches, so saving a turn never slows the reply.
+Messages are append-only rows indexed by conversation, user and time.
+
+Schema changes go in MIGRATIONS; run `python models/storage.py` (or just
+start the app) to bring a database up to date.
+"""
+
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import get_config
+from models.conversation import Conversation, ConversationMessage
+from models.personality import Personality
+from api.request_log import get_logger
+
+log = get_logger('storage')
+
+# (version, description, statements) - append new ones, never edit applied ones.
+# Write statements that can run twice (IF NOT EXISTS) - see migrate()
+MIGRATIONS = [
+    (1, 'conversations, append-only messages, personalities, custom scenarios', [
+        """CREATE TABLE IF NOT EXISTS conversations (
+            id TEXT PRIMARY KEY,
+            user_name TEXT NOT NULL,
+            scenario_title TEXT,
+            status TEXT,
+            created_date TEXT NOT NULL,
+            last_activity TEXT NOT NULL,
+            total_messages INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id TEXT NOT NULL,
+            user_name TEXT,
+            sender TEXT NOT NULL,
+            sender_type TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp TEXT NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (conversation_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_messages_user_time ON messages (user_name, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_messages_time ON messages (timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_conversations_user ON conversations (user_name, last_activity)",
+        """CREATE TABLE IF NOT EXISTS personalities (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            role TEXT,
+            created_date TEXT NOT NULL,
+            data TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS custom_scenarios (
+            id TEXT PRIMARY KEY,
+            title TEXT,
+            created_at TEXT NOT NULL,
+            data TEXT NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_custom_scenarios_created ON custom_scenarios (created_at)",
+    ]),
+]
+
+MESSAGE_COUNTS_TRACKED = 10000  # Conversations whose saved-message count we remember
+
+# Conversation fields kept in columns or the messages table rather than the JSON blob
+CONVERSATION_COLUMNS = ('id', 'user_name', 'scenario_title', 'status', 'created_date', 'last_activity',
+                        'total_messages', 'messages')
+
+
+def connect(path: str, isolation_level: Optional[str] = '') -> sqlite3.Connection:
+    """Open the database in WAL mode (readers never wait for the writer); isolation_level=None for autocommit"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    db = sqlite3.connect(path, timeout=10.0, check_same_thread=False, isolation_level=isolation_level)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    db.execute('PRAGMA foreign_keys=ON')
+    return db
+
+
+def migrate(db: sqlite3.Connection) -> int:
+    """
+    Apply any migrations newer than the database's user_version; returns the final version
+    `db` must be in autocommit mode (connect(path, isolation_level=None)): each
+    migration runs in its own BEGIN IMMEDIATE transaction, so workers starting
+    together take turns and the later ones find it already applied. The
+    sqlite3 module's own transactions commit around DDL, which is why this
+    doesn't use `with db:`.
+    """
+    current = db.execute('PRAGMA user_version').fetchone()[0]
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            current = db.execute('PRAGMA user_version').fetchone()[0]  # Another worker may have got here first
+            applied = version > current
+            if applied:
+                for statement in statements:
+                    db.execute(statement)
+                db.execute(f'PRAGMA user_version = {int(version)}')
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        if applied:
+            print(f"🗄️ Storage migrated to v{version}: {description}")
+        current = max(current, version)
+    return current
+
+
+class ConversationStorage:
+    """
+    SQLite persistence for the models, with batched write-behind
+    Think of this as the filing clerk: you drop papers in the tray and get
+    on with the meeting; the clerk files a whole tray at a time
+
+    save_* / append_messages only queue work. Reads flush the queue first,
+    so they always see earlier writes from this process.
+    """
+
+    def __init__(self, path: str, batch_size: int = 200, flush_interval: float = 0.5, max_queue: int = 10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._message_counts: 'OrderedDict[str, int]' = OrderedDict()  # Messages already queued per conversation
+        self._lock = threading.Lock()
+        self._read_local = threading.local()
+        self._thread = None
+        self._pid = None
+
+        db = connect(path, isolation_level=None)
+        self.schema_version = migrate(db)
+        db.close()
+
+        self.batches = 0
+        self.writes = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_batch_ms = None
+
+    # ---------- writes (queued) ----------
+
+    def save_conversation(self, conversation: Conversation):
+        """Upsert the conversation and append any messages not yet saved"""
+        data = conversation.to_dict()
+        with self._lock:
+            saved = self._message_counts.get(conversation.id, 0)
+            self._remember_count(conversation.id, len(data['messages']))
+        self._enqueue(('conversation', data))
+        new_messages = data['messages'][saved:]
+        if new_messages:
+            self._enqueue(('messages', conversation.id, conversation.user_name, new_messages, False))
+
+    def append_messages(self, conversation_id: str, messages: List[Dict], user_name: str = None):
+        """Append message dicts (ConversationMessage.to_dict shape) to a saved conversation"""
+        if not messages:
+            return
+        with self._lock:
+            self._remember_count(conversation_id, self._message_counts.get(conversation_id, 0) + len(messages))
+        self._enqueue(('messages', conversation_id, user_name, list(messages), True))
+
+    def save_personality(self, personality: Personality):
+        self._enqueue(('personality', personality.to_dict()))
+
+    def save_scenario(self, scenario: Dict):
+        """Custom scenario dict with 'id' and 'created_at'"""
+        self._enqueue(('scenario', dict(scenario)))
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything queued so far is committed"""
+        done = threading.Event()
+        self._enqueue(('flush', done))
+        return done.wait(timeout)
+
+    # ---------- reads ----------
+
+    def load_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        self.flush()
+        db = self._reader()
+        row = db.execute('SELECT id, user_name, scenario_title, status, created_date, last_activity, '
+                         'total_messages, data FROM conversations WHERE id = ?', (conversation_id,)).fetchone()
+        if row is None:
+            return None
+
+        data = json.loads(row[7])
+        data.update(zip(CONVERSATION_COLUMNS[:7], row[:7]))
+        data['messages'] = []
+        conversation = Conversation.from_dict(data)
+        conversation.messages = [self._message_from_row(message) for message in db.execute(
+            'SELECT sender, content, sender_type, timestamp FROM messages WHERE conversation_id = ? ORDER BY id',
+            (conversation_id,))]
+        with self._lock:
+            self._remember_count(conversation_id, len(conversation.messages))
+        return conversation
+
+    def list_conversations(self, user_name: str = None, limit: int = 50) -> List[Dict]:
+        """Most recently active conversations (headers only)"""
+        self.flush()
+        sql = ('SELECT id, user_name, scenario_title, status, created_date, last_activity, total_messages '
+               'FROM conversations')
+        params = []
+        if user_name:
+            sql += ' WHERE user_name = ?'
+            params.append(user_name)
+        sql += ' ORDER BY last_activity DESC LIMIT ?'
+        params.append(limit)
+        return [dict(zip(CONVERSATION_COLUMNS[:7], row)) for row in self._reader().execute(sql, params)]
+
+    def load_personality(self, personality_id: str) -> Optional[Personality]:
+        self.flush()
+        row = self._reader().execute('SELECT data FROM personalities WHERE id = ?', (personality_id,)).fetchone()
+        return Personality.from_dict(json.loads(row[0])) if row else None
+
+    def list_scenarios(self, limit: int = 100) -> List[Dict]:
+        """Saved custom scenarios, newest first"""
+        self.flush()
+        return [json.loads(data) for (data,) in self._reader().execute(
+            'SELECT data FROM custom_scenarios ORDER BY created_at DESC LIMIT ?', (limit,))]
+
+    def snapshot(self) -> Dict:
+        """Storage stats for /health"""
+        return {
+            'path': self.path,
+            'schema_version': self.schema_version,
+            'queued': self._queue.qsize(),
+            'batches': self.batches,
+            'writes': self.writes,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'last_batch_ms': self.last_batch_ms
+        }
+
+    # ---------- internals ----------
+
+    def _remember_count(self, conversation_id: str, count: int):
+        """Lock held - recently active conversations only"""
+        self._message_counts[conversation_id] = count
+        self._message_counts.move_to_end(conversation_id)
+        while len(self._message_counts) > MESSAGE_COUNTS_TRACKED:
+            self._message_counts.popitem(last=False)
+
+    def _enqueue(self, item: tuple):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(item)  # Never hold up a request - a full queue means the disk is behind
+        except queue.Full:
+            self.dropped += 1
+            log.warning('storage_write_dropped', kind=item[0])
+
+    def _ensure_started(self):
+        """Start the writer thread (again after a gunicorn fork - threads don't survive it)"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)  # The parent's queue belongs to the parent
+                self._read_local = threading.local()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, daemon=True, name='storage-writer')
+            self._thread.start()
+
+    def _reader(self) -> sqlite3.Connection:
+        """Read connection per thread"""
+        db = getattr(self._read_local, 'db', None)
+        if db is None:
+            db = self._read_local.db = connect(self.path)
+        return db
+
+    def _run(self):
+        """Writer loop: gather up to batch_size items (or flush_interval's worth) and commit them together"""
+        db = connect(self.path)
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1][0] != 'flush':
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            self._write(db, batch)
+
+    def _write(self, db: sqlite3.Connection, batch: List[tuple]):
+        started = time.perf_counter()
+        waiters = [item[1] for item in batch if item[0] == 'flush']
+        writes = [item for item in batch if item[0] != 'flush']
+        try:
+            if writes:
+                with db:
+                    for item in writes:
+                        getattr(self, f'_write_{item[0]}')(db, *item[1:])
+                self.batches += 1
+                self.writes += len(writes)
+                self.last_batch_ms = round((time.perf_counter() - started) * 1000, 2)
+        except Exception as e:
+            self.errors += 1
+            log.error('storage_batch_failed', writes=len(writes), error=e)
+        finally:
+            for done in waiters:
+                done.set()
+
+    def _write_conversation(self, db: sqlite3.Connection, data: Dict):
+        extra = {key: value for key, value in data.items() if key not in CONVERSATION_COLUMNS}
+        db.execute(
+            'INSERT INTO conversations (id, user_name, scenario_title, status, created_date, last_activity, '
+            'total_messages, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(id) DO UPDATE SET scenario_title = excluded.scenario_title, status = excluded.status, '
+            'last_activity = excluded.last_activity, total_messages = excluded.total_messages, data = excluded.data',
+            (data['id'], data['user_name'], data['scenario_title'], data['status'], data['created_date'],
+             data['last_activity'], data['total_messages'], json.dumps(extra))
+        )
+
+    def _write_messages(self, db: sqlite3.Connection, conversation_id: str, user_name: Optional[str],
+                        messages: List[Dict], count: bool):
+        db.executemany(
+            'INSERT INTO messages (conversation_id, user_name, sender, sender_type, content, timestamp) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [(conversation_id, user_name, m['sender'], m['sender_type'], m['content'], m['timestamp'])
+             for m in messages]
+        )
+        # Saved with the conversation header its total already includes these; appended ones add to it
+        db.execute('UPDATE conversations SET last_activity = MAX(last_activity, ?), total_messages = total_messages + ? '
+                   'WHERE id = ?', (messages[-1]['timestamp'], len(messages) if count else 0, conversation_id))
+
+    def _write_personality(self, db: sqlite3.Connection, data: Dict):
+        db.execute('INSERT OR REPLACE INTO personalities (id, name, role, created_date, data) VALUES (?, ?, ?, ?, ?)',
+                   (data['id'], data['name'], data['role'], data['created_date'], json.dumps(data)))
+
+    def _write_scenario(self, db: sqlite3.Connection, data: Dict):
+        db.execute('INSERT OR REPLACE INTO custom_scenarios (id, title, created_at, data) VALUES (?, ?, ?, ?)',
+                   (data['id'], data.get('title'), data['created_at'], json.dumps(data)))
+
+    @staticmethod
+    def _message_from_row(row) -> ConversationMessage:
+        message = ConversationMessage(row[0], row[1], row[2])
+        message.timestamp = row[3]
+        return message
+
+
+# ============================================
+# SHARED INSTANCE
+# ============================================
+
+_storage: Optional[ConversationStorage] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> Optional[ConversationStorage]:
+    """Process-wide storage, or None when STORAGE_ENABLED is off or the database can't be opened"""
+    global _storage
+    config = get_config()
+    if _storage is None and config.STORAGE_ENABLED:
+        with _storage_lock:
+            if _storage is None:
+                try:
+                    _storage = ConversationStorage(config.STORAGE_PATH, batch_size=config.STORAGE_BATCH_SIZE,
+                                                   flush_interval=config.STORAGE_FLUSH_INTERVAL)
+                    atexit.register(_storage.flush)
+                except Exception as e:
+                    print(f"⚠️ Storage unavailable ({e}) - conversations won't be saved")
+                    log.error('storage_unavailable', path=config.STORAGE_PATH, error=e)
+                    config.STORAGE_ENABLED = False
+    return _storage
+
+
+if __name__ == '__main__':
+    database = connect(get_config().STORAGE_PATH, isolation_level=None)
+    print(f"🗄️ {get_config().STORAGE_PATH} is at schema v{migrate(database)}")
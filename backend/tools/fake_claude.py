@@ -0,0 +1,450 @@
+"""
+Local stand-in for the Claude messages API
+Lets us load-test and latency-test the backend on a laptop, with no network and no API bill
+
+Usage:
+    python tools/fake_claude.py --port 8787 --latency lognormal:900,0.4 --rate-limit-rate 0.05
+
+Then point the app at it:
+    CLAUDE_API_URL=http://127.0.0.1:8787/v1/messages python app.py
+
+Latency specs (milliseconds):
+    fixed:800            always 800ms
+    uniform:300,1500     anywhere between 300ms and 1500ms
+    normal:800,200       mean 800ms, standard deviation 200ms
+    lognormal:800,0.5    median 800ms, sigma 0.5 (long right tail, like the real API)
+    exponential:800      mean 800ms
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+# ============================================
+# CANNED REPLIES
+# ============================================
+
+OPENING_REPLIES = [
+    "Hi, I'm {name}. Thanks for making the time - I've read the briefing, but I'd like to hear it from you first.",
+    "{name} here. I'll be honest, I've got a few concerns about this, so let's get straight into it.",
+    "Good to see you. I'm {name}. Before we start, can you tell me what you're hoping we'll agree on today?",
+]
+
+TURN_REPLIES = [
+    "I hear what you're saying, but I need more detail before I can support that. What does the data actually show?",
+    "That's a fair point. How will this affect the people on the ground, though? They're already stretched.",
+    "I appreciate you explaining it, but this feels rushed. What's the timeline, and who was consulted?",
+    "Okay, I can see where you're coming from. What would you need from me to make this work?",
+    "With respect, we've heard promises like this before. What's different this time?",
+]
+
+EMAIL_ANALYSIS = {
+    "overall_score": 7,
+    "overall_feedback": "Clear and respectful, with room to make the request more specific.",
+    "code_compliance": {"status": "PASS", "issues": [], "risk_level": "low"},
+    "channel_recommendation": {"current": "email", "recommended": "email",
+                               "reasoning": "Routine request that suits a written record"},
+    "disc_scores": {"D": 6, "I": 7, "S": 8, "C": 6},
+    "disc_feedback": {"D": "Request is clear but could state the deadline",
+                      "I": "Warm, collaborative tone",
+                      "S": "Considerate of the recipient's workload",
+                      "C": "Add the key figures the recipient will need"},
+    "suggestions": ["State the decision you need and by when", "Attach or link the supporting figures"],
+    "quick_tips": ["Lead with the request", "Keep one topic per email"]
+}
+
+
+def find_persona_name(payload: Dict) -> str:
+    """Pull the persona name out of 'You are <Name>' in the system prompt or first message"""
+    text = _flatten(payload.get('system')) + ' ' + ' '.join(_flatten(m.get('content')) for m in payload.get('messages', [])[:1])
+    match = re.search(r"You are (?:roleplaying as )?([A-Z][\w'.-]*(?: [A-Z][\w'.-]*){0,3})", text)
+    return match.group(1) if match else 'your colleague'
+
+
+def canned_reply(payload: Dict) -> str:
+    """Pick a persona-style reply that fits the request type"""
+    messages = payload.get('messages', [])
+    first = _flatten(messages[0].get('content')) if messages else ''
+
+    if 'EMAIL TO ANALYZE' in first:
+        return json.dumps(EMAIL_ANALYSIS, indent=2)
+    if "respond with 'API connection successful'" in first:
+        return 'API connection successful'
+
+    name = find_persona_name(payload)
+    if not payload.get('system') and len(messages) == 1:
+        return random.choice(OPENING_REPLIES).format(name=name)
+    return random.choice(TURN_REPLIES)
+
+
+def _flatten(content) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return ''.join(block.get('text', '') for block in content)
+    return ''
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+# ============================================
+# LATENCY AND FAULTS
+# ============================================
+
+def parse_latency(spec: str):
+    """Turn a latency spec into a zero-argument sampler returning seconds"""
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',') if v]
+
+    if kind == 'fixed':
+        return lambda: values[0] / 1000
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == 'normal':
+        return lambda: max(0.0, random.gauss(values[0], values[1])) / 1000
+    if kind == 'lognormal':
+        return lambda: random.lognormvariate(math.log(values[0]), values[1]) / 1000
+    if kind == 'exponential':
+        return lambda: random.expovariate(1.0 / values[0]) / 1000
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class FakeClaudeState:
+    """Shared knobs and counters for every request handler"""
+
+    def __init__(self, args):
+        self.latency = parse_latency(args.latency)
+        self.token_delay = args.token_delay_ms / 1000
+        self.error_rate = args.error_rate
+        self.overload_rate = args.overload_rate
+        self.rate_limit_rate = args.rate_limit_rate
+        self.requests_per_minute = args.requests_per_minute
+        self.tokens_per_minute = args.tokens_per_minute
+
+        self.lock = threading.Lock()
+        self.recent_requests = deque()
+        self.recent_tokens = deque()  # (time, tokens)
+        self.cached_prefixes = set()
+        self.stats = {'requests': 0, 'streams': 0, 'errors_500': 0, 'overloaded_529': 0, 'rate_limited_429': 0,
+                      'batches': 0, 'token_counts': 0}
+        self.batch_delay = args.batch_delay
+        self.batches = {}  # batch id -> (created monotonic, created iso, requests)
+
+    def admit(self, tokens: int):
+        """Apply the simulated account limits. Returns (allowed, headers)"""
+        now = time.monotonic()
+        with self.lock:
+            while self.recent_requests and now - self.recent_requests[0] >= 60:
+                self.recent_requests.popleft()
+            while self.recent_tokens and now - self.recent_tokens[0][0] >= 60:
+                self.recent_tokens.popleft()
+
+            used_tokens = sum(t for _, t in self.recent_tokens)
+            allowed = (len(self.recent_requests) < self.requests_per_minute
+                       and used_tokens + tokens <= self.tokens_per_minute)
+            if allowed:
+                self.recent_requests.append(now)
+                self.recent_tokens.append((now, tokens))
+                used_tokens += tokens
+
+            oldest = self.recent_requests[0] if self.recent_requests else now
+            reset_in = max(0.0, 60 - (now - oldest))
+            reset_at = (datetime.now(timezone.utc) + timedelta(seconds=reset_in)).isoformat().replace('+00:00', 'Z')
+            headers = {
+                'anthropic-ratelimit-requests-limit': str(self.requests_per_minute),
+                'anthropic-ratelimit-requests-remaining': str(max(0, self.requests_per_minute - len(self.recent_requests))),
+                'anthropic-ratelimit-requests-reset': reset_at,
+                'anthropic-ratelimit-tokens-limit': str(self.tokens_per_minute),
+                'anthropic-ratelimit-tokens-remaining': str(max(0, self.tokens_per_minute - used_tokens)),
+                'anthropic-ratelimit-tokens-reset': reset_at,
+            }
+            if not allowed:
+                headers['retry-after'] = str(max(1, math.ceil(reset_in)))
+            return allowed, headers
+
+    def cache_usage(self, payload: Dict, input_tokens: int) -> Dict:
+        """Simulate prompt caching: first sight of a cached prefix writes, later ones read"""
+        cached_text = ''
+        for block in (payload.get('system') if isinstance(payload.get('system'), list) else []):
+            if block.get('cache_control'):
+                cached_text += block.get('text', '')
+        for message in payload.get('messages', []):
+            if isinstance(message.get('content'), list):
+                for block in message['content']:
+                    if block.get('cache_control'):
+                        cached_text += block.get('text', '')
+
+        usage = {'input_tokens': input_tokens, 'cache_creation_input_tokens': 0, 'cache_read_input_tokens': 0}
+        if cached_text:
+            cached_tokens = estimate_tokens(cached_text)
+            usage['input_tokens'] = max(1, input_tokens - cached_tokens)
+            with self.lock:
+                if cached_text in self.cached_prefixes:
+                    usage['cache_read_input_tokens'] = cached_tokens
+                else:
+                    self.cached_prefixes.add(cached_text)
+                    usage['cache_creation_input_tokens'] = cached_tokens
+        return usage
+
+
+# ============================================
+# HTTP HANDLER
+# ============================================
+
+class FakeClaudeHandler(BaseHTTPRequestHandler):
+    """Speaks just enough of the /v1/messages protocol for the backend"""
+
+    protocol_version = 'HTTP/1.1'
+    state: FakeClaudeState = None
+
+    def log_message(self, format, *args):
+        pass  # Keep the console quiet under load
+
+    def do_HEAD(self):
+        # Connection warm-up from ClaudeTransport
+        self.send_response(405)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        batch_match = re.match(r'^/v1/messages/batches/([\w-]+)(/results)?$', self.path)
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok', 'stats': self.state.stats})
+        elif batch_match:
+            self._get_batch(batch_match.group(1), bool(batch_match.group(2)))
+        else:
+            self._send_json(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': 'Not found'}})
+
+    def do_POST(self):
+        if not self.path.startswith('/v1/messages'):
+            self._send_json(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': 'Not found'}})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError:
+            self._send_error(400, 'invalid_request_error', 'Body is not valid JSON')
+            return
+
+        if self.path.rstrip('/') == '/v1/messages/batches':
+            self._create_batch(payload)
+            return
+        if self.path.rstrip('/') == '/v1/messages/count_tokens':
+            self._count('token_counts')
+            prompt_text = _flatten(payload.get('system')) + ''.join(_flatten(m.get('content')) for m in payload.get('messages', []))
+            time.sleep(self.state.latency() / 10)
+            self._send_json(200, {'input_tokens': estimate_tokens(prompt_text)})
+            return
+
+        state = self.state
+        with state.lock:
+            state.stats['requests'] += 1
+
+        prompt_text = _flatten(payload.get('system')) + ''.join(_flatten(m.get('content')) for m in payload.get('messages', []))
+        input_tokens = estimate_tokens(prompt_text)
+        allowed, limit_headers = state.admit(input_tokens + payload.get('max_tokens', 0))
+
+        # Injected faults
+        roll = random.random()
+        if not allowed or roll < state.rate_limit_rate:
+            self._count('rate_limited_429')
+            limit_headers.setdefault('retry-after', '1')
+            self._send_error(429, 'rate_limit_error', 'Number of request tokens has exceeded your rate limit', limit_headers)
+            return
+        roll -= state.rate_limit_rate
+        if roll < state.overload_rate:
+            self._count('overloaded_529')
+            time.sleep(state.latency() / 4)
+            self._send_error(529, 'overloaded_error', 'Overloaded', limit_headers)
+            return
+        roll -= state.overload_rate
+        if roll < state.error_rate:
+            self._count('errors_500')
+            self._send_error(500, 'api_error', 'Internal server error', limit_headers)
+            return
+
+        reply = canned_reply(payload)
+        words = re.findall(r'\S+\s*', reply)[:max(1, payload.get('max_tokens', 300))]
+        usage = state.cache_usage(payload, input_tokens)
+        usage['output_tokens'] = len(words)
+        message_id = f"msg_fake_{uuid.uuid4().hex[:16]}"
+
+        if payload.get('stream'):
+            self._count('streams')
+            self._stream_reply(payload, words, usage, message_id, limit_headers)
+            return
+
+        time.sleep(state.latency() + state.token_delay * len(words))
+        self._send_json(200, {
+            'id': message_id,
+            'type': 'message',
+            'role': 'assistant',
+            'model': payload.get('model', 'fake-claude'),
+            'content': [{'type': 'text', 'text': ''.join(words)}],
+            'stop_reason': 'end_turn',
+            'stop_sequence': None,
+            'usage': usage
+        }, limit_headers)
+
+    # ---------- message batches ----------
+
+    def _create_batch(self, payload: Dict):
+        """Accept a Message Batch; it 'ends' after --batch-delay seconds"""
+        requests = payload.get('requests') or []
+        if not requests:
+            self._send_error(400, 'invalid_request_error', 'requests: must contain at least one request')
+            return
+
+        batch_id = f"msgbatch_fake_{uuid.uuid4().hex[:16]}"
+        created_at = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+        with self.state.lock:
+            self.state.batches[batch_id] = (time.monotonic(), created_at, requests)
+            self.state.stats['batches'] += 1
+        self._send_json(200, self._batch_object(batch_id))
+
+    def _get_batch(self, batch_id: str, results: bool):
+        if batch_id not in self.state.batches:
+            self._send_error(404, 'not_found_error', f'Batch {batch_id} not found')
+            return
+        if not results:
+            self._send_json(200, self._batch_object(batch_id))
+            return
+
+        lines = []
+        for request in self.state.batches[batch_id][2]:
+            params = request.get('params', {})
+            lines.append(json.dumps({'custom_id': request.get('custom_id'), 'result': {
+                'type': 'succeeded',
+                'message': {
+                    'id': f"msg_fake_{uuid.uuid4().hex[:16]}", 'type': 'message', 'role': 'assistant',
+                    'model': params.get('model', 'fake-claude'),
+                    'content': [{'type': 'text', 'text': canned_reply(params)}],
+                    'stop_reason': 'end_turn', 'stop_sequence': None,
+                    'usage': {'input_tokens': 100, 'output_tokens': 200}
+                }
+            }}))
+        data = ('\n'.join(lines) + '\n').encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/binary')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _batch_object(self, batch_id: str) -> Dict:
+        created, created_at, requests = self.state.batches[batch_id]
+        ended = time.monotonic() - created >= self.state.batch_delay
+        return {
+            'id': batch_id,
+            'type': 'message_batch',
+            'processing_status': 'ended' if ended else 'in_progress',
+            'request_counts': {'processing': 0 if ended else len(requests), 'succeeded': len(requests) if ended else 0,
+                               'errored': 0, 'canceled': 0, 'expired': 0},
+            'created_at': created_at,
+            'ended_at': created_at if ended else None,
+            'expires_at': None,
+            'results_url': f"http://{self.headers.get('Host')}/v1/messages/batches/{batch_id}/results" if ended else None
+        }
+
+    # ---------- helpers ----------
+
+    def _stream_reply(self, payload: Dict, words: List[str], usage: Dict, message_id: str, headers: Dict):
+        """Send the reply as Anthropic-style server-sent events"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        start_usage = dict(usage, output_tokens=1)
+        self._send_event('message_start', {'type': 'message_start', 'message': {
+            'id': message_id, 'type': 'message', 'role': 'assistant', 'content': [],
+            'model': payload.get('model', 'fake-claude'), 'stop_reason': None, 'usage': start_usage}})
+        time.sleep(self.state.latency())  # Time to first token
+        self._send_event('content_block_start', {'type': 'content_block_start', 'index': 0,
+                                                 'content_block': {'type': 'text', 'text': ''}})
+        for word in words:
+            self._send_event('content_block_delta', {'type': 'content_block_delta', 'index': 0,
+                                                     'delta': {'type': 'text_delta', 'text': word}})
+            time.sleep(self.state.token_delay)
+        self._send_event('content_block_stop', {'type': 'content_block_stop', 'index': 0})
+        self._send_event('message_delta', {'type': 'message_delta',
+                                           'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                                           'usage': {'output_tokens': usage['output_tokens']}})
+        self._send_event('message_stop', {'type': 'message_stop'})
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _send_event(self, event: str, data: Dict):
+        chunk = f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+        self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, body: Dict, headers: Dict = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, error_type: str, message: str, headers: Dict = None):
+        self._send_json(status, {'type': 'error', 'error': {'type': error_type, 'message': message}}, headers)
+
+    def _count(self, stat: str):
+        with self.state.lock:
+            self.state.stats[stat] += 1
+
+
+# ============================================
+# ENTRY POINT
+# ============================================
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Local stand-in for the Claude messages API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--latency', default='lognormal:800,0.4',
+                        help='Time-to-first-token distribution (see module docstring)')
+    parser.add_argument('--token-delay-ms', type=float, default=15.0, help='Delay between streamed words')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 500')
+    parser.add_argument('--overload-rate', type=float, default=0.0, help='Fraction answered with 529 overloaded')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction answered with a random 429')
+    parser.add_argument('--requests-per-minute', type=int, default=4000, help='Simulated account request limit')
+    parser.add_argument('--tokens-per-minute', type=int, default=400000, help='Simulated account token limit')
+    parser.add_argument('--batch-delay', type=float, default=5.0, help='Seconds before a message batch ends')
+    return parser
+
+
+def make_server(args) -> ThreadingHTTPServer:
+    """Build (but don't start) the fake server - handy for tests and benchmarks"""
+    handler = type('ConfiguredFakeClaudeHandler', (FakeClaudeHandler,), {'state': FakeClaudeState(args)})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == '__main__':
+    args = build_arg_parser().parse_args()
+    server = make_server(args)
+    print(f"🧪 Fake Claude API listening on http://{args.host}:{args.port}/v1/messages")
+    print(f"   Latency: {args.latency}, errors: {args.error_rate:.0%}, "
+          f"overloaded: {args.overload_rate:.0%}, random 429s: {args.rate_limit_rate:.0%}")
+    print(f"   Point the backend at it with CLAUDE_API_URL=http://{args.host}:{args.port}/v1/messages")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Fake Claude API stopped")